@@ -1,18 +1,33 @@
 # script/app.py
-from flask import Flask, request, render_template
+from flask import Flask, Response, g, has_request_context, request, render_template, stream_with_context
 from markupsafe import Markup
-import requests, random, re, traceback
+import requests, random, re, traceback, os, threading, time
 from bs4 import BeautifulSoup
 from pathlib import Path
 from pythainlp.util import normalize
 import json
+import numpy as np
 
-# --- PyThaiNLP: สรุปและตัดประโยค ---
-from pythainlp.summarize import summarize
+# --- PyThaiNLP: ตัดประโยค / สรุปแบบ TextRank (ตัดคำครั้งเดียว, คิดคะแนนด้วย NumPy/SciPy) ---
 from pythainlp.tokenize import sent_tokenize
+from t_summarizer import lead as lead_summary, pick as pick_sentences, rank_sentences
+from t_auto_label import regex_entities
+from t_spans import Spans
 
-# --- HuggingFace transformers: NER ---
-from transformers import AutoTokenizer, AutoModelForTokenClassification, pipeline
+# --- HuggingFace transformers: NER (hf / int8 / onnx) ---
+from t_ner_backend import load_ner_pipeline
+
+# --- inference worker pool (ทางเลือก: แยกโมเดลออกจาก web process) ---
+from t_infer_server import InferenceBusy, InferenceClient
+
+# --- cache ผลวิเคราะห์ + prefetch ข่าวจาก RSS เบื้องหลัง ---
+from t_prefetch import FeedPrefetcher, ResultCache
+
+# --- inverted index ของ entity ที่เจอในแต่ละข่าว ---
+from t_entity_index import EntityIndex, LABELS as INDEX_LABELS, normalize_ent_view
+
+# --- งบเวลาต่อ request + admission control + metrics ---
+from t_deadline import NO_DEADLINE, Admission, Deadline, DeadlineExceeded, Metrics, Overloaded
 
 # -------------------------------------------------
 # ชี้โฟลเดอร์ templates = TRAIN_AI/web  ตามโครงของคุณ
@@ -23,6 +38,36 @@ TPL_DIR  = ROOT_DIR / "web"                          # .../TRAIN_AI/web
 
 app = Flask(__name__, template_folder=str(TPL_DIR))
 
+# -------------------------------------------------
+# จับเวลาแต่ละขั้น (fetch / clean / summarize / ner ...) → header Server-Timing ของ response
+# (นอก request เช่น batch thread / prefetch จะไม่ลง header แต่ยังนับเข้า metrics)
+# size = ขนาดงาน (ตัวอักษร) → metrics เก็บเวลาต่อตัวอักษรไว้ประเมินว่างบเวลาที่เหลือพอไหม
+# -------------------------------------------------
+# ค่าเริ่มต้น (วินาทีต่อตัวอักษร) ก่อนมีผลวัดจริง: ค่อนข้างเผื่อไว้ ไม่ให้ request แรก ๆ เกินงบ
+metrics = Metrics(defaults={"summarize": 2e-5, "ner": 1e-3, "infer": 2e-4})
+
+class stage:
+    def __init__(self, name, size=None):
+        self.name, self.size = name, size
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+
+    def __exit__(self, *exc):
+        dt = time.perf_counter() - self.t0
+        if not exc[0]:
+            metrics.observe(self.name, dt, self.size)
+        if has_request_context():
+            timings = g.setdefault("timings", {})
+            timings[self.name] = timings.get(self.name, 0.0) + dt * 1000
+
+@app.after_request
+def _server_timing(resp):
+    timings = g.get("timings")
+    if timings:
+        resp.headers["Server-Timing"] = ", ".join(f"{k};dur={v:.1f}" for k, v in timings.items())
+    return resp
+
 # -------------------------------------------------
 # ตั้งค่า HTTP headers และตัวช่วยดึง/คลีนข้อความข่าว
 # -------------------------------------------------
@@ -35,9 +80,11 @@ UA = [
 def clean_spaces(t: str) -> str:
     return re.sub(r"\s+", " ", t or "").strip()
 
-def fetch_full(url: str) -> str:
+FETCH_TIMEOUT = 12
+
+def fetch_full(url: str, timeout: float = FETCH_TIMEOUT) -> str:
     """ดึงเนื้อหาข่าวจากลิงก์ พร้อม selector หลายแบบ"""
-    r = requests.get(url, timeout=12, headers={"User-Agent": random.choice(UA)})
+    r = requests.get(url, timeout=timeout, headers={"User-Agent": random.choice(UA)})
     r.raise_for_status()
     r.encoding = r.apparent_encoding
     soup = BeautifulSoup(r.text, "html.parser")
@@ -64,15 +111,28 @@ def fetch_full(url: str) -> str:
 # -------------------------------------------------
 # สรุปข่าวแบบไทย (TextRank) + สำรองกรณีล้มเหลว
 # -------------------------------------------------
-def summarize_th(text: str, n_sent: int = 5) -> str:
+# ข้อความที่คลีนแล้ว → อันดับประโยค [(start, end, score)]: ข่าวเดิมขอ n_sent ไหนก็ตัดจากอันดับเดิม (ใช้ทั้ง web และ inference worker)
+rank_cache = ResultCache(int(os.environ.get("RANK_CACHE_SIZE", "512")))
+
+def summarize_with_units(text: str, n_sent: int = 5):
+    """คืน (บทสรุป, [(start, end)] ของแต่ละประโยคในบทสรุป หรือ None ถ้าใช้ทางสำรอง)"""
     try:
-        s = summarize(text, n_sentences=n_sent)
+        ranked = rank_cache.get(text)
+        if ranked is None:
+            ranked = rank_sentences(text)
+            rank_cache.put(text, ranked)
+        s, units = pick_sentences(text, ranked, n_sent)
         if s:
-            return s
-    except Exception:
-        pass
+            return s, units
+    except Exception as e:
+        # ไม่กลืนเงียบ: นับ + log ให้เห็นว่าตกไปทางสำรอง (เช่น pythainlp เปลี่ยน API)
+        metrics.inc("degraded.textrank_error")
+        print(f"⚠️ TextRank ล้มเหลว ใช้ sent_tokenize แทน: {type(e).__name__}: {e}")
     sents = sent_tokenize(text)
-    return " ".join(sents[:n_sent])
+    return " ".join(sents[:n_sent]), None
+
+def summarize_th(text: str, n_sent: int = 5) -> str:
+    return summarize_with_units(text, n_sent)[0]
 
 def preprocess_for_inference(text: str) -> str:
     import re
@@ -84,10 +144,27 @@ def preprocess_for_inference(text: str) -> str:
 # -------------------------------------------------
 # โหลดโมเดล NER (ครั้งเดียวตอนสตาร์ทแอป)
 # -------------------------------------------------
-NER_MODEL = "pythainlp/thainer-corpus-v2-base-model"
-ner_tokenizer = AutoTokenizer.from_pretrained(NER_MODEL)
-ner_model = AutoModelForTokenClassification.from_pretrained(NER_MODEL)
-ner = pipeline("ner", model=ner_model, tokenizer=ner_tokenizer, aggregation_strategy="simple")
+# NER_MODEL / NER_BACKEND ใช้เลือก artifact จาก t_export_model.py ได้ เช่น
+#   NER_MODEL=out_thai_ner_export/int8 NER_BACKEND=int8   (PyTorch dynamic int8)
+#   NER_MODEL=out_thai_ner_export/onnx NER_BACKEND=onnx   (ONNX Runtime)
+NER_MODEL = os.environ.get("NER_MODEL", "pythainlp/thainer-corpus-v2-base-model")
+NER_BACKEND = os.environ.get("NER_BACKEND", "hf")
+
+# INFER_SOCKET = ส่งงานสรุป/NER ไปที่ inference worker pool (script/t_infer_server.py) แทนการโหลดโมเดลเอง
+#   → เพิ่มจำนวน web worker ได้โดยไม่เพิ่ม memory ของโมเดล
+INFER_SOCKET = os.environ.get("INFER_SOCKET")
+INFER_TIMEOUT = float(os.environ.get("INFER_TIMEOUT", "30"))
+if INFER_SOCKET:
+    infer = InferenceClient(INFER_SOCKET, timeout=INFER_TIMEOUT)
+    ner = None
+else:
+    infer = None
+    ner = load_ner_pipeline(NER_MODEL, NER_BACKEND)
+
+# NER_MEMO=1: memo ระดับประโยค (t_ner_memo.py) ครอบ pipeline → ประโยคที่เคยเห็นแล้วไม่ต้องรันโมเดลซ้ำ
+if ner is not None and os.environ.get("NER_MEMO") == "1":
+    from t_ner_memo import NERMemo
+    ner = NERMemo(ner, maxsize=int(os.environ.get("NER_MEMO_SIZE", "50000")))
 
 LABEL_COLOR = {
     "PERSON": "#b3d9ff",
@@ -114,11 +191,6 @@ def preprocess_for_inference(text: str) -> str:
 
 import unicodedata
 
-THAI_DIGITS = str.maketrans("๐๑๒๓๔๕๖๗๘๙","0123456789")
-
-def thai_to_arabic(s: str) -> str:
-    return s.translate(THAI_DIGITS)
-
 def extend_date_year_span(text: str, start: int, end: int) -> int:
     frag = text[start:end]
     # จบด้วยเลข 2 หลัก (อารบิกหรือไทย)
@@ -141,23 +213,26 @@ STOP_ENTS = {
     "ผู้สื่อข่าว","รายงาน","ภาพ","คลิป"
 }
 STOP_DATE_WORDS = {"สิ้นเดือน","ต้นเดือน","กลางเดือน","ปลายเดือน","ต.ค."}
+NUMERIC_ENT = re.compile(r"[0-9,./:-]+")
+PRUNE_SPANS_LOOP = 64   # span มากกว่านี้ → กรองซ้อนกันด้วย Spans (NumPy) แทนวนคู่
 
 LABEL_COLOR = {
     "PERSON": "#b3d9ff","ORGANIZATION": "#ffd1b3","LOCATION": "#c2f0c2",
     "DATE": "#ffe680","TIME": "#ffd6e7","MONEY": "#e6ccff","PERCENT": "#e0ffff","LAW": "#ddd",
 }
 
-def normalize_ent_view(s: str) -> str:
-    # ทำให้ข้อความที่โชว์สวยขึ้น (ไม่กระทบตำแหน่งในต้นฉบับ)
-    s = s.strip().strip('"\''"()[] ")
-    s = re.sub(r"\s{2,}", " ", s)
-    return thai_to_arabic(s)
-
-def highlight_entities(text: str):
-    raw = ner(text)  # [{'start','end','word','entity_group','score'}]
+def highlight_entities(text: str, units=None, rules_only: bool = False):
+    # units = ขอบประโยคจาก summarize_with_units → NER memo ใช้ต่อได้เลยไม่ต้องตัดประโยคซ้ำ
+    # rules_only = ไม่เรียกโมเดล ใช้ regex (วันที่/เวลา/เงิน/เปอร์เซ็นต์) อย่างเดียว (งบเวลาไม่พอ)
+    if rules_only:
+        raw = regex_entities(text)
+    elif units is not None and hasattr(ner, "predict_units"):
+        raw = ner(text, units=units)
+    else:
+        raw = ner(text)  # [{'start','end','word','entity_group','score'}]
     spans = []
     total_score = 0.0
-    total_entity = 0  
+    total_entity = 0
 
     for r in raw:
         lab = r.get("entity_group") or r.get("entity") or "O"
@@ -179,7 +254,7 @@ def highlight_entities(text: str):
             continue
         if lab == "DATE" and word in STOP_DATE_WORDS:
             continue
-        if re.fullmatch(r"[0-9,./:-]+", word):
+        if NUMERIC_ENT.fullmatch(word):
             continue
         if word == "บริษัท":
             continue
@@ -192,21 +267,27 @@ def highlight_entities(text: str):
             "score": score
         })
 
-    # 🔸 กรองเอนทิตีที่ซ้อนกัน (เหมือนเดิม)
-    pruned = []
-    for i, a in enumerate(spans):
-        contained = False
-        for j, b in enumerate(spans):
-            if i != j and a["label"] == b["label"] and b["start"] <= a["start"] and b["end"] >= a["end"]:
-                if (b["end"] - b["start"]) > (a["end"] - a["start"]):
-                    contained = True
-                    break
-        if not contained:
-            pruned.append(a)
-    spans = pruned
+    # 🔸 กรองเอนทิตีที่ซ้อนกัน (เหมือนเดิม) — บทสรุปมี span ไม่กี่สิบตัว วนคู่ถูกกว่า
+    #    ข้อความยาว (span เกิน PRUNE_SPANS_LOOP) ใช้ Spans.contained_mask แบบ O(n log n) แทน
+    if len(spans) > PRUNE_SPANS_LOOP:
+        cols = Spans.from_columns(text, [sp["start"] for sp in spans], [sp["end"] for sp in spans],
+                                  [sp["label"] for sp in spans], [sp["score"] for sp in spans])
+        spans = [sp for sp, c in zip(spans, cols.contained_mask().tolist()) if not c]
+    else:
+        pruned = []
+        for i, a in enumerate(spans):
+            contained = False
+            for j, b in enumerate(spans):
+                if i != j and a["label"] == b["label"] and b["start"] <= a["start"] and b["end"] >= a["end"]:
+                    if (b["end"] - b["start"]) > (a["end"] - a["start"]):
+                        contained = True
+                        break
+            if not contained:
+                pruned.append(a)
+        spans = pruned
+    spans.sort(key=lambda s: s["start"], reverse=True)
 
     # ✅ ใส่ mark
-    spans.sort(key=lambda s: s["start"], reverse=True)
     html = text
     ent_table = {}
 
@@ -349,6 +430,289 @@ def save_news_log(clean_text: str, summary_text: str, url_link: str):
         json.dump(data, f, ensure_ascii=False, indent=4)
 
 
+# -------------------------------------------------
+# ENTITY INDEX (สร้างล่วงหน้าได้ด้วย python script/t_entity_index.py build)
+# -------------------------------------------------
+entity_index = EntityIndex(os.environ.get("ENTITY_INDEX", "data/entity_index.sqlite"))
+
+def index_entities(url: str, ent_table: dict, title: str = None):
+    ents = [(label, e["word"], e["score"]) for label, items in ent_table.items() for e in items]
+    entity_index.add_article(url, ents, title=title)
+
+# -------------------------------------------------
+# ขั้นตอนวิเคราะห์ข่าว 1 ชิ้น (ใช้ร่วมกันทั้งหน้าเว็บ / batch / CLI)
+# -------------------------------------------------
+MIN_TEXT_CHARS = 120
+
+class NotEnoughText(ValueError):
+    pass
+
+def prepare_text(raw: str) -> str:
+    full_text = preprocess_for_inference(raw)
+    full_text = clean_text(full_text)
+    return clean_textv2(full_text)
+
+# cache: url → ข้อความที่ fetch แล้ว, (url, n_sent) → ผลวิเคราะห์ (ถูกเติมทั้งจาก request จริงและ prefetch)
+#        url → (raw, ข้อความที่คลีนแล้ว) ให้ n_sent อื่นของข่าวเดิมไม่ต้องคลีนใหม่ (อันดับประโยคอยู่ใน rank_cache)
+fetch_cache = ResultCache(int(os.environ.get("FETCH_CACHE_SIZE", "1024")))
+result_cache = ResultCache(int(os.environ.get("RESULT_CACHE_SIZE", "512")))
+text_cache = ResultCache(int(os.environ.get("TEXT_CACHE_SIZE", "512")))
+
+def prepare_cached(url: str, raw: str) -> str:
+    item = text_cache.get(url)
+    if item is not None and item[0] == raw:
+        return item[1]
+    with stage("clean"):
+        full_text = prepare_text(raw)
+    text_cache.put(url, (raw, full_text))
+    return full_text
+
+def fetch_cached(url: str, timeout: float = FETCH_TIMEOUT) -> str:
+    raw = fetch_cache.get(url)
+    if raw is None:
+        raw = fetch_full(url, timeout=timeout)
+        fetch_cache.put(url, raw)
+    return raw
+
+SUMMARY_CHARS_PER_SENT = 100   # ประมาณความยาวบทสรุปต่อประโยค (ใช้ประเมินเวลา NER ก่อนสรุปเสร็จ)
+
+def analyze_text(url: str, raw: str, n_sent: int = 5, log: bool = True, deadline: Deadline = NO_DEADLINE) -> dict:
+    """
+    raw = ข้อความที่ fetch_full ดึงมา → คลีน สรุป ติด NER และบันทึก log (log=False สำหรับ prefetch)
+    deadline: ขั้นที่คาดว่าจะเกินงบเวลาที่เหลือถูกลดเป็นทางถูก (lead sentences / entity จาก regex)
+    ผลที่ลดระดับ (res["degraded"] ไม่ว่าง) ไม่ถูกเก็บลง result_cache และไม่เขียนทับ entity index ของข่าวนั้น
+    """
+    full_text = prepare_cached(url, raw)
+    if len(full_text) < MIN_TEXT_CHARS:
+        raise NotEnoughText("ดึงเนื้อหาข่าวไม่พอ แนะนำลองลิงก์อื่น")
+    degraded = []
+    done = False
+    if infer and deadline.allows(metrics.estimate("infer", len(full_text))):
+        try:
+            with stage("infer", len(full_text)):
+                summary_text, html, ent_table, totalf1 = infer.call(
+                    "analyze", full_text, n_sent, timeout=deadline.timeout(INFER_TIMEOUT))
+            highlighted_html = Markup(html)
+            done = True
+        except (InferenceBusy, TimeoutError) as e:
+            degraded.append("infer_busy" if isinstance(e, InferenceBusy) else "infer_timeout")
+    if not done:
+        # IPC mode: web process ไม่มีโมเดล → ทางถูกเท่านั้น
+        est_ner = metrics.estimate("ner", SUMMARY_CHARS_PER_SENT * n_sent)
+        ranked = full_text in rank_cache   # จัดอันดับไว้แล้ว → เหลือแค่เลือกประโยค
+        est_sum = 0.0 if ranked else metrics.estimate("summarize", len(full_text))
+        if not infer and deadline.allows(est_sum + est_ner):
+            with stage("pick" if ranked else "summarize", len(full_text)):
+                summary_text, units = summarize_with_units(full_text, n_sent=n_sent)
+        else:
+            degraded.append("summary_lead")
+            with stage("lead"):
+                summary_text, units = lead_summary(full_text, n_sent)
+        if not infer and deadline.allows(metrics.estimate("ner", len(summary_text))):
+            with stage("ner", len(summary_text)):
+                highlighted_html, ent_table, totalf1 = highlight_entities(summary_text, units)
+        else:
+            degraded.append("ner_rules")
+            with stage("rules"):
+                highlighted_html, ent_table, totalf1 = highlight_entities(summary_text, rules_only=True)
+    for d in degraded:
+        metrics.inc(f"degraded.{d}")
+    with stage("persist"):
+        if log:
+            save_news_log(raw, summary_text, url)
+        if not degraded:
+            index_entities(url, ent_table)   # add_article แทนที่ทั้งข่าว → entity จาก regex ห้ามทับของโมเดล
+    res = {
+        "url": url,
+        "raw_text": raw,
+        "summary_text": summary_text,
+        "summary_html": highlighted_html,
+        "ent_table": ent_table,
+        "total_score": totalf1,
+        "full_char": len(full_text),
+        "sum_char": len(summary_text),
+        "degraded": degraded,
+    }
+    if not degraded:
+        result_cache.put((url, n_sent), res)
+    return res
+
+def analyze_admitted(url: str, raw: str, n_sent: int = 5, log: bool = True, wait: bool = True) -> dict:
+    """
+    analyze_text ผ่าน admission เดียวกับหน้าเว็บ (batch / prefetch) → งานเบื้องหลังนับรวมในช่องงานที่รันพร้อมกัน
+    wait=False (prefetch) = ไม่มีช่องว่างก็ Overloaded ทันที ไม่แย่งคิวกับ request สด
+    """
+    with admission.slot(wait=wait):
+        return analyze_text(url, raw, n_sent=n_sent, log=log)
+
+FETCH_MIN_S = 1.0   # งบที่เหลือต่ำกว่านี้ไม่เริ่มดึงข่าว
+
+def fetch_url(url: str, deadline: Deadline = NO_DEADLINE) -> str:
+    """fetch_cached ภายใต้ deadline (timeout ไม่เกินงบที่เหลือ) — I/O ล้วน เรียกนอก admission.slot"""
+    if not deadline.allows(FETCH_MIN_S):
+        raise DeadlineExceeded("งบเวลาหมดก่อนเริ่มดึงข่าว")
+    with stage("fetch"):
+        return fetch_cached(url, timeout=deadline.timeout(FETCH_TIMEOUT))
+
+# -------------------------------------------------
+# Batch: ดึงหลายลิงก์พร้อมกัน แล้วส่งต่อให้โมเดลทันทีที่แต่ละลิงก์โหลดเสร็จ
+# -------------------------------------------------
+BATCH_FETCH_WORKERS = 8
+BATCH_INFER_WORKERS = 1   # pipeline ตัวเดียวใช้ทุก core อยู่แล้ว
+BATCH_MAX_URLS = 200
+
+def feed_urls(rss_url: str, limit: int = BATCH_MAX_URLS) -> list:
+    import feedparser
+    feed = feedparser.parse(rss_url)
+    return [e.get("link") for e in feed.entries[:limit] if e.get("link")]
+
+def analyze_many(urls, n_sent: int = 5, fetch_workers: int = BATCH_FETCH_WORKERS,
+                 infer_workers: int = BATCH_INFER_WORKERS):
+    """
+    generator: yield ผลทีละลิงก์ (dict ที่ json ได้) ตามลำดับที่เสร็จ
+    ดาวน์โหลด (thread pool ฝั่ง network) ซ้อนกับ inference (pool ฝั่งโมเดล) และจำกัดงานค้างไม่เกิน
+    fetch_workers + 2 * infer_workers ลิงก์ ไม่ให้ข้อความที่โหลดมากองรอในหน่วยความจำ
+    """
+    from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+    import time
+
+    urls = iter(dict.fromkeys(u.strip() for u in urls if u and u.strip()))
+    window = fetch_workers + 2 * infer_workers
+    inflight = {}  # future -> (stage, url, t0)
+
+    with ThreadPoolExecutor(fetch_workers) as fetch_pool, ThreadPoolExecutor(infer_workers) as infer_pool:
+        def submit_fetch():
+            for u in urls:
+                inflight[fetch_pool.submit(fetch_cached, u)] = ("fetch", u, time.perf_counter())
+                return
+
+        for _ in range(window):
+            submit_fetch()
+        while inflight:
+            done, _ = wait(inflight, return_when=FIRST_COMPLETED)
+            for fut in done:
+                stage, u, t0 = inflight.pop(fut)
+                try:
+                    res = fut.result()
+                except Exception as e:
+                    yield {"url": u, "ok": False, "stage": stage, "error": str(e),
+                           "elapsed_ms": round((time.perf_counter() - t0) * 1000)}
+                    submit_fetch()
+                    continue
+                if stage == "fetch":
+                    inflight[infer_pool.submit(analyze_admitted, u, res, n_sent)] = ("analyze", u, t0)
+                    continue
+                yield {
+                    "url": u, "ok": True,
+                    "summary": res["summary_text"],
+                    "summary_html": str(res["summary_html"]),
+                    "entities": res["ent_table"],
+                    "score": res["total_score"],
+                    "full_char": res["full_char"],
+                    "sum_char": res["sum_char"],
+                    "elapsed_ms": round((time.perf_counter() - t0) * 1000),
+                }
+                submit_fetch()
+
+# -------------------------------------------------
+# PREFETCH (PREFETCH=1): ไล่วิเคราะห์ข่าวใหม่จาก RSS ไว้ใน cache ตอนเครื่องว่าง
+#   PREFETCH_INTERVAL (วินาที), PREFETCH_PER_FEED, PREFETCH_CPU_BUDGET (สัดส่วนเวลา 0-1)
+#   เริ่มจาก `python app.py` หรือ request แรกของ web process (gunicorn) — ไม่เริ่มตอน import
+#   gunicorn -w N: prefetcher มีตัวเดียว = process ที่ถือ flock ของ PREFETCH_LOCK ได้ (ตัวอื่นลองใหม่ทุก PREFETCH_LOCK_RETRY วินาที)
+# -------------------------------------------------
+PREFETCH_N_SENT = 5   # ค่าเริ่มต้นของฟอร์มหน้าเว็บ
+PREFETCH_LOCK = os.environ.get("PREFETCH_LOCK", "data/cache/prefetch.lock")
+PREFETCH_LOCK_RETRY = 60.0
+_live_requests = 0
+_live_lock = threading.Lock()
+
+@app.before_request
+def _track_request_start():
+    global _live_requests
+    with _live_lock:
+        _live_requests += 1
+    if prefetcher is None and os.environ.get("PREFETCH") == "1" and time.monotonic() >= _prefetch_next_try:
+        start_prefetch()   # gunicorn: เริ่มใน process ที่รับ request จริงเท่านั้น
+
+@app.teardown_request
+def _track_request_end(exc=None):
+    global _live_requests
+    with _live_lock:
+        _live_requests -= 1
+
+prefetcher = None
+_prefetch_lock = threading.Lock()
+_prefetch_fd = None        # fd ของ PREFETCH_LOCK — เปิดค้างไว้ตลอดอายุ process (ปิด = ปล่อย lock)
+_prefetch_next_try = 0.0
+
+def claim_prefetch_lock(path=PREFETCH_LOCK):
+    """flock แบบไม่รอ: ได้ = process นี้เป็นผู้ prefetch (คืน fd), มีคนถืออยู่แล้ว = None"""
+    import fcntl
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        os.close(fd)
+        return None
+    return fd
+
+def pool_busy() -> bool:
+    """
+    มีงานวิเคราะห์ค้างอยู่ไหม (prefetch รอจนกว่าจะว่าง)
+    IPC mode: คิว + งานที่กำลังทำใน inference server (รวมทุก web process), server ไม่ตอบ = ถือว่าไม่ว่าง
+    ไม่งั้น: request ที่ค้าง + ช่องงานของ admission ใน process นี้
+    """
+    if _live_requests > 0:
+        return True
+    if infer:
+        h = infer.health()
+        return not h.get("ok") or (h.get("queue_depth") or 0) + h.get("inflight", 0) > 0
+    st = admission.status()
+    return st["active"] + st["waiting"] > 0
+
+def start_prefetch():
+    """
+    เริ่ม FeedPrefetcher (ครั้งเดียว ทั้งเครื่อง: เฉพาะ process ที่ได้ PREFETCH_LOCK) — เรียกจาก web entry point เท่านั้น
+    ไม่เริ่มตอน import: inference worker (t_infer_server) ก็ import app แต่ไม่ได้เป็นผู้ prefetch
+    คืน None ถ้า process อื่นเป็นผู้ prefetch อยู่แล้ว
+    """
+    global prefetcher, _prefetch_fd, _prefetch_next_try
+    from t_prepare_data import RSS_FEEDS
+    with _prefetch_lock:
+        if prefetcher is not None:
+            return prefetcher
+        _prefetch_fd = claim_prefetch_lock()
+        if _prefetch_fd is None:
+            _prefetch_next_try = time.monotonic() + PREFETCH_LOCK_RETRY
+            return None
+        prefetcher = FeedPrefetcher(
+            RSS_FEEDS, feed_urls, fetch_cached,
+            analyze=lambda url, raw: analyze_admitted(url, raw, n_sent=PREFETCH_N_SENT, log=False, wait=False),
+            retry_on=(Overloaded,),
+            is_cached=lambda url: (url, PREFETCH_N_SENT) in result_cache,
+            is_busy=pool_busy,
+            interval=float(os.environ.get("PREFETCH_INTERVAL", "600")),
+            per_feed=int(os.environ.get("PREFETCH_PER_FEED", "20")),
+            cpu_budget=float(os.environ.get("PREFETCH_CPU_BUDGET", "0.2")),
+        )
+        prefetcher.start()
+        return prefetcher
+
+# -------------------------------------------------
+# งบเวลา + admission control ของงานวิเคราะห์ทั้งหมด (POST / + /batch + prefetch)
+#   REQUEST_BUDGET (วินาที) งบทั้ง request ตั้งแต่รับจนตอบ
+#   ADMIT_MAX_ACTIVE งานวิเคราะห์พร้อมกัน, ADMIT_MAX_QUEUE จำนวนที่รอได้, ADMIT_MAX_WAIT วินาทีที่ยอมรอคิว
+# -------------------------------------------------
+REQUEST_BUDGET = float(os.environ.get("REQUEST_BUDGET", "20"))
+admission = Admission(
+    max_active=int(os.environ.get("ADMIT_MAX_ACTIVE", str(os.cpu_count() or 4))),
+    max_queue=int(os.environ.get("ADMIT_MAX_QUEUE", "16")),
+    max_wait=float(os.environ.get("ADMIT_MAX_WAIT", "5")),
+    reserve=FETCH_MIN_S,
+    metrics=metrics,
+)
+
 # -------------------------------------------------
 # Routes
 # -------------------------------------------------
@@ -361,39 +725,159 @@ def index():
         if not url:
             return render_template("index.html", error="กรุณาใส่ลิงก์ข่าว")
 
+        deadline = Deadline(REQUEST_BUDGET)
         try:
-            
-            full_text = fetch_full(url)
-            full_text = preprocess_for_inference(full_text) 
-            full_text = clean_text(full_text)
-            full_text = clean_textv2(full_text)
-            if len(full_text) < 120:
-                return render_template("index.html", error="ดึงเนื้อหาข่าวไม่พอ แนะนำลองลิงก์อื่น")
-
-            summary_text = summarize_th(full_text, n_sent=n_sent)
-            highlighted_html, ent_table, totalf1 = highlight_entities(summary_text)
-            save_news_log(fetch_full(url), summary_text, url)
-            
+            res = result_cache.get((url, n_sent))
+            if res is None:
+                try:
+                    raw = fetch_url(url, deadline)   # รอเครือข่ายไม่กินช่องงาน CPU ของ admission
+                    with admission.slot(deadline):
+                        res = analyze_text(url, raw, n_sent=n_sent, deadline=deadline)
+                except NotEnoughText as e:
+                    return render_template("index.html", error=str(e))
+                except (Overloaded, TimeoutError, requests.Timeout):
+                    # ทำใหม่ไม่ทัน/ไม่ได้คิว → ผลเก่าที่หมดอายุแล้วก็ยังดีกว่าไม่มีอะไรเลย
+                    res = result_cache.get_stale((url, n_sent))
+                    if res is None:
+                        raise
+                    res = {**res, "degraded": ["stale_cache"]}
+                    metrics.inc("degraded.stale_cache")
+            else:
+                save_news_log(res["raw_text"], res["summary_text"], url)
+
             f1_scores = {}
-            for label in ent_table.keys():
+            for label in res["ent_table"].keys():
                 f1_scores[label] = 0.5
-            
-            return render_template(
-                "result.html",
-                url=url,
-                summary_html=highlighted_html,
-                cleantxt=fetch_full(url),
-                ent_table=ent_table,
-                f1_scores=f1_scores,
-                totalScore=totalf1,
-                full_char=len(full_text),
-                sum_char=len(summary_text),
-            )
 
+            with stage("render"):
+                page = render_template(
+                    "result.html",
+                    url=url,
+                    summary_html=res["summary_html"],
+                    cleantxt=res["raw_text"],
+                    ent_table=res["ent_table"],
+                    f1_scores=f1_scores,
+                    totalScore=res["total_score"],
+                    full_char=res["full_char"],
+                    sum_char=res["sum_char"],
+                    degraded=res.get("degraded"),
+                )
+            return page
+
+        except Overloaded as e:
+            return (render_template("index.html", error="ระบบมีคำขอมากเกินรับไหว ลองใหม่อีกครั้งในอีกสักครู่"),
+                    503, {"Retry-After": str(e.retry_after)})
+        except InferenceBusy:
+            return render_template("index.html", error="ระบบกำลังประมวลผลเต็มกำลัง ลองใหม่อีกครั้งในอีกสักครู่"), 503
+        except (TimeoutError, requests.Timeout):
+            metrics.inc("deadline.exceeded")
+            return render_template("index.html", error="ประมวลผลเกินเวลาที่กำหนด ลองใหม่อีกครั้ง"), 504
         except Exception as e:
             return render_template("index.html", error=f"ประมวลผลล้มเหลว: {e}")
 
     return render_template("index.html")
 
+MAX_N_SENT = 20
+
+def clamp_int(value, default, lo, hi):
+    """ค่าจาก body → int ในช่วง [lo, hi]; ไม่ระบุ = default, ไม่ใช่ตัวเลข = ValueError/TypeError (ตอบ 400)"""
+    if value is None or value == "":
+        return default
+    if isinstance(value, bool):
+        raise TypeError("bool")
+    return min(max(int(value), lo), hi)
+
+@app.route("/batch", methods=["POST"])
+def batch():
+    """
+    POST JSON {"urls": [...]} หรือ {"rss": "<feed url>"} (+ "n_sent", "limit")
+    ตอบกลับเป็น JSON lines (application/x-ndjson) ทีละข่าวทันทีที่วิเคราะห์เสร็จ
+    """
+    def bad(msg):
+        return Response(json.dumps({"ok": False, "error": msg}, ensure_ascii=False) + "\n",
+                        status=400, mimetype="application/x-ndjson")
+
+    body = request.get_json(silent=True) or request.form.to_dict()
+    if not isinstance(body, dict):
+        return bad("body ต้องเป็น JSON object")
+    try:
+        limit = clamp_int(body.get("limit"), BATCH_MAX_URLS, 1, BATCH_MAX_URLS)
+        n_sent = clamp_int(body.get("n_sent"), 5, 1, MAX_N_SENT)
+    except (TypeError, ValueError):
+        return bad("limit / n_sent ต้องเป็นจำนวนเต็ม")
+    urls = body.get("urls") or []
+    if isinstance(urls, str):
+        urls = urls.split()
+    if not isinstance(urls, list) or not all(isinstance(u, str) for u in urls):
+        return bad("urls ต้องเป็น list ของสตริง")
+    rss = body.get("rss")
+    if rss is not None and not isinstance(rss, str):
+        return bad("rss ต้องเป็นสตริง")
+    if rss:
+        urls = urls + feed_urls(rss, limit)
+    urls = urls[:limit]
+    if not urls:
+        return bad("ต้องระบุ urls หรือ rss")
+
+    def gen():
+        for item in analyze_many(urls, n_sent=n_sent):
+            yield json.dumps(item, ensure_ascii=False) + "\n"
+
+    return Response(stream_with_context(gen()), mimetype="application/x-ndjson")
+
+def json_response(obj, status=200):
+    return Response(json.dumps(obj, ensure_ascii=False), status=status, mimetype="application/json")
+
+MAX_QUERY_DAYS = 3650
+
+def query_int(name, default, lo, hi):
+    """query string เป็นจำนวนเต็มในช่วง [lo, hi] — ไม่ใช่ตัวเลข/ไม่ระบุ = default"""
+    return min(max(request.args.get(name, default, type=int), lo), hi)
+
+@app.route("/entities/search")
+def entities_search():
+    """GET ?q=<entity>&days=7&label=PERSON&limit=50 → ข่าวที่กล่าวถึง entity ในช่วง N วัน"""
+    q = (request.args.get("q") or "").strip()
+    label = request.args.get("label") or None
+    if not q:
+        return json_response({"error": "ต้องระบุ q"}, 400)
+    if label and label not in INDEX_LABELS:
+        return json_response({"error": f"label ต้องเป็นหนึ่งใน {INDEX_LABELS}"}, 400)
+    days = query_int("days", 7, 1, MAX_QUERY_DAYS)
+    limit = query_int("limit", 50, 1, 500)
+    return json_response({"q": normalize_ent_view(q), "days": days,
+                          "results": entity_index.mentions(q, days=days, label=label, limit=limit)})
+
+@app.route("/entities/top")
+def entities_top():
+    """GET ?label=ORGANIZATION&days=1&limit=10 → entity ที่ถูกพูดถึงมากที่สุด"""
+    label = request.args.get("label") or "ORGANIZATION"
+    if label not in INDEX_LABELS:
+        return json_response({"error": f"label ต้องเป็นหนึ่งใน {INDEX_LABELS}"}, 400)
+    days = query_int("days", 1, 1, MAX_QUERY_DAYS)
+    limit = query_int("limit", 10, 1, 500)
+    return json_response({"label": label, "days": days, "results": entity_index.top(label, days=days, limit=limit)})
+
+@app.route("/metrics")
+def metrics_view():
+    """ตัวนับ admit / shed / degraded / deadline + เวลาต่อตัวอักษรของแต่ละขั้น (EWMA) + สถานะคิว"""
+    return json_response({"request_budget_s": REQUEST_BUDGET, "admission": admission.status(),
+                          "live_requests": _live_requests, **metrics.snapshot()})
+
+@app.route("/health")
+def health():
+    """สถานะ web + inference workers (ถ้าใช้ INFER_SOCKET)"""
+    caches = {"fetch": fetch_cache.stats(), "result": result_cache.stats(),
+              "text": text_cache.stats(), "rank": rank_cache.stats(),
+              "ner_memo": ner.hit_rate() if hasattr(ner, "hit_rate") else None,
+              "prefetch": prefetcher.status() if prefetcher else None}
+    if not infer:
+        return json_response({"ok": True, "mode": "in-process", "model": NER_MODEL, "backend": NER_BACKEND, **caches})
+    h = infer.health()
+    return json_response({"ok": h.get("ok", False), "mode": "ipc", "socket": INFER_SOCKET, "infer": h, **caches},
+                         200 if h.get("ok") else 503)
+
 if __name__ == "__main__":
+    if os.environ.get("PREFETCH") == "1":
+        start_prefetch()
     app.run()
\ No newline at end of file
@@ -0,0 +1,211 @@
+# bench_app.py
+# load test ของ flow หน้าเว็บ (POST / → fetch → clean → summarize → NER → render) ก่อน deploy
+# - stub server เสิร์ฟข่าวจาก data/t_news.jsonl เป็น HTML หน้าตาแบบเว็บข่าวจริง (วนตาม selector ใน fetch_full)
+# - ยิง POST พร้อมกันหลาย client → p50/p95/p99, req/s และเวลาแต่ละขั้นจาก header Server-Timing
+# - --fake_model: แทนโมเดล NER ด้วย regex (วัด overhead ล้วน ๆ ของ web/fetch/clean/summarize)
+# - ผลต่อท้ายไฟล์ JSONL (--out) พร้อม git commit ไว้เทียบ regression ข้าม commit
+#   python script/bench_app.py --requests 200 --concurrency 8 --fake_model
+#   python script/bench_app.py --target http://127.0.0.1:8000/   (ยิง app ที่รันแยกไว้ เช่น gunicorn + INFER_SOCKET)
+import argparse, html, json, os, random, subprocess, sys, tempfile, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import numpy as np, requests
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+
+# โครงหน้าเว็บตาม selector ใน app.fetch_full (ครบทุกตัว วนใช้ตาม index ข่าว)
+LAYOUTS = [
+    "<article>{body}</article>",
+    "<div itemprop='articleBody'>{body}</div>",
+    "<div class='entry-content'>{body}</div>",
+    "<div id='article-body'>{body}</div>",
+    "<section class='article'>{body}</section>",
+    "<div class='td-post-content'>{body}</div>",
+    "<div id='main-content'>{body}</div>",
+    "<div class='content-detail'>{body}</div>",
+    "<div class='post-content'>{body}</div>",
+]
+PAGE = """<!doctype html><html lang="th"><head><meta charset="utf-8"><title>{title}</title>
+<script>window.dataLayer=[];{filler}</script><style>body{{font-family:sans-serif}}</style></head><body>
+<header><nav>{nav}</nav></header>
+<main><h1>{title}</h1><div class="meta">โดย กองบรรณาธิการ | {i}</div>{content}
+<aside class="related"><h3>ข่าวที่เกี่ยวข้อง</h3><ul>{related}</ul></aside></main>
+<footer>แชร์เรื่องนี้ Facebook Twitter LINE | © สำนักข่าวทดสอบ</footer></body></html>"""
+
+def render_article(i, rec, titles):
+    paras = [s for s in rec["text"].split("  ") if s.strip()] or [rec["text"]]
+    body = "".join(f"<p>{html.escape(p.strip())}</p>" for p in paras)
+    nav = "".join(f"<a href='/cat/{k}'>หมวด {k}</a>" for k in range(12))
+    related = "".join(f"<li><a href='/article/{j}'>{html.escape(titles[j])}</a></li>"
+                      for j in random.Random(i).sample(range(len(titles)), min(5, len(titles))))
+    return PAGE.format(title=html.escape(rec["title"]), filler="x=1;" * 400, nav=nav, i=i,
+                       content=LAYOUTS[i % len(LAYOUTS)].format(body=body), related=related).encode("utf-8")
+
+def start_stub(records, port=0):
+    titles = [r["title"] for r in records]
+    pages = [render_article(i, r, titles) for i, r in enumerate(records)]
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            try:
+                i = int(self.path.split("?")[0].rstrip("/").rsplit("/", 1)[-1])
+                page = pages[i % len(pages)]
+            except ValueError:
+                self.send_error(404); return
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(page)))
+            self.end_headers()
+            self.wfile.write(page)
+
+        def log_message(self, *a):
+            pass
+
+    srv = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    srv.daemon_threads = True
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv, f"http://127.0.0.1:{srv.server_address[1]}"
+
+class FakeNER:
+    """แทน HF pipeline: คืน entity รูปแบบเดียวกัน (entity_group/start/end/word/score) จาก regex_rules"""
+
+    def __init__(self, latency_ms=0.0):
+        self.latency = latency_ms / 1000
+
+    def __call__(self, text):
+        from t_auto_label import regex_entities
+        if self.latency:
+            time.sleep(self.latency)
+        return regex_entities(text)
+
+def start_app(fake_model, fake_latency_ms, workdir):
+    """รัน app.py ใน process นี้ (werkzeug threaded) โดย log / entity index ลง workdir"""
+    os.environ.setdefault("ENTITY_INDEX", str(Path(workdir) / "entity_index.sqlite"))
+    os.chdir(workdir)  # save_news_log เขียน logs/ ตาม cwd
+    if fake_model:
+        import t_ner_backend  # app import load_ner_pipeline ตอนโหลดโมดูล → สลับก่อน import app
+        t_ner_backend.load_ner_pipeline = lambda *a, **k: FakeNER(fake_latency_ms)
+    import app as web
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *a, **k):
+            pass
+
+    srv = make_server("127.0.0.1", 0, web.app, threaded=True, request_handler=QuietHandler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv, f"http://127.0.0.1:{srv.server_port}/"
+
+def parse_server_timing(header):
+    out = {}
+    for part in (header or "").split(","):
+        name, _, dur = part.strip().partition(";dur=")
+        if name and dur:
+            out[name] = float(dur)
+    return out
+
+RESULT_MARK = "<h3>Entities</h3>"   # มีเฉพาะใน result.html (หน้า error ของ index() ก็ตอบ 200 แต่ใช้ index.html)
+
+def drive(target, urls, concurrency, n_sent):
+    """status ต่อ request: 200 = ได้หน้าผลลัพธ์จริง, "error_page" = 200 แต่เป็นหน้า error, อื่น ๆ = HTTP status / exception"""
+    local = threading.local()
+
+    def one(url):
+        sess = getattr(local, "sess", None) or requests.Session()
+        local.sess = sess
+        t0 = time.perf_counter()
+        try:
+            r = sess.post(target, data={"url": url, "n_sent": n_sent}, timeout=120)
+            status, timing = r.status_code, parse_server_timing(r.headers.get("Server-Timing"))
+            if status == 200 and RESULT_MARK not in r.text:
+                status = "error_page"
+        except requests.RequestException as e:
+            status, timing = type(e).__name__, {}
+        return (time.perf_counter() - t0) * 1000, status, timing
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        rows = list(pool.map(one, urls))
+    return rows, time.perf_counter() - t0
+
+def pct(xs, q):
+    return round(float(np.percentile(xs, q)), 2) if len(xs) else None
+
+def summarize_rows(rows, wall):
+    lat = [ms for ms, status, _ in rows if status == 200]
+    stages = sorted({k for _, _, t in rows for k in t})
+    return {
+        "requests": len(rows),
+        "ok": len(lat),
+        "errors": {str(s): sum(1 for _, st, _ in rows if st == s) for s in {st for _, st, _ in rows if st != 200}},
+        "wall_s": round(wall, 3),
+        "rps": round(len(lat) / wall, 2) if wall else None,
+        "latency_ms": {"mean": round(float(np.mean(lat)), 2) if lat else None,
+                       "p50": pct(lat, 50), "p95": pct(lat, 95), "p99": pct(lat, 99), "max": pct(lat, 100)},
+        "stages_ms": {k: {"mean": round(float(np.mean(v)), 2), "p50": pct(v, 50), "p95": pct(v, 95)}
+                      for k in stages for v in [[t[k] for _, st, t in rows if k in t and st == 200]] if v},
+    }
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, text=True).strip()
+    except Exception:
+        return None
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--input", default=str(ROOT_DIR / "data/t_news.jsonl"))
+    ap.add_argument("--requests", type=int, default=100)
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--warmup", type=int, default=5)
+    ap.add_argument("--n_sent", type=int, default=5)
+    ap.add_argument("--target", default=None, help="URL ของ app ที่รันอยู่แล้ว (ไม่ระบุ = รัน app.py ใน process นี้)")
+    ap.add_argument("--fake_model", action="store_true", help="ใช้ NER ปลอม (regex) แทนโมเดล")
+    ap.add_argument("--fake_latency_ms", type=float, default=0.0, help="หน่วงเวลาต่อการเรียก NER ปลอม")
+    ap.add_argument("--repeat_urls", action="store_true", help="ใช้ลิงก์ซ้ำ (วัดกรณี cache hit)")
+    ap.add_argument("--label", default=None, help="ชื่อกำกับผลรอบนี้")
+    ap.add_argument("--out", default=str(ROOT_DIR / "bench_app.jsonl"))
+    args = ap.parse_args()
+
+    with open(args.input, encoding="utf-8") as f:
+        records = [json.loads(l) for l in f if l.strip()]
+    stub, base = start_stub(records)
+    print(f"🧪 stub news site: {base} ({len(records)} articles, {len(LAYOUTS)} layouts)")
+
+    workdir = tempfile.mkdtemp(prefix="bench_app_")
+    if args.target:
+        target = args.target
+    else:
+        _, target = start_app(args.fake_model, args.fake_latency_ms, workdir)
+    print(f"🎯 target: {target} | model: {'fake' if args.fake_model else os.environ.get('NER_MODEL', 'default')}")
+
+    # ลิงก์ไม่ซ้ำกันทุก request (?r=) เพื่อไม่ให้ result cache ของ app ช่วย เว้นแต่ --repeat_urls
+    def url(k):
+        return f"{base}/article/{k % len(records)}" + ("" if args.repeat_urls else f"?r={k}")
+
+    run_urls = [url(k) for k in range(args.requests)]
+    # warmup: ลิงก์นอกชุดที่วัด / --repeat_urls: โหลดชุดที่จะวัดเข้า cache ก่อน
+    warm = list(dict.fromkeys(run_urls)) if args.repeat_urls else [url(-1 - k) for k in range(args.warmup)]
+    drive(target, warm, args.concurrency, args.n_sent)
+    rows, wall = drive(target, run_urls, args.concurrency, args.n_sent)
+    res = summarize_rows(rows, wall)
+
+    lat, st = res["latency_ms"], res["stages_ms"]
+    print(f"📊 {res['ok']}/{res['requests']} ok | {res['rps']} req/s | p50 {lat['p50']} ms | p95 {lat['p95']} ms "
+          f"| p99 {lat['p99']} ms | errors {res['errors'] or '-'}")
+    for k, v in st.items():
+        print(f"   {k:<10} mean {v['mean']:>8} ms | p95 {v['p95']:>8} ms")
+
+    entry = {"time": time.strftime("%Y-%m-%d %H:%M:%S"), "commit": git_commit(), "label": args.label,
+             "target": "external" if args.target else "in-process", "fake_model": args.fake_model,
+             "fake_latency_ms": args.fake_latency_ms, "concurrency": args.concurrency, "n_sent": args.n_sent,
+             "repeat_urls": args.repeat_urls, **res}
+    with open(args.out, "a", encoding="utf-8") as f:
+        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    print(f"📝 → {args.out}")
+    stub.shutdown()
+
+if __name__ == "__main__":
+    sys.exit(main())
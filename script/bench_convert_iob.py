@@ -0,0 +1,80 @@
+# bench_convert_iob.py
+# เทียบ alignment แบบเดิม (O(E·T) + re.search บน text[cur:]) กับ t_convert_to_iob ปัจจุบัน
+# บนเอกสารยาว (ต่อข่าวหลายชิ้นเข้าด้วยกัน) พร้อมตรวจว่า output IOB ตรงกันทุกไบต์
+import argparse, json, re, time
+from pathlib import Path
+from pythainlp.tokenize import word_tokenize
+
+from t_convert_to_iob import align_tokens_to_spans, assign_iob, find_entity_spans, fix_iob
+
+# ---------- แบบเดิม (ก่อน sweep-line) ----------
+def legacy_align(text, tokens):
+    spans, cur = [], 0
+    for tok in tokens:
+        m = re.search(re.escape(tok), text[cur:])
+        if m:
+            s = cur + m.start(); e = cur + m.end()
+        else:
+            s = cur; e = cur + len(tok)
+        spans.append((s,e))
+        cur = e
+    return spans
+
+def legacy_labels(text, ents, spans):
+    labels = ["O"] * len(spans)
+    es = []
+    for e in ents:
+        w = (e.get("word") or "").strip()
+        lab = (e.get("entity") or "").strip().upper()
+        if not w or not lab:
+            continue
+        for m in re.finditer(re.escape(w), text):
+            es.append((m.start(), m.end(), lab))
+    for s, t, lab in es:
+        touched = []
+        for i, (a,b) in enumerate(spans):
+            inter = max(0, min(b, t) - max(a, s))
+            if inter > 0 and inter >= 0.5 * (b - a):
+                touched.append(i)
+        if not touched:
+            continue
+        labels[touched[0]] = f"B-{lab}"
+        for i in touched[1:]:
+            labels[i] = f"I-{lab}"
+    return labels
+
+def render(tokens, labels):
+    return "".join(f"{t}\t{l}\n" for t, l in zip(tokens, fix_iob(labels))) + "\n"
+
+def run(docs, align, label):
+    out, t0 = [], time.perf_counter()
+    for text, ents, tokens in docs:
+        spans = align(text, tokens)
+        out.append(render(tokens, label(text, ents, spans)))
+    return "".join(out).encode("utf-8"), time.perf_counter() - t0
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--input", default="data/hf_labeled_news.jsonl")
+    ap.add_argument("--join", nargs="*", type=int, default=[1, 4, 8], help="จำนวนข่าวที่ต่อกันเป็น 1 เอกสาร")
+    ap.add_argument("--limit", type=int, default=32)
+    args = ap.parse_args()
+
+    recs = [json.loads(l) for l in Path(args.input).open(encoding="utf-8")][:args.limit]
+    for k in args.join:
+        docs = []
+        for i in range(0, len(recs), k):
+            group = recs[i:i+k]
+            text = re.sub(r"\s+", " ", " ".join((r.get("text") or "").strip() for r in group))
+            ents = [e for r in group for e in r.get("entities", [])]
+            tokens = [t for t in word_tokenize(text, engine="newmm") if t.strip()]
+            docs.append((text, ents, tokens))
+        old, t_old = run(docs, legacy_align, legacy_labels)
+        new, t_new = run(docs, align_tokens_to_spans, lambda text, ents, spans: assign_iob(spans, find_entity_spans(text, ents)))
+        avg_len = sum(len(d[0]) for d in docs) / len(docs)
+        print(f"join={k:>3} docs={len(docs):>4} avg_chars={avg_len:>9.0f} "
+              f"legacy={t_old:8.3f}s new={t_new:8.3f}s speedup={t_old / max(t_new, 1e-9):7.1f}x "
+              f"identical={'✅' if old == new else '❌'}")
+
+if __name__ == "__main__":
+    main()
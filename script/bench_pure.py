@@ -0,0 +1,271 @@
+# bench_pure.py
+# microbenchmark ของฟังก์ชันล้วนที่กิน CPU (คลีนข้อความ / chunk / alignment / IOB / post-process ของ NER)
+# รันบนไฟล์จริงใน data/ (scale 1) และ corpus สังเคราะห์ที่ต่อข่าวจริง N ชิ้นเป็นเอกสารเดียว (scale N)
+# รายงาน ops/s (เอกสารต่อวินาที), MB/s และ peak memory (tracemalloc) ต่อ benchmark × scale
+# โมเดล/tokenizer ไม่ถูกโหลด: chunk ใช้ MockTokenizer (หรือ --tokenizer ตัวจริง), highlight_entities ใช้ผล NER ที่บันทึกไว้
+#   python script/bench_pure.py --save_baseline          (เก็บ baseline ของเครื่องนี้)
+#   python script/bench_pure.py --compare --threshold 0.15   (exit 1 ถ้าช้าลง/ใช้ memory เพิ่มเกิน 15%)
+import argparse, json, math, os, sys, tempfile, time, tracemalloc
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_BASELINE = ROOT_DIR / "bench_pure_baseline.json"
+
+class MockTokenizer:
+    """แทน HF tokenizer ใน chunk(): ประมาณ 1 subword ต่อ 3 ตัวอักษร (ไม่ต้องโหลดไฟล์ tokenizer)"""
+    model_max_length = 512
+
+    def __call__(self, pieces, add_special_tokens=False):
+        return {"input_ids": [range(math.ceil(len(p.strip()) / 3)) for p in pieces]}
+
+    def num_special_tokens_to_add(self):
+        return 2
+
+class ReplayNER:
+    """แทน HF pipeline ใน app: คืน entity ที่บันทึกไว้ของข้อความนั้น (ไม่มี = ไม่มี entity)"""
+
+    def __init__(self):
+        self.by_text = {}
+
+    def add(self, text, ents):
+        self.by_text[text] = [{"entity_group": e["entity"], "start": e["start"], "end": e["end"],
+                               "word": e["word"], "score": e.get("score", 1.0)} for e in ents]
+
+    def __call__(self, text):
+        return self.by_text.get(text, [])
+
+# -------------------------------------------------
+# corpus: จริง + สังเคราะห์ (ต่อ N ข่าวเป็นเอกสารเดียว, เลื่อน offset ของ entity ตาม)
+# -------------------------------------------------
+def read_jsonl(path, limit=None):
+    out = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                out.append(json.loads(line))
+            if limit and len(out) >= limit:
+                break
+    return out
+
+def scale_texts(texts, n):
+    if n == 1:
+        return list(texts)
+    return [" ".join(texts[(i + k) % len(texts)] for k in range(n)) for i in range(len(texts))]
+
+def scale_labeled(recs, n):
+    out = []
+    for i in range(len(recs)):
+        parts, ents, pos = [], [], 0
+        for k in range(n):
+            r = recs[(i + k) % len(recs)]
+            parts.append(r["text"])
+            ents.extend({**e, "start": e["start"] + pos, "end": e["end"] + pos}
+                        for e in r.get("entities", []) if "start" in e)
+            pos += len(r["text"]) + 1
+        out.append({"text": " ".join(parts), "entities": ents})
+    return out
+
+# -------------------------------------------------
+# benchmarks: setup(ctx, scale) → (inputs, fn(input), ขนาดข้อมูลเป็นตัวอักษร); 1 op = fn 1 ครั้ง
+# -------------------------------------------------
+def _texts(ctx, scale):
+    xs = scale_texts(ctx["raw"], scale)
+    return xs, sum(map(len, xs))
+
+def bench_app_clean_text(ctx, scale):
+    xs, n = _texts(ctx, scale)
+    return xs, ctx["app"].clean_text, n
+
+def bench_app_clean_textv2(ctx, scale):
+    xs, n = _texts(ctx, scale)
+    return xs, ctx["app"].clean_textv2, n
+
+def bench_pre_clean_text(ctx, scale):
+    import t_pre_clean
+    xs, n = _texts(ctx, scale)
+    return xs, t_pre_clean.clean_text, n
+
+def bench_soft_clean(ctx, scale):
+    import clean_data_v2
+    xs, n = _texts(ctx, scale)
+    return xs, clean_data_v2.soft_clean, n
+
+def bench_is_valid(ctx, scale):
+    import clean_data_v2, t_pre_clean
+    xs, n = _texts(ctx, scale)
+    return xs, lambda t: (t_pre_clean.is_valid(t), clean_data_v2.is_valid(t)), n
+
+def bench_summarize_th(ctx, scale):
+    xs, n = _texts(ctx, scale)
+    return xs, ctx["app"].summarize_th, n
+
+def bench_chunk(ctx, scale):
+    from t_auto_label import chunk
+    xs = [r["text"] for r in scale_labeled(ctx["labeled"], scale)]
+    tok = ctx["tokenizer"]
+    return xs, lambda t: chunk(t, tok), sum(map(len, xs))
+
+def bench_clean_word(ctx, scale):
+    from t_auto_label import clean_word
+    words = [e["word"] for r in ctx["labeled"] for e in r.get("entities", [])] * scale
+    return words, clean_word, sum(map(len, words))
+
+def _tokenized(ctx, scale):
+    docs = scale_labeled(ctx["labeled"], scale)
+    texts = [" ".join(d["text"].split()) for d in docs]
+    offs = ctx["token_cache"].offsets_many(texts)
+    return [(t, [t[s:e] for s, e in o if t[s:e].strip()], d) for t, o, d in zip(texts, offs, docs)]
+
+def bench_align_tokens_to_spans(ctx, scale):
+    from t_convert_to_iob import align_tokens_to_spans
+    docs = _tokenized(ctx, scale)
+    return [(t, toks) for t, toks, _ in docs], lambda a: align_tokens_to_spans(*a), sum(len(t) for t, _, _ in docs)
+
+def bench_fix_iob(ctx, scale):
+    from t_convert_to_iob import align_tokens_to_spans, assign_iob, find_entity_spans, fix_iob
+    seqs = [assign_iob(align_tokens_to_spans(t, toks), find_entity_spans(t, d["entities"]))
+            for t, toks, d in _tokenized(ctx, scale)]
+    return seqs, fix_iob, sum(map(len, seqs))
+
+def bench_highlight_entities(ctx, scale):
+    app, ner = ctx["app"], ctx["replay"]
+    docs = scale_labeled(ctx["labeled"], scale)
+    for d in docs:
+        ner.add(d["text"], d["entities"])
+    return [d["text"] for d in docs], app.highlight_entities, sum(len(d["text"]) for d in docs)
+
+def bench_extend_date_year_span(ctx, scale):
+    app = ctx["app"]
+    from t_auto_label import regex_rules
+    args = []  # span DATE จากผล NER ที่บันทึกไว้ + จาก regex
+    for d in scale_labeled(ctx["labeled"], scale):
+        t = d["text"]
+        args.extend((t, e["start"], e["end"]) for e in d["entities"] if e["entity"] == "DATE")
+        args.extend((t, m.start(), m.end()) for m in regex_rules["DATE"].finditer(t))
+    return args, lambda a: app.extend_date_year_span(*a), sum(e - st for _, st, e in args)
+
+BENCHMARKS = {
+    "app.clean_text": bench_app_clean_text,
+    "app.clean_textv2": bench_app_clean_textv2,
+    "t_pre_clean.clean_text": bench_pre_clean_text,
+    "clean_data_v2.soft_clean": bench_soft_clean,
+    "is_valid": bench_is_valid,
+    "app.summarize_th": bench_summarize_th,
+    "t_auto_label.chunk": bench_chunk,
+    "t_auto_label.clean_word": bench_clean_word,
+    "align_tokens_to_spans": bench_align_tokens_to_spans,
+    "fix_iob": bench_fix_iob,
+    "app.highlight_entities": bench_highlight_entities,
+    "app.extend_date_year_span": bench_extend_date_year_span,
+}
+
+# -------------------------------------------------
+# วัดผล
+# -------------------------------------------------
+def measure(inputs, fn, size, min_time=0.5, max_repeat=50):
+    """เวลาดีที่สุดของการรันทั้งชุด (ทำซ้ำจนครบ min_time) + peak memory ของ 1 รอบ"""
+    best, total, reps = float("inf"), 0.0, 0
+    while reps < max_repeat and (reps < 3 or total < min_time):
+        t0 = time.perf_counter()
+        for x in inputs:
+            fn(x)
+        dt = time.perf_counter() - t0
+        best, total, reps = min(best, dt), total + dt, reps + 1
+    tracemalloc.start()
+    for x in inputs:
+        fn(x)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"ops": len(inputs), "repeats": reps, "best_s": round(best, 6),
+            "ops_per_s": round(len(inputs) / best, 2), "mb_per_s": round(size / best / 1e6, 3),
+            "peak_kb": round(peak / 1024, 1)}
+
+def compare(results, baseline, threshold):
+    """คืน list ข้อความของ benchmark ที่ ops/s ลดลง หรือ peak memory เพิ่มเกิน threshold"""
+    bad = []
+    for key, cur in results.items():
+        ref = baseline.get(key)
+        if not ref:
+            continue
+        speed = cur["ops_per_s"] / ref["ops_per_s"] - 1
+        mem = cur["peak_kb"] / max(ref["peak_kb"], 1.0) - 1
+        if speed < -threshold:
+            bad.append(f"{key}: ops/s {ref['ops_per_s']} → {cur['ops_per_s']} ({speed:+.1%})")
+        if mem > threshold and cur["peak_kb"] - ref["peak_kb"] > 64:
+            bad.append(f"{key}: peak {ref['peak_kb']} KB → {cur['peak_kb']} KB ({mem:+.1%})")
+    return bad
+
+def build_context(args):
+    ctx = {"raw": [r.get("text") or "" for r in read_jsonl(args.raw, args.limit)],
+           "labeled": read_jsonl(args.labeled, args.limit)}
+    if args.tokenizer:
+        from transformers import AutoTokenizer
+        ctx["tokenizer"] = AutoTokenizer.from_pretrained(args.tokenizer)
+    else:
+        ctx["tokenizer"] = MockTokenizer()
+    from t_tokenize_cache import TokenCache
+    ctx["token_cache"] = TokenCache()
+    # app โหลดโมเดลตอน import → สลับ load_ner_pipeline เป็น ReplayNER ก่อน (ไม่แตะโมเดลจริง)
+    os.environ.setdefault("ENTITY_INDEX", str(Path(tempfile.mkdtemp(prefix="bench_pure_")) / "entity_index.sqlite"))
+    os.environ.pop("INFER_SOCKET", None)
+    import t_ner_backend
+    ctx["replay"] = ReplayNER()
+    t_ner_backend.load_ner_pipeline = lambda *a, **k: ctx["replay"]
+    import app
+    ctx["app"] = app
+    return ctx
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--raw", default=str(ROOT_DIR / "data/t_news.jsonl"), help="ข่าวดิบ (ชุดคลีนข้อความ)")
+    ap.add_argument("--labeled", default=str(ROOT_DIR / "data/hf_labeled_news.jsonl"), help="ข่าวที่มี entities")
+    ap.add_argument("--limit", type=int, default=None)
+    ap.add_argument("--scales", nargs="+", type=int, default=[1, 4, 16], help="จำนวนข่าวที่ต่อเป็น 1 เอกสาร")
+    ap.add_argument("--only", nargs="*", default=None, help="เลือกเฉพาะ benchmark (ชื่อบางส่วนก็ได้)")
+    ap.add_argument("--tokenizer", default=None, help="ใช้ tokenizer จริงใน chunk แทน MockTokenizer")
+    ap.add_argument("--min_time", type=float, default=0.5)
+    ap.add_argument("--baseline", default=str(DEFAULT_BASELINE))
+    ap.add_argument("--save_baseline", action="store_true")
+    ap.add_argument("--compare", action="store_true")
+    ap.add_argument("--threshold", type=float, default=0.15)
+    ap.add_argument("--out", default=None, help="เขียนผลรอบนี้เป็น JSON")
+    args = ap.parse_args()
+
+    ctx = build_context(args)
+    names = [n for n in BENCHMARKS if not args.only or any(o in n for o in args.only)]
+    results = {}
+    tok_name = args.tokenizer or "mock"
+    print(f"{'benchmark':<28}{'scale':>6}{'ops':>7}{'ops/s':>12}{'MB/s':>9}{'peak KB':>11}")
+    for name in names:
+        for scale in args.scales:
+            inputs, fn, size = BENCHMARKS[name](ctx, scale)
+            r = measure(inputs, fn, size, args.min_time)
+            key = f"{name}@x{scale}" + (f"[{tok_name}]" if name == "t_auto_label.chunk" else "")
+            results[key] = r
+            print(f"{name:<28}{'x' + str(scale):>6}{r['ops']:>7}{r['ops_per_s']:>12}{r['mb_per_s']:>9}{r['peak_kb']:>11}")
+
+    ctx["token_cache"].close()
+    meta = {"time": time.strftime("%Y-%m-%d %H:%M:%S"), "python": sys.version.split()[0], "tokenizer": tok_name}
+    if args.out:
+        Path(args.out).write_text(json.dumps({"meta": meta, "results": results}, ensure_ascii=False, indent=2),
+                                  encoding="utf-8")
+    if args.save_baseline:
+        base = Path(args.baseline)
+        old = json.loads(base.read_text(encoding="utf-8"))["results"] if base.exists() else {}
+        base.write_text(json.dumps({"meta": meta, "results": {**old, **results}}, ensure_ascii=False, indent=2),
+                        encoding="utf-8")
+        print(f"📌 baseline → {base}")
+    if args.compare:
+        base = Path(args.baseline)
+        if not base.exists():
+            print(f"⚠️ ไม่พบ baseline {base} (รันด้วย --save_baseline ก่อน)")
+            return 2
+        bad = compare(results, json.loads(base.read_text(encoding="utf-8"))["results"], args.threshold)
+        for b in bad:
+            print(f"⛔ {b}")
+        print("✅ ไม่มี regression" if not bad else f"⛔ regression {len(bad)} รายการ (threshold {args.threshold:.0%})")
+        return 1 if bad else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,172 @@
+# bench_spans.py
+# เทียบ post-process ของ NER แบบ list of dict (เดิม) กับ t_spans.Spans (คอลัมน์ NumPy) บน corpus ที่ label แล้วทั้งไฟล์
+# - memory : entity เป็น dict ต่อ span vs คอลัมน์ start/end/label/score (tracemalloc, ไบต์ต่อ span)
+# - clean  : t_clean_labeled_news.clean_entities ทีละ record (ที่ main ใช้) vs clean_records (Spans ก้อนเดียวทั้ง batch)
+# - highlight : app.highlight_entities เดิม (กรองซ้อนกัน O(n²) เสมอ) vs ปัจจุบัน (วนคู่ถ้า span ≤ PRUNE_SPANS_LOOP ไม่งั้น Spans) — NER = ผลที่บันทึกไว้
+# - iob    : assign_iob + fix_iob vs Spans.iob_ids + fix_iob_ids
+# ทุกคู่ตรวจว่า output ตรงกัน; scale N = ต่อข่าว N ชิ้นเป็นเอกสารเดียว (entity ต่อเอกสารเพิ่ม N เท่า)
+#   python script/bench_spans.py --scales 1 4 16
+import argparse, gc, json, os, re, tempfile, time, tracemalloc
+from pathlib import Path
+
+from markupsafe import Markup
+
+import bench_pure
+from t_clean_labeled_news import clean_entities, clean_records
+from t_convert_to_iob import assign_iob, find_entity_spans, fix_iob
+from t_spans import Spans, fix_iob_ids, iob_names
+from t_tokenize_cache import TokenCache
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+
+def load_app():
+    """import app โดยไม่โหลดโมเดล (NER = bench_pure.ReplayNER)"""
+    os.environ.setdefault("ENTITY_INDEX", str(Path(tempfile.mkdtemp(prefix="bench_spans_")) / "entity_index.sqlite"))
+    os.environ.pop("INFER_SOCKET", None)
+    import t_ner_backend
+    replay = bench_pure.ReplayNER()
+    t_ner_backend.load_ner_pipeline = lambda *a, **k: replay
+    import app
+    return app, replay
+
+# ---------- แบบเดิม (list of dict) ----------
+def legacy_highlight(app, text):
+    raw = app.ner(text)
+    spans, total_score, total_entity = [], 0.0, 0
+    for r in raw:
+        lab = r.get("entity_group") or r.get("entity") or "O"
+        start, end = int(r.get("start", -1)), int(r.get("end", -1))
+        word = (r.get("word") or "").strip()
+        score = float(r.get("score", 0.0))
+        total_score += score
+        total_entity += 1
+        if lab == "O" or not word or start < 0 or end <= start:
+            continue
+        if lab == "DATE":
+            end = app.extend_date_year_span(text, start, end)
+            word = text[start:end].strip()
+        if len(word) < 2 or word in app.STOP_ENTS:
+            continue
+        if lab == "DATE" and word in app.STOP_DATE_WORDS:
+            continue
+        if re.fullmatch(r"[0-9,./:-]+", word):
+            continue
+        if word == "บริษัท":
+            continue
+        spans.append({"start": start, "end": end, "label": lab, "word": word, "score": score})
+    pruned = []
+    for i, a in enumerate(spans):
+        contained = False
+        for j, b in enumerate(spans):
+            if i != j and a["label"] == b["label"] and b["start"] <= a["start"] and b["end"] >= a["end"]:
+                if (b["end"] - b["start"]) > (a["end"] - a["start"]):
+                    contained = True
+                    break
+        if not contained:
+            pruned.append(a)
+    pruned.sort(key=lambda s: s["start"], reverse=True)
+    html, ent_table = text, {}
+    for sp in pruned:
+        frag = html[sp["start"]:sp["end"]]
+        color = app.LABEL_COLOR.get(sp["label"], "#f2f2f2")
+        marked = f"<mark class='ent' style='background:{color}' title='{sp['label']} ({sp['score']:.2f})'>{frag}</mark>"
+        html = html[:sp["start"]] + marked + html[sp["start"]+len(frag):]
+        ent_table.setdefault(sp["label"], []).append({"word": frag, "score": sp["score"]})
+    avg_score = total_score / total_entity if total_entity > 0 else 0.0
+    return Markup(html), ent_table, round(avg_score, 2)
+
+def legacy_iob(text, ents, spans):
+    return fix_iob(assign_iob(spans, find_entity_spans(text, ents)))
+
+def spans_iob(text, ents, spans):
+    return iob_names(fix_iob_ids(Spans.find_words(text, ents).iob_ids([s for s, _ in spans], [e for _, e in spans])))
+
+# ---------- วัดผล ----------
+def best_time(fn, repeat):
+    best, out = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+def retained(build):
+    """หน่วยความจำที่ผลของ build() ยังถือไว้ (tracemalloc current หลังสร้าง)"""
+    gc.collect()
+    tracemalloc.start()
+    obj = build()
+    cur, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del obj
+    return cur
+
+def pipeline_offsets(doc):
+    """entity ที่ offset ตรงกับ word (แบบผล HF pipeline) — ไฟล์ label เก่ามีบาง start/end เลื่อนจาก word"""
+    text, out = doc["text"], []
+    for e in doc["entities"]:
+        w = text[e["start"]:e["end"]]
+        if w.strip():
+            s = e["start"] + len(w) - len(w.lstrip())
+            t = e["end"] - len(w) + len(w.rstrip())
+            out.append({**e, "start": s, "end": t, "word": text[s:t]})
+    return {"text": text, "entities": out}
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--labeled", default=str(ROOT_DIR / "data/hf_labeled_news.jsonl"))
+    ap.add_argument("--scales", nargs="+", type=int, default=[1, 4, 16])
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--out", default=None, help="เขียนผลเป็น JSON")
+    args = ap.parse_args()
+
+    recs = bench_pure.read_jsonl(args.labeled)
+    app, replay = load_app()
+    cache = TokenCache()
+    result = {}
+    for scale in args.scales:
+        docs = [pipeline_offsets(d) for d in bench_pure.scale_labeled(recs, scale)]
+        ents = [d["entities"] for d in docs]
+        n_spans = sum(map(len, ents))
+        row = {"docs": len(docs), "spans": n_spans}
+
+        # memory: entity ที่ถือไว้ทั้ง corpus
+        as_json = [json.dumps(e, ensure_ascii=False) for e in ents]
+        dict_b = retained(lambda: [json.loads(s) for s in as_json])
+        span_b = retained(lambda: [Spans.from_entities(d["text"], d["entities"]) for d in docs])
+        row["memory"] = {"dict_bytes_per_span": round(dict_b / n_spans, 1), "spans_bytes_per_span": round(span_b / n_spans, 1)}
+
+        # clean
+        t_old, old = best_time(lambda: [clean_entities(e) for e in ents], args.repeat)
+        t_new, new = best_time(lambda: clean_records(ents), args.repeat)
+        row["clean"] = {"legacy_s": round(t_old, 4), "spans_s": round(t_new, 4), "identical": old == new}
+
+        # highlight (NER replay)
+        for d in docs:
+            replay.add(d["text"], d["entities"])
+        t_old, old = best_time(lambda: [legacy_highlight(app, d["text"]) for d in docs], args.repeat)
+        t_new, new = best_time(lambda: [app.highlight_entities(d["text"]) for d in docs], args.repeat)
+        row["highlight"] = {"legacy_s": round(t_old, 4), "spans_s": round(t_new, 4), "identical": old == new}
+
+        # IOB (ตัดคำผ่าน TokenCache ครั้งเดียว ไม่นับเวลา)
+        texts = [re.sub(r"\s+", " ", d["text"].strip()) for d in docs]
+        toks = [[(s, e) for s, e in o if t[s:e].strip()] for t, o in zip(texts, cache.offsets_many(texts))]
+        work = list(zip(texts, ents, toks))
+        t_old, old = best_time(lambda: [legacy_iob(*w) for w in work], args.repeat)
+        t_new, new = best_time(lambda: [spans_iob(*w) for w in work], args.repeat)
+        row["iob"] = {"legacy_s": round(t_old, 4), "spans_s": round(t_new, 4), "identical": old == new}
+        result[f"x{scale}"] = row
+
+        m = row["memory"]
+        print(f"📦 scale x{scale} ({len(docs)} docs, {n_spans:,} spans) "
+              f"memory {m['dict_bytes_per_span']} → {m['spans_bytes_per_span']} B/span")
+        for name in ("clean", "highlight", "iob"):
+            v = row[name]
+            print(f"   {name:<10} {v['legacy_s']:>8.3f}s → {v['spans_s']:>8.3f}s "
+                  f"({v['legacy_s'] / max(v['spans_s'], 1e-9):5.2f}x) identical={'✅' if v['identical'] else '❌'}")
+
+    if args.out:
+        Path(args.out).write_text(json.dumps(result, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"📝 → {args.out}")
+
+if __name__ == "__main__":
+    main()
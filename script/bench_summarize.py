@@ -0,0 +1,120 @@
+# bench_summarize.py
+# เทียบตัวสรุปข่าว: ความเร็ว (ข่าวจริง + ข่าวยาวสังเคราะห์ที่ต่อ N ข่าว) และคุณภาพเทียบกับพาดหัว (ROUGE-1 ระดับคำ)
+# - current  : summarize_th เดิม (เรียก pythainlp summarize ด้วย n_sentences= → TypeError ทุกครั้ง → crfcut + lead)
+# - freq     : pythainlp summarize(engine="frequency") ที่เรียกถูก (ตัดประโยคตามช่องว่าง)
+# - textrank : t_summarizer (ตัดคำครั้งเดียว + TF-IDF/PageRank ด้วย NumPy/SciPy) — --lead_prior 0 = ไม่มี prior ตำแหน่ง
+#   python script/bench_summarize.py --n_sent 3 --scales 1 4 16
+import argparse, json, time
+from pathlib import Path
+
+import numpy as np
+
+from pythainlp.summarize import summarize as pythainlp_summarize
+from pythainlp.tokenize import sent_tokenize, word_tokenize
+
+import t_summarizer
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+
+def current_summarize(text, n):
+    try:
+        s = pythainlp_summarize(text, n_sentences=n)
+        if s:
+            return s
+    except Exception:
+        pass
+    return " ".join(sent_tokenize(text)[:n])
+
+ENGINES = {
+    "current": current_summarize,
+    "freq": lambda text, n: " ".join(pythainlp_summarize(text, n=n, engine="frequency")),
+    "textrank": lambda text, n: t_summarizer.summarize(text, n)[0],
+    "textrank_noprior": lambda text, n: t_summarizer.summarize(text, n, lead_prior=0)[0],
+}
+
+def content_words(text):
+    return [w for w in (x.strip().lower() for x in word_tokenize(text, engine="newmm"))
+            if w and w not in t_summarizer.STOPWORDS and not t_summarizer.NON_TERM.fullmatch(w)]
+
+def rouge1(summary, ref_counts):
+    """ROUGE-1 (recall, f1) ระดับคำ (ตัด stopword) ของบทสรุปเทียบพาดหัว"""
+    got = {}
+    for w in content_words(summary):
+        got[w] = got.get(w, 0) + 1
+    overlap = sum(min(c, got.get(w, 0)) for w, c in ref_counts.items())
+    n_ref, n_sum = sum(ref_counts.values()), sum(got.values())
+    r = overlap / n_ref if n_ref else 0.0
+    p = overlap / n_sum if n_sum else 0.0
+    return r, (2 * p * r / (p + r) if p + r else 0.0)
+
+def quality(records, engines, n):
+    refs = []
+    for rec in records:
+        counts = {}
+        for w in content_words(rec["title"]):
+            counts[w] = counts.get(w, 0) + 1
+        refs.append(counts)
+    out = {}
+    for name in engines:
+        rs, fs, lens = [], [], []
+        for rec, ref in zip(records, refs):
+            s = ENGINES[name](rec["text"], n)
+            r, f = rouge1(s, ref)
+            rs.append(r); fs.append(f); lens.append(len(s))
+        out[name] = {"rouge1_recall": round(float(np.mean(rs)), 4), "rouge1_f1": round(float(np.mean(fs)), 4),
+                     "mean_chars": round(float(np.mean(lens)), 1)}
+    return out
+
+def speed(texts, engines, n, repeat=3):
+    """เวลาดีที่สุด (จาก repeat รอบ) ของการสรุปทั้งชุด"""
+    out = {}
+    for name in engines:
+        fn = ENGINES[name]
+        best = float("inf")
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            for t in texts:
+                fn(t, n)
+            best = min(best, time.perf_counter() - t0)
+        out[name] = {"docs": len(texts), "best_s": round(best, 4), "ms_per_doc": round(best / len(texts) * 1000, 2)}
+    return out
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--input", default=str(ROOT_DIR / "data/t_news.jsonl"))
+    ap.add_argument("--n_sent", type=int, default=5)
+    ap.add_argument("--engines", nargs="+", default=list(ENGINES), choices=list(ENGINES))
+    ap.add_argument("--scales", nargs="+", type=int, default=[1, 4, 16], help="จำนวนข่าวที่ต่อเป็น 1 เอกสาร")
+    ap.add_argument("--docs", type=int, default=20, help="จำนวนเอกสารต่อ scale ในการจับเวลา")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--out", default=None, help="เขียนผลเป็น JSON")
+    args = ap.parse_args()
+
+    with open(args.input, encoding="utf-8") as f:
+        records = [r for r in (json.loads(l) for l in f if l.strip()) if r.get("text") and r.get("title")]
+    texts = [r["text"] for r in records]
+    for fn in ENGINES.values():  # โหลด model/dict ของ pythainlp ก่อนจับเวลา
+        fn(texts[0], args.n_sent)
+
+    result = {"n_sent": args.n_sent, "quality": quality(records, args.engines, args.n_sent), "speed": {}}
+    print(f"🎯 quality vs titles ({len(records)} docs, n_sent={args.n_sent})")
+    for name, q in result["quality"].items():
+        print(f"   {name:<17} R1 recall {q['rouge1_recall']:.3f} | R1 F1 {q['rouge1_f1']:.3f} | {q['mean_chars']:>7} chars")
+
+    for scale in args.scales:
+        docs = [" ".join(texts[(i + k) % len(texts)] for k in range(scale)) for i in range(args.docs)]
+        sp = speed(docs, args.engines, args.n_sent, args.repeat)
+        result["speed"][f"x{scale}"] = sp
+        avg = sum(map(len, docs)) / len(docs)
+        base = sp.get("current", {}).get("ms_per_doc")
+        print(f"⏱️  scale x{scale} ({len(docs)} docs, ~{avg:,.0f} chars/doc)")
+        for name, v in sp.items():
+            rel = f" ({base / v['ms_per_doc']:.2f}x vs current)" if base and name != "current" else ""
+            print(f"   {name:<17} {v['ms_per_doc']:>9} ms/doc{rel}")
+
+    if args.out:
+        Path(args.out).write_text(json.dumps(result, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"📝 → {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,35 @@
 # auto_label_hf.py (fixed)
-import re, json
+import re, json, argparse
 from pathlib import Path
 from transformers import AutoTokenizer, AutoModelForTokenClassification, pipeline
 
+from t_spans import Spans
+
 INPUT_FILE = Path("data/ready_for_label_soft.jsonl")
 OUTPUT_FILE = Path("data/hf_labeled_news.jsonl")
 
 MODEL_NAME = "pythainlp/thainer-corpus-v2-base-model"  # คงไว้ตามเดิม
-print(f"🔹 Loading model: {MODEL_NAME}")
 
-tok = AutoTokenizer.from_pretrained(MODEL_NAME)
-mdl = AutoModelForTokenClassification.from_pretrained(MODEL_NAME)
+# งบ token ต่อ 1 forward pass (ไม่รวม <s> </s>) และจำนวน token ที่ให้ chunk ติดกันซ้อนทับกัน
+MAX_TOKENS = 510
+OVERLAP_TOKENS = 0
+
+tok = mdl = nlp_ner = None
 
-nlp_ner = pipeline(
-    "ner",
-    model=mdl,
-    tokenizer=tok,
-    aggregation_strategy="simple",  # คงไว้ แต่เราจะ dedupe ด้วย span
-)
+def load_model():
+    """โหลดโมเดลครั้งเดียวเมื่อถูกเรียกใช้ (import โมดูลนี้เพื่อใช้ chunk/regex ได้โดยไม่ต้องโหลดโมเดล)"""
+    global tok, mdl, nlp_ner
+    if nlp_ner is None:
+        print(f"🔹 Loading model: {MODEL_NAME}")
+        tok = AutoTokenizer.from_pretrained(MODEL_NAME)
+        mdl = AutoModelForTokenClassification.from_pretrained(MODEL_NAME)
+        nlp_ner = pipeline(
+            "ner",
+            model=mdl,
+            tokenizer=tok,
+            aggregation_strategy="simple",  # คงไว้ แต่เราจะ dedupe ด้วย span
+        )
+    return nlp_ner
 
 # Thai date/era ครอบคลุมขึ้น
 regex_rules = {
@@ -31,18 +43,101 @@ regex_rules = {
     "MONEY": re.compile(r"\d{1,3}(?:,\d{3})*(?:\.\d+)?\s?(?:บาท|ดอลลาร์|USD|THB)"),
 }
 
-def chunk(text, max_len=350):
-    sents = re.split(r'(?<=[.!?…“”\n])', text)
-    cur, out = "", []
-    for s in sents:
-        if len(cur) + len(s) <= max_len:
-            cur += s
-        else:
-            if cur.strip():
-                out.append(cur.strip())
-            cur = s
-    if cur.strip():
-        out.append(cur.strip())
+def regex_entities(text):
+    """entity จาก regex_rules ในรูปแบบเดียวกับ HF pipeline (entity_group/start/end/word/score) — ไม่ต้องโหลดโมเดล"""
+    return [{"entity_group": lab, "start": m.start(), "end": m.end(), "word": m.group(0), "score": 1.0}
+            for lab, patt in regex_rules.items() for m in patt.finditer(text)]
+
+SENT_END = re.compile(r'(?<=[.!?…“”\n])')
+WORD_PIECE = re.compile(r"\S+\s*|\s+")
+
+def split_units(text, pattern=SENT_END, start=0, end=None):
+    """แบ่ง text[start:end] ตามจุดตัดของ pattern คืน [(s, e)] ที่ต่อกันครบทุกตัวอักษร"""
+    end = len(text) if end is None else end
+    out, pos = [], start
+    for m in pattern.finditer(text, start, end):
+        if m.start() > pos:
+            out.append((pos, m.start()))
+            pos = m.start()
+    if pos < end:
+        out.append((pos, end))
+    return out
+
+def count_tokens(pieces, tokenizer):
+    """นับจำนวน subword token ของแต่ละชิ้น (ไม่รวม special tokens) ด้วย tokenizer ตัวจริงของโมเดล"""
+    if not pieces:
+        return []
+    enc = tokenizer(pieces, add_special_tokens=False)
+    return [len(ids) for ids in enc["input_ids"]]
+
+def _fit_units(text, units, budget, tokenizer, stats):
+    """ย่อยหน่วยที่ยาวเกินงบ: ประโยค → ตามช่องว่าง (ขอบประโยคแบบไทย) → ตัดตามสัดส่วนตัวอักษร"""
+    counts = count_tokens([text[s:e] for s, e in units], tokenizer)
+    out = []
+    for (s, e), n in zip(units, counts):
+        if n <= budget:
+            out.append((s, e, n))
+            continue
+        words = split_units(text, WORD_PIECE, s, e)
+        if len(words) > 1:
+            out.extend(_fit_units(text, words, budget, tokenizer, stats))
+            continue
+        # คำเดียวยาวเกินงบ (เช่น URL/ตัวเลขยาว) → หั่นตามสัดส่วน
+        step = max(1, (e - s) * budget // n)
+        pieces = [(i, min(i + step, e)) for i in range(s, e, step)]
+        stats["hard_splits"] = stats.get("hard_splits", 0) + 1
+        out.extend(_fit_units(text, pieces, budget, tokenizer, stats))
+    return out
+
+def chunk(text, tokenizer=None, max_tokens=MAX_TOKENS, overlap=OVERLAP_TOKENS, stats=None):
+    """
+    รวมประโยคทั้งประโยคเป็น chunk ให้เต็มงบ token ของโมเดลมากที่สุด (forward pass น้อยที่สุดโดยไม่โดนตัด)
+    คืน [(offset, chunk_text)] โดย offset คือตำแหน่งเริ่มของ chunk ใน text
+    overlap > 0 จะยกประโยคท้ายของ chunk ก่อนหน้า (รวมไม่เกิน overlap token) มาเป็นบริบทของ chunk ถัดไป
+    """
+    tokenizer = tokenizer or tok
+    stats = {} if stats is None else stats
+    if tokenizer is None:
+        raise RuntimeError("chunk() ต้องใช้ tokenizer: เรียก load_model() ก่อน หรือส่ง tokenizer มา")
+    budget = min(max_tokens, tokenizer.model_max_length - tokenizer.num_special_tokens_to_add())
+    units = _fit_units(text, split_units(text), budget, tokenizer, stats)
+
+    groups, cur, cur_n = [], [], 0
+    for u in units:
+        if cur and cur_n + u[2] > budget:
+            groups.append(cur)
+            keep, kept_n = [], 0
+            for v in reversed(cur):
+                if kept_n + v[2] > overlap or kept_n + v[2] + u[2] > budget:
+                    break
+                keep.insert(0, v)
+                kept_n += v[2]
+            if len(keep) == len(cur):  # กันวนซ้ำ chunk เดิม
+                keep, kept_n = [], 0
+            cur, cur_n = keep, kept_n
+        cur.append(u)
+        cur_n += u[2]
+    if cur:
+        groups.append(cur)
+
+    out = []
+    for g in groups:
+        s, e = g[0][0], g[-1][1]
+        piece = text[s:e]
+        stripped = piece.lstrip()
+        s += len(piece) - len(stripped)
+        stripped = stripped.rstrip()
+        if stripped:
+            out.append((s, stripped))
+
+    # ตรวจซ้ำทั้ง chunk: ผลรวมรายประโยคอาจคลาดจากการ tokenize ทั้งก้อนเล็กน้อย
+    n_tokens = count_tokens([c for _, c in out], tokenizer)
+    stats["docs"] = stats.get("docs", 0) + 1
+    stats["chunks"] = stats.get("chunks", 0) + len(out)
+    stats["max_chunks_per_doc"] = max(stats.get("max_chunks_per_doc", 0), len(out))
+    stats["tokens"] = stats.get("tokens", 0) + sum(n_tokens)
+    stats["truncations"] = stats.get("truncations", 0) + sum(n > budget for n in n_tokens)
+    stats["budget"] = budget
     return out
 
 def clean_word(w):
@@ -51,50 +146,64 @@ def clean_word(w):
         return None
     return w
 
-def label_text(text):
-    ents = []
-    used = set()  # span-based de-dup: (start,end,label,word)
+def label_text(text, max_tokens=MAX_TOKENS, overlap=OVERLAP_TOKENS, stats=None, memo=None):
+    # เก็บเป็นคอลัมน์ แล้ว de-dup ตาม (start,end,label) ทีเดียวตอนท้ายด้วย Spans (word = text[start:end] อยู่แล้ว)
+    starts, ends, labels, scores = [], [], [], []
 
-    # HF
-    offset = 0
-    for ch in chunk(text):
+    # HF (memo = t_ner_memo.NERMemo: ทีละประโยค รันโมเดลเฉพาะประโยคที่ยังไม่เคยเห็น)
+    ner = load_model()
+    if memo is not None:
+        units = [(off, s, [{"entity_group": lab, "word": w, "score": sc} for lab, _, _, sc, w in found])
+                 for off, s, found in memo.predict_units(text)]
+    else:
+        units = [(off, ch, None) for off, ch in chunk(text, tok, max_tokens=max_tokens, overlap=overlap, stats=stats)]
+    for offset, ch, res in units:
         try:
-            res = nlp_ner(ch)
+            if res is None:
+                res = ner(ch)
             for e in res:
                 word = clean_word(e["word"])
                 if not word:
                     continue
+                label, score = e["entity_group"], float(e["score"])
                 # หา span ตรง ๆ ในชิ้น chunk
                 for m in re.finditer(re.escape(word), ch):
-                    s, t = offset + m.start(), offset + m.end()
-                    key = (s, t, e["entity_group"], word)
-                    if key in used:
-                        continue
-                    ents.append({"entity": e["entity_group"], "word": word, "score": float(e["score"]), "start": s, "end": t})
-                    used.add(key)
+                    starts.append(offset + m.start())
+                    ends.append(offset + m.end())
+                    labels.append(label)
+                    scores.append(score)
         except Exception as ex:
             pass
-        offset += len(ch)
 
     # Regex
     for tag, patt in regex_rules.items():
         for m in patt.finditer(text):
-            s, t = m.start(), m.end()
-            word = text[s:t]
-            key = (s, t, tag, word)
-            if key in used:
-                continue
-            ents.append({"entity": tag, "word": word, "score": 1.0, "start": s, "end": t})
-            used.add(key)
+            starts.append(m.start())
+            ends.append(m.end())
+            labels.append(tag)
+            scores.append(1.0)
 
     # คืนเป็น entities (สำคัญ: ต้องใช้คีย์นี้ให้ตรงกับสเต็ปถัดไป)
-    return ents
+    return Spans.from_columns(text, starts, ends, labels, scores).dedupe().to_entities()
+
+def report_chunk_stats(stats):
+    docs = max(stats.get("docs", 0), 1)
+    chunks = stats.get("chunks", 0)
+    print(f"📊 chunks: {chunks} ({chunks / docs:.2f}/doc, max {stats.get('max_chunks_per_doc', 0)}/doc), "
+          f"token fill: {stats.get('tokens', 0) / max(chunks * stats.get('budget', 1), 1):.1%} of {stats.get('budget')} "
+          f"| truncation events: {stats.get('truncations', 0)} | hard splits: {stats.get('hard_splits', 0)}")
 
-def main():
+def main(max_tokens=MAX_TOKENS, overlap=OVERLAP_TOKENS, use_memo=False):
     if not INPUT_FILE.exists():
         print("❌ missing input")
         return
     OUTPUT_FILE.parent.mkdir(parents=True, exist_ok=True)
+    load_model()
+    stats = {}
+    memo = None
+    if use_memo:
+        from t_ner_memo import NERMemo
+        memo = NERMemo(nlp_ner, tok, max_tokens=max_tokens)
 
     with INPUT_FILE.open("r", encoding="utf-8") as fi, OUTPUT_FILE.open("w", encoding="utf-8") as fo:
         for line in fi:
@@ -102,10 +211,19 @@ def main():
             text = (obj.get("text") or "").strip()
             if not text:
                 continue
-            entities = label_text(text)
+            entities = label_text(text, max_tokens=max_tokens, overlap=overlap, stats=stats, memo=memo)
             obj["entities"] = entities  # ← เปลี่ยน labels → entities ให้เข้ากับขั้นตอนถัดไป
             fo.write(json.dumps(obj, ensure_ascii=False) + "\n")
+    if memo:
+        print(memo.report())
+    else:
+        report_chunk_stats(stats)
     print(f"✅ wrote: {OUTPUT_FILE}")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--max_tokens", type=int, default=MAX_TOKENS)
+    parser.add_argument("--overlap", type=int, default=OVERLAP_TOKENS)
+    parser.add_argument("--memo", action="store_true", help="รัน NER ทีละประโยคผ่าน memo (ประโยคซ้ำไม่ต้องรันโมเดล)")
+    args = parser.parse_args()
+    main(max_tokens=args.max_tokens, overlap=args.overlap, use_memo=args.memo)
@@ -0,0 +1,45 @@
+# t_batch_analyze.py
+# วิเคราะห์ข่าวหลายลิงก์ / ทั้ง RSS feed จาก command line (ใช้ขั้นตอนเดียวกับหน้าเว็บใน app.py)
+# ผลออกเป็น JSON lines ทีละข่าวทันทีที่เสร็จ
+#   python script/t_batch_analyze.py URL1 URL2 ...
+#   python script/t_batch_analyze.py --rss https://www.matichon.co.th/feed --limit 30 > out.jsonl
+#   python script/t_batch_analyze.py --file urls.txt
+import argparse, json, sys, time
+
+from app import BATCH_FETCH_WORKERS, BATCH_INFER_WORKERS, BATCH_MAX_URLS, analyze_many, feed_urls
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("urls", nargs="*")
+    ap.add_argument("--rss", action="append", default=[], help="RSS feed (ระบุซ้ำได้)")
+    ap.add_argument("--file", help="ไฟล์ลิงก์ บรรทัดละ 1 ลิงก์")
+    ap.add_argument("--limit", type=int, default=BATCH_MAX_URLS, help="จำนวนลิงก์สูงสุดต่อ feed")
+    ap.add_argument("--n_sent", type=int, default=5)
+    ap.add_argument("--fetch_workers", type=int, default=BATCH_FETCH_WORKERS)
+    ap.add_argument("--infer_workers", type=int, default=BATCH_INFER_WORKERS)
+    ap.add_argument("--out", help="เขียนผลลงไฟล์แทน stdout")
+    args = ap.parse_args()
+
+    urls = list(args.urls)
+    if args.file:
+        with open(args.file, encoding="utf-8") as f:
+            urls += [l.strip() for l in f if l.strip() and not l.startswith("#")]
+    for rss in args.rss:
+        urls += feed_urls(rss, args.limit)
+    if not urls:
+        ap.error("ต้องระบุลิงก์ --file หรือ --rss อย่างน้อย 1 อย่าง")
+
+    out = open(args.out, "w", encoding="utf-8") if args.out else sys.stdout
+    n_ok = n = 0
+    t0 = time.perf_counter()
+    for item in analyze_many(urls, n_sent=args.n_sent, fetch_workers=args.fetch_workers,
+                             infer_workers=args.infer_workers):
+        out.write(json.dumps(item, ensure_ascii=False) + "\n")
+        out.flush()
+        n += 1; n_ok += item["ok"]
+    if args.out:
+        out.close()
+    print(f"✅ {n_ok}/{n} ข่าว ใน {time.perf_counter() - t0:.1f}s", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
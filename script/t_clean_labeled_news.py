@@ -1,8 +1,11 @@
 # clean_labeled_news_hf.py (fixed)
 import json, re, unicodedata
 from pathlib import Path
+import numpy as np
 from pythainlp.util import normalize
 
+from t_spans import Spans
+
 INPUT = Path("data/hf_labeled_news.jsonl")
 OUTPUT = Path("data/hf_labeled_news_clean.jsonl")
 
@@ -47,7 +50,37 @@ def clean_entities(entities):
         cleaned.append({"entity": label, "word": word, "score": round(score,3)})
     return cleaned
 
+def clean_spans(spans):
+    """clean_entities บน Spans (กรองเป็น mask บนคอลัมน์ในที่เดิม) — ลำดับกฎเดียวกันทุกข้อ"""
+    spans.strip()
+    spans.keep(spans.is_label(*VALID_LABELS))
+    spans.drop_words(STOPWORDS)
+    spans.relabel(spans.word_mask(FAKE_NAMES, labels=["PERSON"]), "ORGANIZATION")
+    spans.keep(spans.score >= spans.thresholds(THRESHOLD, 0.7))
+    spans.keep((spans.lengths > 1) | spans.is_label("DATE", "TIME", "LAW"))
+    spans.strip("([{", ")]}")
+    return spans.strip()
+
+def clean_records(entity_lists):
+    """
+    clean_entities ของหลาย record ในครั้งเดียว: ต่อ entity ทุก record เป็น Spans ก้อนเดียว (Spans.from_words)
+    แล้วแบ่งกลับตามขอบ record — ผลเท่ากับ [clean_entities(ents) for ents in entity_lists]
+    """
+    flat = [e for ents in entity_lists for e in ents or []]
+    counts = np.fromiter((len(ents or []) for ents in entity_lists), dtype=np.int64, count=len(entity_lists))
+    spans = Spans.from_words(flat)
+    bases = spans.start[np.minimum(np.cumsum(counts) - counts, max(len(flat) - 1, 0))] if len(flat) else counts
+    bases = np.where(counts > 0, bases, np.iinfo(np.int32).max)
+    clean_spans(spans)
+    # record ที่ไม่มี entity ให้ขอบ = ขอบของ record ถัดไป (ย้อนจากท้าย)
+    bases = np.minimum.accumulate(bases[::-1])[::-1]
+    cuts = np.searchsorted(spans.start, bases)
+    rows = [{"entity": e["label"], "word": " ".join(e["word"].split()), "score": round(e["score"], 3)}
+            for e in spans.to_dicts()]
+    return [rows[a:b] for a, b in zip(cuts.tolist(), cuts[1:].tolist() + [len(rows)])]
+
 def main():
+    # ทีละ record ด้วย clean_entities: clean_records (Spans ทั้ง batch) เร็วกว่าไม่สม่ำเสมอ (~1.1x ± noise) ไม่คุ้มกับงาน offline นี้
     OUTPUT.parent.mkdir(parents=True, exist_ok=True)
     n_total = n_clean = 0
     with INPUT.open(encoding="utf-8") as f, OUTPUT.open("w", encoding="utf-8") as w:
@@ -1,20 +1,63 @@
 # convert_to_iob_hf.py (fixed)
-import json, re
+import json
+from bisect import bisect_left, bisect_right
 from pathlib import Path
-from pythainlp.tokenize import word_tokenize
+from itertools import islice
+
+from t_spans import Spans, fix_iob_ids, iob_names
+from t_tokenize_cache import TokenCache, DEFAULT_PATH as DEFAULT_CACHE, normalize_space
 
 def align_tokens_to_spans(text, tokens):
+    """หา (start,end) ของแต่ละ token ใน text แบบเดินหน้าทางเดียว (str.find จาก cur ไม่ต้อง slice text ใหม่)"""
     spans, cur = [], 0
     for tok in tokens:
-        m = re.search(re.escape(tok), text[cur:])
-        if m:
-            s = cur + m.start(); e = cur + m.end()
+        s = text.find(tok, cur)
+        if s >= 0:
+            e = s + len(tok)
         else:
             s = cur; e = cur + len(tok)
         spans.append((s,e))
         cur = e
     return spans
 
+def find_entity_spans(text, ents):
+    """(start,end,label) ของทุกตำแหน่งที่คำ entity ปรากฏใน text ตามลำดับ entity เดิม (คำซ้ำค้นครั้งเดียว)"""
+    es, occ = [], {}
+    for e in ents:
+        w = (e.get("word") or "").strip()
+        lab = (e.get("entity") or "").strip().upper()
+        if not w or not lab:
+            continue
+        hits = occ.get(w)
+        if hits is None:
+            hits, i = [], text.find(w)
+            while i >= 0:
+                hits.append(i)
+                i = text.find(w, i + len(w))
+            occ[w] = hits
+        es.extend((i, i + len(w), lab) for i in hits)
+    return es
+
+def assign_iob(spans, es):
+    """
+    ติด IOB ให้ token ที่ overlap กับ entity ≥ 0.5 ของความยาว token
+    spans เรียงและไม่ซ้อนกัน → หา token ที่ชนแต่ละ entity ด้วย bisect แทนการไล่ทุก token
+    entity ที่ซ้อนกัน: ตัวที่มาทีหลังใน es ชนะ (เหมือนการเขียนทับแบบเดิม)
+    """
+    starts = [a for a, _ in spans]
+    ends = [b for _, b in spans]
+    labels = ["O"] * len(spans)
+    for s, t, lab in es:
+        lo, hi = bisect_right(ends, s), bisect_left(starts, t)
+        first = True
+        for i in range(lo, hi):
+            a, b = spans[i]
+            inter = min(b, t) - max(a, s)
+            if inter > 0 and inter >= 0.5 * (b - a):
+                labels[i] = f"{'B' if first else 'I'}-{lab}"
+                first = False
+    return labels
+
 def fix_iob(tags):
     fixed, prev = [], "O"
     for t in tags:
@@ -23,47 +66,36 @@ def fix_iob(tags):
         fixed.append(t); prev = t
     return fixed
 
-def main(inp="data/hf_labeled_news_clean.jsonl", outp="data/hf_ner_dataset_iob.txt"):
+def convert_records(recs, cache, workers=None):
+    """
+    คืน (tokens, labels) ของแต่ละ record; ตัดคำผ่าน TokenCache (ข้อความเดิมไม่ต้องตัดซ้ำ)
+    ติด tag ด้วย t_spans (คอลัมน์ NumPy) — ผลเท่ากับ fix_iob(assign_iob(spans, find_entity_spans(...)))
+    """
+    texts = [normalize_space(rec.get("text")) for rec in recs]
+    for rec, text, offs in zip(recs, texts, cache.offsets_many(texts, workers=workers)):
+        spans = [(s, e) for s, e in offs if text[s:e].strip()]
+        tokens = [text[s:e] for s, e in spans]
+        ents = Spans.find_words(text, rec.get("entities", []))
+        tags = ents.iob_ids([s for s, _ in spans], [e for _, e in spans])
+        yield tokens, iob_names(fix_iob_ids(tags))
+
+def main(inp="data/hf_labeled_news_clean.jsonl", outp="data/hf_ner_dataset_iob.txt",
+         cache_path=DEFAULT_CACHE, workers=None, batch=512):
     inp, outp = Path(inp), Path(outp)
     outp.parent.mkdir(parents=True, exist_ok=True)
+    cache = TokenCache(cache_path, engine="newmm")
 
     with inp.open(encoding="utf-8") as fi, outp.open("w", encoding="utf-8") as fo:
-        for line in fi:
-            rec = json.loads(line)
-            text = re.sub(r"\s+", " ", (rec.get("text") or "").strip())
-            ents = rec.get("entities", [])
-            tokens = [t for t in word_tokenize(text, engine="newmm") if t.strip()]
-            spans = align_tokens_to_spans(text, tokens)
-            labels = ["O"] * len(tokens)
-
-            # เตรียม entity spans ทั้งหมด (start,end,label)
-            es = []
-            for e in ents:
-                w = (e.get("word") or "").strip()
-                lab = (e.get("entity") or "").strip().upper()
-                if not w or not lab:
-                    continue
-                for m in re.finditer(re.escape(w), text):
-                    es.append((m.start(), m.end(), lab))
-
-            # ทำ labeling แบบ overlap ≥ 0.5
-            for s, t, lab in es:
-                touched = []
-                for i, (a,b) in enumerate(spans):
-                    inter = max(0, min(b, t) - max(a, s))
-                    if inter > 0 and inter >= 0.5 * (b - a):
-                        touched.append(i)
-                if not touched:
-                    continue
-                labels[touched[0]] = f"B-{lab}"
-                for i in touched[1:]:
-                    labels[i] = f"I-{lab}"
-
-            labels = fix_iob(labels)
-            for tok, lab in zip(tokens, labels):
-                fo.write(f"{tok}\t{lab}\n")
-            fo.write("\n")
-    print(f"✅ wrote IOB to {outp}")
+        while True:
+            recs = [json.loads(l) for l in islice(fi, batch)]
+            if not recs:
+                break
+            for tokens, labels in convert_records(recs, cache, workers):
+                for tok, lab in zip(tokens, labels):
+                    fo.write(f"{tok}\t{lab}\n")
+                fo.write("\n")
+    print(f"✅ wrote IOB to {outp} (token cache hit {cache.hits}, miss {cache.misses})")
+    cache.close()
 
 if __name__ == "__main__":
     main()
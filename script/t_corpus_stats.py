@@ -0,0 +1,405 @@
+# t_corpus_stats.py
+# สถิติ corpus ก่อนเทรน (อ่าน JSONL รอบเดียวแบบ streaming): จำนวน entity ต่อ label, การกระจายของ score เทียบ THRESHOLD
+# (t_clean_labeled_news.py), จำนวน token ต่อเอกสาร, สัดส่วน tag ที่ fix_iob ต้องซ่อม, คำ/เอกสารไม่ซ้ำ (HyperLogLog)
+# - แบ่งไฟล์เป็นช่วง byte (ตัดตรงขอบบรรทัด) → แต่ละ process ทำ sketch ของช่วงตัวเอง → merge (ผลเท่ากับรันรอบเดียว)
+# - incremental: จำ byte ที่อ่านถึงไว้ใน state (--state) รอบถัดไปอ่านเฉพาะบรรทัดที่ต่อท้ายใหม่ (ไฟล์ถูกเขียนทับ = เริ่มใหม่)
+#   python script/t_corpus_stats.py data/hf_labeled_news.jsonl data/hf_labeled_news_clean.jsonl --html stats.html
+#   python script/t_corpus_stats.py data/hf_labeled_news.jsonl --no_tokens     (ไม่ตัดคำ: ข้ามสถิติ token / IOB)
+import argparse, base64, hashlib, html, json, math, os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from t_clean_labeled_news import THRESHOLD
+from t_spans import Spans, fix_iob_ids
+from t_tokenize_cache import DEFAULT_PATH as DEFAULT_CACHE, normalize_space
+
+DEFAULT_STATE = Path("data/cache/corpus_stats.json")
+STATE_VERSION = 1
+SCORE_EDGES = [i / 20 for i in range(21)]
+TOKEN_EDGES = [0, 50, 100, 200, 300, 500, 750, 1000, 1500, 2000, 3000, 5000, 10000]
+HEAD_BYTES = 4096   # ใช้ตรวจว่าไฟล์ถูกเขียนทับ (ไม่ใช่แค่ต่อท้าย)
+
+# -------------------------------------------------
+# sketches (merge ได้ + เก็บลง JSON ได้)
+# -------------------------------------------------
+class HyperLogLog:
+    """นับจำนวนค่าไม่ซ้ำแบบประมาณ: 2^p registers (p=12 → 4 KB, error ≈ 1.6%) merge = max ราย register"""
+
+    def __init__(self, p=12, registers=None):
+        self.p = p
+        self.m = 1 << p
+        self.reg = np.zeros(self.m, dtype=np.uint8) if registers is None else registers
+
+    def add(self, item):
+        h = int.from_bytes(hashlib.blake2b(item.encode("utf-8"), digest_size=8).digest(), "big")
+        rest_bits = 64 - self.p
+        rest = h & ((1 << rest_bits) - 1)
+        rank = rest_bits - rest.bit_length() + 1
+        i = h >> rest_bits
+        if rank > self.reg[i]:
+            self.reg[i] = rank
+
+    def merge(self, other):
+        np.maximum(self.reg, other.reg, out=self.reg)
+        return self
+
+    def count(self):
+        alpha = 0.7213 / (1 + 1.079 / self.m)
+        est = alpha * self.m * self.m / float(np.sum(np.ldexp(1.0, -self.reg.astype(np.int32))))
+        zeros = int(np.count_nonzero(self.reg == 0))
+        if est <= 2.5 * self.m and zeros:
+            est = self.m * math.log(self.m / zeros)   # linear counting ช่วงค่าน้อย
+        return est
+
+    def to_state(self):
+        return {"p": self.p, "reg": base64.b64encode(self.reg.tobytes()).decode()}
+
+    @classmethod
+    def from_state(cls, st):
+        return cls(st["p"], np.frombuffer(base64.b64decode(st["reg"]), dtype=np.uint8).copy())
+
+class Histogram:
+    """ช่วงคงที่ (edges) — ค่าเกินช่วงสุดท้ายนับรวมในช่องสุดท้าย + เก็บ sum/min/max ไว้คิดค่าเฉลี่ย"""
+
+    def __init__(self, edges, counts=None, total=0.0, lo=None, hi=None):
+        self.edges = list(edges)
+        self.counts = list(counts) if counts is not None else [0] * (len(self.edges) - 1)
+        self.total, self.lo, self.hi = total, lo, hi
+
+    @property
+    def n(self):
+        return sum(self.counts)
+
+    def add(self, x):
+        i = int(np.searchsorted(self.edges, x, side="right")) - 1
+        self.counts[min(max(i, 0), len(self.counts) - 1)] += 1
+        self.total += x
+        self.lo = x if self.lo is None else min(self.lo, x)
+        self.hi = x if self.hi is None else max(self.hi, x)
+
+    def merge(self, other):
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.total += other.total
+        for attr, pick in (("lo", min), ("hi", max)):
+            vals = [v for v in (getattr(self, attr), getattr(other, attr)) if v is not None]
+            setattr(self, attr, pick(vals) if vals else None)
+        return self
+
+    def mean(self):
+        return self.total / self.n if self.n else None
+
+    def quantile(self, q):
+        """ประมาณ quantile โดยสมมติค่ากระจายสม่ำเสมอในแต่ละช่อง"""
+        n = self.n
+        if not n:
+            return None
+        target, acc = q * n, 0
+        for i, c in enumerate(self.counts):
+            if c and acc + c >= target:
+                lo, hi = self.edges[i], self.edges[i + 1]
+                if i == len(self.counts) - 1 and self.hi is not None:
+                    hi = max(hi, self.hi)
+                return lo + (hi - lo) * (target - acc) / c
+            acc += c
+        return self.hi
+
+    def to_state(self):
+        return {"edges": self.edges, "counts": self.counts, "total": self.total, "lo": self.lo, "hi": self.hi}
+
+    @classmethod
+    def from_state(cls, st):
+        return cls(st["edges"], st["counts"], st["total"], st["lo"], st["hi"])
+
+class CorpusStats:
+    """sketch ของ record ชุดหนึ่ง (1 shard หรือทั้งไฟล์) — merge กันได้ทุกฟิลด์"""
+
+    def __init__(self):
+        self.counts = Counter()          # docs / chars / bad_lines / iob_* ...
+        self.ents = Counter()            # label → จำนวน entity
+        self.kept = Counter()            # label → score ≥ THRESHOLD
+        self.ent_docs = Counter()        # label → จำนวนเอกสารที่มี label นี้
+        self.scores = {}                 # label → Histogram ของ score
+        self.words = {}                  # label → HyperLogLog ของคำ
+        self.docs = HyperLogLog()        # ข้อความไม่ซ้ำ
+        self.tokens = Histogram(TOKEN_EDGES)
+
+    def add(self, rec, offsets=None):
+        text = rec.get("text") or ""
+        ents = rec.get("entities") or []
+        self.counts["docs"] += 1
+        self.counts["chars"] += len(text)
+        self.docs.add(text)
+        seen = set()
+        for e in ents:
+            lab = (e.get("entity") or "").strip().upper()
+            word = (e.get("word") or "").strip()
+            if not lab:
+                continue
+            score = float(e.get("score", 1.0))
+            self.ents[lab] += 1
+            self.kept[lab] += score >= THRESHOLD.get(lab, 0.7)
+            self.scores.setdefault(lab, Histogram(SCORE_EDGES)).add(score)
+            self.words.setdefault(lab, HyperLogLog()).add(word)
+            seen.add(lab)
+        self.ent_docs.update(seen)
+        if offsets is not None:
+            self._add_tokens(text, offsets, ents)
+
+    def _add_tokens(self, text, offsets, ents):
+        """text/offsets ตาม t_convert_to_iob.convert_records (ช่องว่างยุบแล้ว, ตัด token ช่องว่างทิ้ง)"""
+        spans = [(s, e) for s, e in offsets if text[s:e].strip()]
+        self.tokens.add(len(spans))
+        raw = Spans.find_words(text, ents).iob_ids([s for s, _ in spans], [e for _, e in spans])
+        fixed = fix_iob_ids(raw)
+        changed = int((raw != fixed).sum())
+        self.counts["iob_tokens"] += len(raw)
+        self.counts["iob_entity_tokens"] += int((fixed > 0).sum())
+        self.counts["iob_repaired"] += changed
+        self.counts["iob_docs_repaired"] += changed > 0
+
+    def merge(self, other):
+        self.counts.update(other.counts)
+        self.ents.update(other.ents)
+        self.kept.update(other.kept)
+        self.ent_docs.update(other.ent_docs)
+        for lab, h in other.scores.items():
+            self.scores.setdefault(lab, Histogram(SCORE_EDGES)).merge(h)
+        for lab, h in other.words.items():
+            self.words.setdefault(lab, HyperLogLog()).merge(h)
+        self.docs.merge(other.docs)
+        self.tokens.merge(other.tokens)
+        return self
+
+    def to_state(self):
+        return {"counts": dict(self.counts), "ents": dict(self.ents), "kept": dict(self.kept),
+                "ent_docs": dict(self.ent_docs),
+                "scores": {k: v.to_state() for k, v in self.scores.items()},
+                "words": {k: v.to_state() for k, v in self.words.items()},
+                "docs": self.docs.to_state(), "tokens": self.tokens.to_state()}
+
+    @classmethod
+    def from_state(cls, st):
+        out = cls()
+        out.counts, out.ents = Counter(st["counts"]), Counter(st["ents"])
+        out.kept, out.ent_docs = Counter(st["kept"]), Counter(st["ent_docs"])
+        out.scores = {k: Histogram.from_state(v) for k, v in st["scores"].items()}
+        out.words = {k: HyperLogLog.from_state(v) for k, v in st["words"].items()}
+        out.docs, out.tokens = HyperLogLog.from_state(st["docs"]), Histogram.from_state(st["tokens"])
+        return out
+
+    def report(self):
+        c = self.counts
+        docs = c["docs"]
+        labels = {}
+        for lab in sorted(self.ents, key=lambda k: -self.ents[k]):
+            h = self.scores[lab]
+            labels[lab] = {
+                "count": self.ents[lab],
+                "per_doc": round(self.ents[lab] / docs, 3) if docs else None,
+                "docs_with_label": self.ent_docs[lab],
+                "distinct_words": round(self.words[lab].count()),
+                "threshold": THRESHOLD.get(lab, 0.7),
+                "kept": self.kept[lab],
+                "kept_rate": round(self.kept[lab] / self.ents[lab], 4),
+                "score_mean": round(h.mean(), 4),
+                "score_p10": round(h.quantile(0.1), 4),
+                "score_p50": round(h.quantile(0.5), 4),
+                "score_hist": h.counts,
+            }
+        out = {
+            "docs": docs,
+            "bad_lines": c["bad_lines"],
+            "distinct_docs": round(min(self.docs.count(), docs)),
+            "chars_per_doc": round(c["chars"] / docs, 1) if docs else None,
+            "entities": sum(self.ents.values()),
+            "labels": labels,
+            "score_edges": SCORE_EDGES,
+        }
+        if self.tokens.n:
+            out["tokens"] = {"docs": self.tokens.n, "per_doc": round(self.tokens.mean(), 1),
+                             "p50": round(self.tokens.quantile(0.5)), "p90": round(self.tokens.quantile(0.9)),
+                             "max": self.tokens.hi, "edges": TOKEN_EDGES, "hist": self.tokens.counts}
+            ent_tok = c["iob_entity_tokens"]
+            out["iob"] = {"tokens": c["iob_tokens"], "entity_tokens": ent_tok, "repaired": c["iob_repaired"],
+                          "repair_rate": round(c["iob_repaired"] / ent_tok, 4) if ent_tok else 0.0,
+                          "docs_repaired": c["iob_docs_repaired"],
+                          "docs_repaired_rate": round(c["iob_docs_repaired"] / self.tokens.n, 4)}
+        return out
+
+# -------------------------------------------------
+# shard: ช่วง byte [start, end) ของไฟล์ — บรรทัดเป็นของ shard ที่ byte แรกของบรรทัดตกอยู่
+# -------------------------------------------------
+def plan_shards(begin, end, workers, min_bytes=256 * 1024):
+    n = max(1, min(workers, (end - begin) // min_bytes))
+    step = math.ceil((end - begin) / n) if end > begin else 0
+    return [(begin + i * step, min(begin + (i + 1) * step, end)) for i in range(n) if begin + i * step < end]
+
+def _shard_stats(job):
+    path, begin, start, end, tokens, cache_path = job
+    stats = CorpusStats()
+    cache = None
+    if tokens:
+        from t_tokenize_cache import TokenCache
+        cache = TokenCache(cache_path, engine="newmm")
+    batch = []
+
+    def flush():
+        if not batch:
+            return
+        if cache:
+            texts = [normalize_space(r.get("text")) for r in batch]
+            for rec, text, offs in zip(batch, texts, cache.offsets_many(texts, workers=1)):
+                stats.add({**rec, "text": text}, offs)
+        else:
+            for rec in batch:
+                stats.add(rec)
+        batch.clear()
+
+    with open(path, "rb") as f:
+        f.seek(start)
+        if start > begin:
+            f.seek(start - 1)
+            f.readline()   # ข้ามบรรทัดที่เริ่มก่อน start (เป็นของ shard ก่อนหน้า)
+        while f.tell() < end:
+            line = f.readline()
+            if not line:
+                break
+            if not line.strip():
+                continue
+            try:
+                batch.append(json.loads(line))
+            except ValueError:
+                stats.counts["bad_lines"] += 1
+                continue
+            if len(batch) >= 256:
+                flush()
+        flush()
+    if cache:
+        cache.close()
+    return stats.to_state()
+
+def complete_end(path):
+    """ตำแหน่งหลัง '\\n' ตัวสุดท้าย (บรรทัดท้ายที่ยังเขียนไม่จบไม่นับ รอรอบหน้า)"""
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        pos = size
+        while pos > 0:
+            k = min(65536, pos)
+            f.seek(pos - k)
+            block = f.read(k)
+            i = block.rfind(b"\n")
+            if i >= 0:
+                return pos - k + i + 1
+            pos -= k
+    return 0
+
+def head_hash(path, n):
+    with open(path, "rb") as f:
+        return hashlib.blake2b(f.read(min(n, HEAD_BYTES)), digest_size=16).hexdigest()
+
+def update_file(path, prev, workers, tokens, cache_path):
+    """
+    prev = state เดิมของไฟล์นี้ (หรือ None) → คืน (state ใหม่, จำนวน byte ที่อ่านรอบนี้)
+    ไฟล์ต่อท้ายอย่างเดียว (ขนาดไม่ลด + head เดิม + โหมด tokens เดิม) → อ่านต่อจาก offset เดิมแล้ว merge
+    """
+    end = complete_end(path)
+    begin, stats = 0, CorpusStats()
+    if (prev and prev.get("version") == STATE_VERSION and prev.get("tokens") == tokens
+            and prev["offset"] <= end and prev["head"] == head_hash(path, prev["offset"])):
+        begin, stats = prev["offset"], CorpusStats.from_state(prev["stats"])
+    shards = plan_shards(begin, end, workers)
+    jobs = [(str(path), begin, s, e, tokens, str(cache_path)) for s, e in shards]
+    if len(jobs) > 1:
+        with ProcessPoolExecutor(min(workers, len(jobs))) as ex:
+            parts = list(ex.map(_shard_stats, jobs))
+    else:
+        parts = [_shard_stats(j) for j in jobs]
+    for st in parts:
+        stats.merge(CorpusStats.from_state(st))
+    state = {"version": STATE_VERSION, "offset": end, "head": head_hash(path, end), "tokens": tokens,
+             "stats": stats.to_state()}
+    return state, stats, end - begin, len(shards)
+
+# -------------------------------------------------
+# HTML report
+# -------------------------------------------------
+def _bars(counts, edges, fmt="{:g}", marker=None):
+    top = max(counts) or 1
+    rows = []
+    for i, c in enumerate(counts):
+        lo, hi = edges[i], edges[i + 1]
+        below = marker is not None and hi <= marker
+        rows.append(f"<tr><td class='r'>{fmt.format(lo)}–{fmt.format(hi)}</td><td>{c}</td>"
+                    f"<td><div class='bar{' low' if below else ''}' style='width:{200 * c / top:.0f}px'></div></td></tr>")
+    return "<table class='hist'>" + "".join(rows) + "</table>"
+
+def render_html(reports):
+    parts = []
+    for path, r in reports.items():
+        parts.append(f"<h2>{html.escape(path)}</h2><p class='meta'>docs {r['docs']:,} (ไม่ซ้ำ ≈ {r['distinct_docs']:,}) "
+                     f"| {r['chars_per_doc']} ตัวอักษร/เอกสาร | entities {r['entities']:,} | bad lines {r['bad_lines']}</p>")
+        if "tokens" in r:
+            t, iob = r["tokens"], r["iob"]
+            parts.append(f"<p class='meta'>tokens/doc เฉลี่ย {t['per_doc']} (p50 {t['p50']}, p90 {t['p90']}, max {t['max']}) "
+                         f"| IOB repair {iob['repaired']:,}/{iob['entity_tokens']:,} entity tokens ({iob['repair_rate']:.2%}) "
+                         f"ใน {iob['docs_repaired']:,} เอกสาร ({iob['docs_repaired_rate']:.1%})</p>")
+            parts.append("<details><summary>tokens ต่อเอกสาร</summary>" + _bars(t["hist"], t["edges"], "{}") + "</details>")
+        rows = "".join(
+            f"<tr><td>{html.escape(lab)}</td><td>{v['count']:,}</td><td>{v['per_doc']}</td><td>{v['docs_with_label']:,}</td>"
+            f"<td>{v['distinct_words']:,}</td><td>{v['threshold']}</td><td>{v['kept_rate']:.1%}</td>"
+            f"<td>{v['score_mean']}</td><td>{v['score_p10']}</td></tr>" for lab, v in r["labels"].items())
+        parts.append("<table><tr><th>label</th><th>entities</th><th>/doc</th><th>docs</th><th>คำไม่ซ้ำ≈</th>"
+                     "<th>THRESHOLD</th><th>ผ่าน</th><th>score เฉลี่ย</th><th>p10</th></tr>" + rows + "</table>")
+        for lab, v in r["labels"].items():
+            parts.append(f"<details><summary>score {html.escape(lab)} (แถบสีแดง = ต่ำกว่า THRESHOLD {v['threshold']})</summary>"
+                         + _bars(v["score_hist"], r["score_edges"], "{:.2f}", v["threshold"]) + "</details>")
+    return ("<!doctype html><html lang='th'><head><meta charset='utf-8'><title>corpus stats</title><style>"
+            "body{font-family:system-ui,sans-serif;max-width:1000px;margin:30px auto;padding:0 16px}"
+            "table{border-collapse:collapse;margin:8px 0}td,th{border-bottom:1px solid #eee;padding:3px 10px;text-align:left}"
+            ".meta{color:#555}.r{text-align:right;color:#666}.bar{height:12px;background:#6aa9ff;border-radius:3px}"
+            ".bar.low{background:#ff8a8a}.hist td{border:0;padding:1px 8px}</style></head><body><h1>📊 corpus stats</h1>"
+            + "".join(parts) + "</body></html>")
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("inputs", nargs="*", default=["data/hf_labeled_news.jsonl"])
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--no_tokens", action="store_true", help="ไม่ตัดคำ (ข้าม tokens/doc และ IOB repair)")
+    ap.add_argument("--cache", default=str(DEFAULT_CACHE), help="token cache (t_tokenize_cache)")
+    ap.add_argument("--state", default=str(DEFAULT_STATE), help="state สำหรับ incremental (ว่าง = คิดใหม่ทุกครั้ง)")
+    ap.add_argument("--json", default=None, help="เขียนรายงานเป็น JSON")
+    ap.add_argument("--html", default=None, help="เขียนรายงานเป็น HTML")
+    args = ap.parse_args()
+
+    state_path = Path(args.state) if args.state else None
+    state = {}
+    if state_path and state_path.exists():
+        state = json.loads(state_path.read_text(encoding="utf-8"))
+
+    reports = {}
+    for inp in args.inputs:
+        key = str(Path(inp).resolve())
+        st, stats, read, n_shards = update_file(inp, state.get(key), args.workers, not args.no_tokens, args.cache)
+        state[key] = st
+        reports[inp] = r = stats.report()
+        print(f"📄 {inp}: {r['docs']:,} docs (+{read:,} bytes ใน {n_shards} shard) | entities {r['entities']:,}"
+              + (f" | tokens/doc {r['tokens']['per_doc']} | IOB repair {r['iob']['repair_rate']:.2%}" if "tokens" in r else ""))
+        for lab, v in r["labels"].items():
+            print(f"   {lab:<13} {v['count']:>7,} | ≥THRESHOLD {v['kept_rate']:>6.1%} | score p50 {v['score_p50']:.3f} "
+                  f"| คำไม่ซ้ำ≈ {v['distinct_words']:,}")
+
+    if state_path:
+        state_path.parent.mkdir(parents=True, exist_ok=True)
+        state_path.write_text(json.dumps(state), encoding="utf-8")
+    if args.json:
+        Path(args.json).write_text(json.dumps(reports, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"📝 → {args.json}")
+    if args.html:
+        Path(args.html).write_text(render_html(reports), encoding="utf-8")
+        print(f"📝 → {args.html}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+# t_deadline.py
+# งบเวลาต่อ request + admission control + ตัวนับ metrics ของ app
+# - Deadline: งบเวลาทั้ง request ส่งต่อทุกขั้น (fetch / summarize / ner / infer) → แต่ละขั้นดูเวลาที่เหลือก่อนเริ่ม
+# - Admission: จำกัดงานวิเคราะห์ที่รันพร้อมกัน + คิวรอจำกัดขนาด (เต็ม/รอนานเกิน = ตัดทิ้งทันที ไม่ให้ทั้งเซิร์ฟเวอร์ค้าง)
+# - Metrics: ตัวนับเหตุการณ์ (shed / degrade / deadline) + ค่าเฉลี่ยเคลื่อนที่ของเวลาแต่ละขั้นไว้ประเมินว่างบพอไหม
+import threading, time
+from collections import Counter
+
+class Overloaded(RuntimeError):
+    """คิวรอเต็ม หรือรอคิวจนงบเวลาหมด → ตอบ 503 ทันที"""
+
+    def __init__(self, reason, retry_after=2):
+        super().__init__(reason)
+        self.reason, self.retry_after = reason, retry_after
+
+class DeadlineExceeded(TimeoutError):
+    """งบเวลาที่เหลือไม่พอจะเริ่มขั้นถัดไป"""
+
+class Deadline:
+    """เวลาสิ้นสุดของ request (monotonic) — budget=None = ไม่จำกัด"""
+
+    def __init__(self, budget=None):
+        self.budget = budget
+        self.at = None if budget is None else time.monotonic() + budget
+
+    def remaining(self):
+        return float("inf") if self.at is None else max(0.0, self.at - time.monotonic())
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    def allows(self, seconds):
+        """งบที่เหลือพอสำหรับงานที่คาดว่าใช้ seconds วินาทีไหม"""
+        return self.remaining() >= seconds
+
+    def timeout(self, cap):
+        """timeout ของ I/O ภายใต้งบที่เหลือ (ไม่เกิน cap)"""
+        return min(cap, self.remaining())
+
+NO_DEADLINE = Deadline()
+
+class Metrics:
+    """
+    counters: ตัวนับเหตุการณ์ (thread-safe)
+    observe(stage, วินาที, ขนาด) → EWMA ของเวลาต่อตัวอักษร; estimate(stage, ขนาด) = เวลาที่คาดว่าจะใช้
+    """
+
+    def __init__(self, defaults=None, alpha=0.2):
+        self.counters = Counter()
+        self.rates = {}                # stage → EWMA วินาทีต่อตัวอักษร (หรือต่อครั้งถ้าไม่ระบุขนาด)
+        self.defaults = dict(defaults or {})
+        self.alpha = alpha
+        self.lock = threading.Lock()
+
+    def inc(self, name, n=1):
+        with self.lock:
+            self.counters[name] += n
+
+    def observe(self, stage, seconds, size=None):
+        rate = seconds / max(size, 1) if size is not None else seconds
+        with self.lock:
+            old = self.rates.get(stage)
+            self.rates[stage] = rate if old is None else old + self.alpha * (rate - old)
+
+    def estimate(self, stage, size=None):
+        with self.lock:
+            rate = self.rates.get(stage)
+        if rate is None:
+            rate = self.defaults.get(stage, 0.0)
+        return rate * max(size, 1) if size is not None else rate
+
+    def snapshot(self):
+        with self.lock:
+            return {"counters": dict(sorted(self.counters.items())),
+                    "stage_rate_s": {k: round(v, 8) for k, v in sorted(self.rates.items())}}
+
+class Admission:
+    """
+    จำกัดงานที่ทำพร้อมกัน max_active งาน; ที่เหลือรอคิวได้ไม่เกิน max_queue
+    รอได้นานสุด min(max_wait, งบที่เหลือ - reserve) — reserve = เวลาขั้นต่ำที่ต้องเหลือไว้ทำงานหลังได้คิว
+    """
+
+    def __init__(self, max_active=4, max_queue=16, max_wait=5.0, reserve=1.0, metrics=None):
+        self.max_active, self.max_queue = max_active, max_queue
+        self.max_wait, self.reserve = max_wait, reserve
+        self.sem = threading.BoundedSemaphore(max_active)
+        self.lock = threading.Lock()
+        self.active = self.waiting = 0
+        self.metrics = metrics
+
+    def _count(self, name):
+        if self.metrics:
+            self.metrics.inc(name)
+
+    def acquire(self, deadline=NO_DEADLINE, wait=True):
+        """wait=False (งานเบื้องหลัง เช่น prefetch) = ไม่เข้าคิว ไม่มีช่องว่างก็ Overloaded ทันที"""
+        if self.sem.acquire(blocking=False):
+            with self.lock:
+                self.active += 1
+            self._count("admit.immediate")
+            return
+        if not wait:
+            self._count("shed.no_wait")
+            raise Overloaded("ไม่มีช่องว่าง (งานเบื้องหลังไม่รอคิว)")
+        with self.lock:
+            if self.waiting >= self.max_queue:
+                self._count("shed.queue_full")
+                raise Overloaded(f"คิวเต็ม ({self.waiting} งานรออยู่)")
+            self.waiting += 1
+        try:
+            wait = min(self.max_wait, deadline.remaining() - self.reserve)
+            if wait <= 0 or not self.sem.acquire(timeout=wait):
+                self._count("shed.queue_timeout")
+                raise Overloaded(f"รอคิวเกิน {max(wait, 0):.1f}s")
+        finally:
+            with self.lock:
+                self.waiting -= 1
+        with self.lock:
+            self.active += 1
+        self._count("admit.queued")
+
+    def release(self):
+        with self.lock:
+            self.active -= 1
+        self.sem.release()
+
+    def slot(self, deadline=NO_DEADLINE, wait=True):
+        return _Slot(self, deadline, wait)
+
+    def status(self):
+        return {"active": self.active, "waiting": self.waiting, "max_active": self.max_active,
+                "max_queue": self.max_queue, "max_wait_s": self.max_wait}
+
+class _Slot:
+    def __init__(self, admission, deadline, wait=True):
+        self.admission, self.deadline, self.wait = admission, deadline, wait
+
+    def __enter__(self):
+        self.admission.acquire(self.deadline, self.wait)
+        return self
+
+    def __exit__(self, *exc):
+        self.admission.release()
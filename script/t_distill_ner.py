@@ -0,0 +1,184 @@
+# t_distill_ner.py
+# Knowledge distillation: teacher (checkpoint จาก t_train_ner.py หรือ thainer base) → student ที่เล็ก/เร็วกว่า
+# student = สถาปัตยกรรมเดียวกันแต่ layer น้อยลง (copy layer จาก teacher แบบเว้นระยะ) หรือ hidden แคบลง (init ใหม่)
+# ข้อมูล: ข่าวที่ไม่มี label (data/ready_for_label_soft.jsonl) เรียนจาก soft logits ของ teacher อย่างเดียว
+#        + ThaiNER train ที่มี gold label (KD + cross entropy)
+# จบแล้วรายงาน F1 / latency ของ teacher เทียบ student บน ThaiNER test และ save student ให้ app ใช้แทน teacher
+import argparse, copy, json, random
+from pathlib import Path
+
+import numpy as np, torch
+import torch.nn.functional as F
+from datasets import Dataset, concatenate_datasets, load_dataset
+from transformers import (AutoTokenizer, AutoModelForTokenClassification,
+                          DataCollatorForTokenClassification, TrainingArguments, Trainer)
+
+from t_auto_label import chunk
+from t_export_features import DEFAULT_DROP, DEFAULT_FOCUS, align_labels, make_mapper
+from t_export_model import build_eval_set, dir_size_mb, evaluate, resolve_checkpoint
+
+def encoder_layers(model):
+    """ModuleList ของ transformer layers (BERT/RoBERTa/Camembert)"""
+    return model.base_model.encoder.layer
+
+def attention_heads(hidden_size, head_dim=64):
+    """จำนวน head มากสุดที่ ≤ hidden_size // head_dim และหาร hidden_size ลงตัว (เช่น 200 → 2 head ขนาด 100)"""
+    if hidden_size < 1:
+        raise ValueError(f"--hidden_size ต้องเป็นจำนวนเต็มบวก (ได้ {hidden_size})")
+    heads = next(h for h in range(max(1, hidden_size // head_dim), 0, -1) if hidden_size % h == 0)
+    if hidden_size // heads != head_dim:
+        print(f"⚠️ hidden_size={hidden_size} หาร {head_dim} ไม่ลงตัว → ใช้ {heads} head ขนาด {hidden_size // heads}")
+    return heads
+
+def make_student(teacher, n_layers=None, hidden_size=None):
+    cfg = copy.deepcopy(teacher.config)
+    if n_layers:
+        cfg.num_hidden_layers = n_layers
+    if hidden_size:
+        ratio = hidden_size / cfg.hidden_size
+        cfg.hidden_size = hidden_size
+        cfg.intermediate_size = int(cfg.intermediate_size * ratio)
+        cfg.num_attention_heads = attention_heads(hidden_size)
+    student = AutoModelForTokenClassification.from_config(cfg)
+    if hidden_size:
+        return student  # ขนาดไม่ตรงกับ teacher → เริ่มจาก random init
+    # hidden เท่ากัน: copy embeddings + classifier และเลือก layer ของ teacher แบบเว้นระยะเท่า ๆ กัน
+    t_sd = {k: v for k, v in teacher.state_dict().items() if ".encoder.layer." not in k}
+    student.load_state_dict(t_sd, strict=False)
+    t_layers, s_layers = encoder_layers(teacher), encoder_layers(student)
+    picks = np.linspace(0, len(t_layers) - 1, len(s_layers)).round().astype(int)
+    for s_layer, i in zip(s_layers, picks):
+        s_layer.load_state_dict(t_layers[int(i)].state_dict())
+    print(f"🧬 student layers ← teacher layers {picks.tolist()}")
+    return student
+
+def unlabeled_dataset(path, tok, max_length, limit=None):
+    """ข่าวดิบ → chunk ตามงบ token → input_ids (labels = -100 ทั้งหมด: ใช้แค่ soft logits ของ teacher)"""
+    chunks = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            text = (json.loads(line).get("text") or "").strip()
+            if text:
+                chunks.extend(c for _, c in chunk(text, tok, max_tokens=max_length - 2))
+            if limit and len(chunks) >= limit:
+                break
+    enc = tok(chunks, truncation=True, max_length=max_length)
+    enc["labels"] = [[-100] * len(ids) for ids in enc["input_ids"]]
+    return Dataset.from_dict({k: enc[k] for k in ("input_ids", "attention_mask", "labels")})
+
+def thainer_train_dataset(tok, label2id, max_length, focus, drop):
+    train = load_dataset("pythainlp/thainer-corpus-v2")["train"]
+    names = train.features["ner"].feature.names
+    mapper = make_mapper(focus, drop)
+
+    def encode(batch):
+        enc = tok(batch["words"], is_split_into_words=True, truncation=True, max_length=max_length)
+        enc["labels"] = [align_labels(enc.word_ids(i), [mapper(names[t]) for t in tags], label2id)
+                         for i, tags in enumerate(batch["ner"])]
+        return {k: enc[k] for k in ("input_ids", "attention_mask", "labels")}
+
+    return train.map(encode, batched=True, remove_columns=train.column_names)
+
+class DistillTrainer(Trainer):
+    """loss = alpha · KL(student‖teacher, T) · T² + (1 - alpha) · CE(gold) (เฉพาะ token ที่มี gold label)"""
+
+    def __init__(self, *a, teacher=None, temperature=2.0, alpha=0.5, **k):
+        super().__init__(*a, **k)
+        self.teacher = teacher.to(self.args.device).eval()
+        self.temperature, self.alpha = temperature, alpha
+
+    def compute_loss(self, model, inputs, return_outputs=False, num_items_in_batch=None):
+        labels = inputs["labels"]
+        feats = {k: v for k, v in inputs.items() if k != "labels"}
+        out = model(**feats)
+        with torch.no_grad():
+            t_logits = self.teacher(**feats).logits
+        mask = feats["attention_mask"].bool()
+        T = self.temperature
+        kd = F.kl_div(F.log_softmax(out.logits[mask] / T, dim=-1), F.softmax(t_logits[mask] / T, dim=-1),
+                      reduction="batchmean") * T * T
+        gold = labels != -100
+        ce = F.cross_entropy(out.logits[gold], labels[gold]) if gold.any() else out.logits.new_zeros(())
+        loss = self.alpha * kd + (1 - self.alpha) * ce
+        return (loss, out) if return_outputs else loss
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--teacher", default="out_thai_ner")
+    ap.add_argument("--output_dir", default="out_thai_ner_student")
+    ap.add_argument("--student_layers", type=int, default=4)
+    ap.add_argument("--student_hidden", type=int, default=None, help="ตั้งค่าเพื่อให้ hidden แคบลง (student init ใหม่)")
+    ap.add_argument("--unlabeled", default="data/ready_for_label_soft.jsonl")
+    ap.add_argument("--unlabeled_limit", type=int, default=None)
+    ap.add_argument("--temperature", type=float, default=2.0)
+    ap.add_argument("--alpha", type=float, default=0.5)
+    ap.add_argument("--epochs", type=int, default=3)
+    ap.add_argument("--batch_size", type=int, default=16)
+    ap.add_argument("--lr", type=float, default=5e-5)
+    ap.add_argument("--max_length", type=int, default=256)
+    ap.add_argument("--eval_limit", type=int, default=None)
+    ap.add_argument("--focus_labels", nargs="*", default=DEFAULT_FOCUS)
+    ap.add_argument("--drop_labels", nargs="*", default=DEFAULT_DROP)
+    args = ap.parse_args()
+
+    random.seed(42); np.random.seed(42); torch.manual_seed(42)
+
+    teacher_path = resolve_checkpoint(args.teacher) if Path(args.teacher).is_dir() else args.teacher
+    print(f"🔹 teacher: {teacher_path}")
+    tok = AutoTokenizer.from_pretrained(teacher_path)
+    teacher = AutoModelForTokenClassification.from_pretrained(teacher_path).eval()
+    id2label = {int(k): v for k, v in teacher.config.id2label.items()}
+    label2id = {v: k for k, v in id2label.items()}
+    student = make_student(teacher, args.student_layers, args.student_hidden)
+
+    ds_un = unlabeled_dataset(args.unlabeled, tok, args.max_length, args.unlabeled_limit)
+    ds_gold = thainer_train_dataset(tok, label2id, args.max_length, args.focus_labels, args.drop_labels)
+    ds_tr = concatenate_datasets([ds_un, ds_gold.cast(ds_un.features)]).shuffle(seed=42)
+    ds_ev = build_eval_set(tok, label2id, args.max_length, args.focus_labels, args.drop_labels, args.eval_limit)
+    print(f"📚 train: {len(ds_un)} unlabeled chunks + {len(ds_gold)} ThaiNER sentences | eval: {len(ds_ev)}")
+
+    targs = TrainingArguments(
+        output_dir=args.output_dir,
+        learning_rate=args.lr,
+        per_device_train_batch_size=args.batch_size,
+        num_train_epochs=args.epochs,
+        warmup_ratio=0.1,
+        weight_decay=0.01,
+        save_strategy="no",
+        logging_steps=50,
+        report_to="none",
+        group_by_length=True,
+        fp16=torch.cuda.is_available(),
+    )
+    trainer = DistillTrainer(
+        model=student,
+        args=targs,
+        train_dataset=ds_tr,
+        data_collator=DataCollatorForTokenClassification(tokenizer=tok),
+        teacher=teacher,
+        temperature=args.temperature,
+        alpha=args.alpha,
+    )
+    trainer.train()
+    student = trainer.model.cpu().eval()
+    teacher = teacher.cpu()
+    trainer.save_model(args.output_dir)
+    tok.save_pretrained(args.output_dir)
+
+    # trade-off: F1 vs latency (CPU)
+    report = {"teacher": str(teacher_path), "student": args.output_dir,
+              "student_layers": student.config.num_hidden_layers, "student_hidden": student.config.hidden_size}
+    for name, m in (("teacher", teacher), ("student", student)):
+        f1, ms, p50 = evaluate(m, tok, ds_ev, id2label)
+        report[name + "_eval"] = {"f1": f1, "ms_per_sent_batched": ms, "ms_p50_single": p50,
+                                  "params_m": sum(p.numel() for p in m.parameters()) / 1e6}
+        print(f"📏 {name}: F1={f1:.4f} | {ms:.2f} ms/sent (batched) | p50 {p50:.2f} ms | "
+              f"{report[name + '_eval']['params_m']:.1f}M params")
+    t, s = report["teacher_eval"], report["student_eval"]
+    print(f"⚖️ student: F1 {s['f1'] - t['f1']:+.4f}, speedup {t['ms_per_sent_batched'] / max(s['ms_per_sent_batched'], 1e-9):.2f}x")
+    report["student_size_mb"] = dir_size_mb(args.output_dir)
+    Path(args.output_dir, "distill_report.json").write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"👉 NER_MODEL={args.output_dir} python script/app.py")
+
+if __name__ == "__main__":
+    main()
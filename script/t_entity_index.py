@@ -0,0 +1,166 @@
+# t_entity_index.py
+# inverted index: entity (normalize แล้ว) → ข่าวที่กล่าวถึง พร้อม label / score / วันที่
+# เก็บใน SQLite แบบ WITHOUT ROWID + id เป็นตัวเลข (ไฟล์เล็ก, query ผ่าน primary key / index ได้ในระดับ ms)
+#   python script/t_entity_index.py build --input data/hf_labeled_news.jsonl
+#   python script/t_entity_index.py search "กรุงเทพ" --days 7
+#   python script/t_entity_index.py top --label ORGANIZATION --days 1
+import argparse, datetime as dt, hashlib, json, re, sqlite3, threading
+from pathlib import Path
+
+DEFAULT_PATH = Path("data/entity_index.sqlite")
+LABELS = ["PERSON","ORGANIZATION","LOCATION","DATE","TIME","MONEY","PERCENT","LAW"]
+
+THAI_DIGITS = str.maketrans("๐๑๒๓๔๕๖๗๘๙","0123456789")
+
+def thai_to_arabic(s: str) -> str:
+    return s.translate(THAI_DIGITS)
+
+def normalize_ent_view(s: str) -> str:
+    # ทำให้ข้อความที่โชว์สวยขึ้น (ไม่กระทบตำแหน่งในต้นฉบับ)
+    s = s.strip().strip('"\''"()[] ")
+    s = re.sub(r"\s{2,}", " ", s)
+    return thai_to_arabic(s)
+
+def today() -> int:
+    return dt.date.today().toordinal()
+
+class EntityIndex:
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.db.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS articles (id INTEGER PRIMARY KEY, key TEXT UNIQUE, title TEXT, day INTEGER);
+            CREATE TABLE IF NOT EXISTS ents (id INTEGER PRIMARY KEY, name TEXT UNIQUE);
+            CREATE TABLE IF NOT EXISTS postings (
+                ent INTEGER, day INTEGER, article INTEGER, label INTEGER, score REAL,
+                PRIMARY KEY (ent, day, article, label)) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS postings_article ON postings (article);
+            -- ยอดรวมรายวันต่อ (label, entity) อัปเดตไปพร้อม postings → top() ไม่ต้อง scan postings
+            CREATE TABLE IF NOT EXISTS daily (
+                label INTEGER, day INTEGER, ent INTEGER, n INTEGER, score_sum REAL,
+                PRIMARY KEY (label, day, ent)) WITHOUT ROWID;
+        """)
+        self._ent_ids = {}
+
+    # ---------- เขียน ----------
+    def _ent_id(self, name):
+        eid = self._ent_ids.get(name)
+        if eid is None:
+            self.db.execute("INSERT OR IGNORE INTO ents (name) VALUES (?)", (name,))
+            eid = self.db.execute("SELECT id FROM ents WHERE name = ?", (name,)).fetchone()[0]
+            self._ent_ids[name] = eid
+        return eid
+
+    def _add(self, key, entities, title, day):
+        cur = self.db.execute("SELECT id FROM articles WHERE key = ?", (key,)).fetchone()
+        if cur:
+            aid = cur[0]
+            old = self.db.execute("SELECT label, day, ent, score FROM postings WHERE article = ?", (aid,)).fetchall()
+            self.db.executemany("UPDATE daily SET n = n - 1, score_sum = score_sum - ? WHERE label = ? AND day = ? AND ent = ?",
+                                [(sc, lab, d, e) for lab, d, e, sc in old])
+            self.db.execute("DELETE FROM postings WHERE article = ?", (aid,))
+            self.db.execute("UPDATE articles SET title = ?, day = ? WHERE id = ?", (title, day, aid))
+        else:
+            aid = self.db.execute("INSERT INTO articles (key, title, day) VALUES (?, ?, ?)", (key, title, day)).lastrowid
+        best = {}  # (ent, label) → score สูงสุดในข่าวนี้
+        for label, word, score in entities:
+            name = normalize_ent_view(word or "")
+            if len(name) < 2 or label not in LABELS:
+                continue
+            k = (self._ent_id(name), LABELS.index(label))
+            best[k] = max(best.get(k, 0.0), float(score))
+        rows = [(e, day, aid, lab, round(s, 4)) for (e, lab), s in best.items()]
+        self.db.executemany("INSERT OR REPLACE INTO postings VALUES (?, ?, ?, ?, ?)", rows)
+        self.db.executemany("INSERT INTO daily VALUES (?, ?, ?, 1, ?) "
+                            "ON CONFLICT (label, day, ent) DO UPDATE SET n = n + 1, score_sum = score_sum + excluded.score_sum",
+                            [(lab, d, e, sc) for e, d, _, lab, sc in rows])
+        return aid
+
+    def add_article(self, key, entities, title=None, day=None):
+        """entities = [(label, word, score)]; key ซ้ำ = อัปเดตข่าวเดิม (แทนที่ postings ทั้งหมด)"""
+        with self.lock, self.db:
+            return self._add(key, entities, title, day or today())
+
+    def add_many(self, items):
+        """items = [(key, entities, title, day)] ใน transaction เดียว (ใช้ตอน build offline)"""
+        with self.lock, self.db:
+            for key, entities, title, day in items:
+                self._add(key, entities, title, day or today())
+
+    # ---------- อ่าน (connection เดียวกับฝั่งเขียน → ถือ lock เดียวกันจนอ่านครบ) ----------
+    def mentions(self, query, days=7, label=None, limit=50):
+        """ข่าวที่กล่าวถึง entity ในช่วง days วันล่าสุด (ใหม่ก่อน)"""
+        with self.lock:
+            row = self.db.execute("SELECT id FROM ents WHERE name = ?", (normalize_ent_view(query),)).fetchone()
+            if not row:
+                return []
+            rows = self._mentions(row[0], days, label, limit)
+        return [{"article": k, "title": t, "date": dt.date.fromordinal(d).isoformat(),
+                 "label": LABELS[lab], "score": s} for k, t, d, lab, s in rows]
+
+    def _mentions(self, ent, days, label, limit):
+        q = ("SELECT a.key, a.title, p.day, p.label, p.score FROM postings p JOIN articles a ON a.id = p.article "
+             "WHERE p.ent = ? AND p.day >= ?")
+        params = [ent, today() - days + 1]
+        if label:
+            q += " AND p.label = ?"; params.append(LABELS.index(label))
+        q += " ORDER BY p.day DESC, p.score DESC LIMIT ?"; params.append(limit)
+        return self.db.execute(q, params).fetchall()
+
+    def top(self, label, days=1, limit=10):
+        """entity ที่ถูกกล่าวถึงในจำนวนข่าวมากที่สุดของ label นั้นในช่วง days วันล่าสุด"""
+        q = ("SELECT e.name, SUM(d.n) n, SUM(d.score_sum) / SUM(d.n) FROM daily d JOIN ents e ON e.id = d.ent "
+             "WHERE d.label = ? AND d.day >= ? GROUP BY d.ent HAVING n > 0 ORDER BY n DESC LIMIT ?")
+        with self.lock:
+            rows = self.db.execute(q, (LABELS.index(label), today() - days + 1, limit)).fetchall()
+        return [{"entity": name, "articles": n, "avg_score": round(avg, 4)} for name, n, avg in rows]
+
+    def close(self):
+        self.db.close()
+
+def article_key(rec):
+    if rec.get("url") or rec.get("link"):
+        return rec.get("url") or rec.get("link")
+    return "sha1:" + hashlib.sha1((rec.get("title", "") + rec.get("text", "")).encode("utf-8")).hexdigest()
+
+def build(inp, path=DEFAULT_PATH, day=None, batch=5000):
+    """สร้าง/เติม index จาก JSONL ที่มี entities แบบ t_auto_label ({"entity","word","score"})"""
+    idx = EntityIndex(path)
+    n, items = 0, []
+    with open(inp, encoding="utf-8") as f:
+        for line in f:
+            rec = json.loads(line)
+            ents = [(e.get("entity"), e.get("word"), e.get("score", 1.0)) for e in rec.get("entities", [])]
+            items.append((article_key(rec), ents, rec.get("title"), day))
+            if len(items) >= batch:
+                idx.add_many(items); n += len(items); items = []
+    idx.add_many(items); n += len(items)
+    idx.close()
+    print(f"✅ indexed {n} articles → {path}")
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--index", default=str(DEFAULT_PATH))
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("build"); b.add_argument("--input", default="data/hf_labeled_news.jsonl")
+    b.add_argument("--date", default=None, help="YYYY-MM-DD (ค่าเริ่มต้น = วันนี้)")
+    s = sub.add_parser("search"); s.add_argument("query"); s.add_argument("--days", type=int, default=7)
+    s.add_argument("--label", choices=LABELS); s.add_argument("--limit", type=int, default=20)
+    t = sub.add_parser("top"); t.add_argument("--label", choices=LABELS, default="ORGANIZATION")
+    t.add_argument("--days", type=int, default=1); t.add_argument("--limit", type=int, default=10)
+    args = ap.parse_args()
+
+    if args.cmd == "build":
+        day = dt.date.fromisoformat(args.date).toordinal() if args.date else None
+        build(args.input, args.index, day)
+        return
+    idx = EntityIndex(args.index)
+    res = idx.mentions(args.query, args.days, args.label, args.limit) if args.cmd == "search" \
+        else idx.top(args.label, args.days, args.limit)
+    print(json.dumps(res, ensure_ascii=False, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+# t_export_features.py
+# labeled JSONL → input_ids / attention_mask / labels (subword) เก็บเป็น Arrow dataset (memory-mapped)
+# ข้ามขั้น IOB .txt → read_iob → encode ที่ต้องทำซ้ำทุกครั้งที่เทรน
+# cache key = tokenizer + max_length + label map + drop_labels + label_all_tokens + เวอร์ชันพจนานุกรม newmm + เนื้อไฟล์ input
+import argparse, hashlib, json
+from pathlib import Path
+
+FEATURES_DIR = Path("data/cache/features")
+DEFAULT_FOCUS = ["PERSON","LOCATION","ORGANIZATION","DATE","TIME","MONEY","PERCENT","LAW"]
+DEFAULT_DROP = ["LEN","URL","PHONE","EMAIL"]
+
+def make_mapper(focus_labels, drop_labels):
+    """กรอง/โฟกัส label แบบเดียวกับ t_train_ner"""
+    focus, drop = set(focus_labels), set(drop_labels)
+    def mapper(l):
+        if l=="O" or "-" not in l: return "O"
+        b, t = l.split("-",1)
+        if t in drop: return "O"
+        if focus and t not in focus: return "O"
+        return f"{b}-{t}"
+    return mapper
+
+def label_list(focus_labels):
+    return [f"B-{t}" for t in sorted(focus_labels)] + [f"I-{t}" for t in sorted(focus_labels)] + ["O"]
+
+def align_labels(word_ids, labs, label2id, label_all_tokens=False):
+    """label ระดับคำ → ระดับ subword (subword ถัดไปของคำเดียวกันได้ -100 เว้นแต่ label_all_tokens)"""
+    prev = None; lid = []
+    for wid in word_ids:
+        if wid is None:
+            lid.append(-100)
+        else:
+            lab = labs[wid]
+            if wid != prev:
+                lid.append(label2id.get(lab, label2id["O"]))
+            else:
+                if label_all_tokens and lab != "O":
+                    typ = lab.split("-",1)[1] if "-" in lab else lab
+                    lid.append(label2id.get(f"I-{typ}", label2id["O"]))
+                else:
+                    lid.append(-100)
+            prev = wid
+    return lid
+
+def feature_key(tok, max_length, labels, label_all_tokens, inp, drop_labels=(), dict_ver=""):
+    """dict_ver = t_tokenize_cache.dict_version() ของพจนานุกรมที่ใช้ตัดคำ (คำเปลี่ยน → label ระดับคำเปลี่ยน)"""
+    h = hashlib.blake2b(digest_size=12)
+    h.update(json.dumps({
+        "tokenizer": tok.name_or_path, "tokenizer_class": type(tok).__name__, "vocab": len(tok),
+        "max_length": max_length, "labels": labels, "label_all_tokens": label_all_tokens,
+        "drop_labels": sorted(drop_labels), "dict_version": dict_ver,
+    }, sort_keys=True).encode())
+    with open(inp, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def export(inp, model_name, max_length=320, focus_labels=DEFAULT_FOCUS, drop_labels=DEFAULT_DROP,
+           label_all_tokens=False, out_root=FEATURES_DIR, workers=None, force=False, custom_dict=None):
+    """คืน path ของ dataset ที่ export แล้ว (ถ้ามีใน cache อยู่แล้วจะไม่ทำซ้ำ)"""
+    from datasets import Dataset
+    from transformers import AutoTokenizer
+    from t_convert_to_iob import convert_records
+    from t_tokenize_cache import TokenCache, dict_version
+
+    tok = AutoTokenizer.from_pretrained(model_name)
+    labels = label_list(focus_labels)
+    label2id = {l:i for i,l in enumerate(labels)}
+    out = Path(out_root) / feature_key(tok, max_length, labels, label_all_tokens, inp,
+                                       drop_labels, dict_version(custom_dict))
+    if (out / "meta.json").exists() and not force:
+        print(f"♻️ features cache hit: {out}")
+        return out
+
+    mapper = make_mapper(focus_labels, drop_labels)
+    with open(inp, encoding="utf-8") as f:
+        recs = [json.loads(l) for l in f]
+    cache = TokenCache(custom_dict=custom_dict)
+    words, tags = [], []
+    for tokens, labs in convert_records(recs, cache, workers):
+        if tokens:
+            words.append(tokens); tags.append([mapper(l) for l in labs])
+    cache.close()
+
+    def encode(batch):
+        enc = tok(batch["tokens"], is_split_into_words=True, truncation=True, padding=False, max_length=max_length)
+        enc["labels"] = [align_labels(enc.word_ids(i), labs, label2id, label_all_tokens)
+                         for i, labs in enumerate(batch["ner_tags"])]
+        return enc
+
+    ds = Dataset.from_dict({"tokens": words, "ner_tags": tags})
+    ds = ds.map(encode, batched=True, remove_columns=["tokens", "ner_tags"])
+    ds.save_to_disk(str(out))
+    meta = {"source": str(inp), "model_name": model_name, "max_length": max_length,
+            "labels": labels, "drop_labels": sorted(drop_labels), "label_all_tokens": label_all_tokens,
+            "dict_version": dict_version(custom_dict), "n": len(ds)}
+    (out / "meta.json").write_text(json.dumps(meta, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"✅ exported {len(ds)} docs → {out}")
+    return out
+
+def load_features(path):
+    """โหลด dataset ที่ export ไว้ (memory-mapped) คืน (dataset, labels)"""
+    from datasets import load_from_disk
+    path = Path(path)
+    meta = json.loads((path / "meta.json").read_text(encoding="utf-8"))
+    return load_from_disk(str(path)), meta["labels"]
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--input", default="data/hf_labeled_news_clean.jsonl")
+    ap.add_argument("--model_name", default="airesearch/wangchanberta-base-wiki-2020")
+    ap.add_argument("--max_length", type=int, default=320)
+    ap.add_argument("--label_all_tokens", action="store_true")
+    ap.add_argument("--focus_labels", nargs="*", default=DEFAULT_FOCUS)
+    ap.add_argument("--drop_labels", nargs="*", default=DEFAULT_DROP)
+    ap.add_argument("--out_root", default=str(FEATURES_DIR))
+    ap.add_argument("--workers", type=int, default=None)
+    ap.add_argument("--custom_dict", default=None, help="ไฟล์คำเพิ่มของ newmm (เหมือน t_tokenize_cache)")
+    ap.add_argument("--force", action="store_true")
+    args = ap.parse_args()
+    out = export(args.input, args.model_name, args.max_length, args.focus_labels, args.drop_labels,
+                 args.label_all_tokens, args.out_root, args.workers, args.force, args.custom_dict)
+    print(f"👉 python script/t_train_ner.py --features {out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+# t_export_model.py
+# export checkpoint จาก t_train_ner.py เป็น PyTorch dynamic int8 และ/หรือ ONNX Runtime (int8)
+# วัด span F1 บน ThaiNER test split (ไม่ได้ใช้ตอนเทรน) เทียบกับ checkpoint ต้นฉบับ
+# ถ้า F1 ตกเกิน --max_f1_drop จะไม่ publish artifact นั้น + บันทึก latency / ขนาดไฟล์ลง export_report.json
+import argparse, json, shutil, sys, time
+from pathlib import Path
+
+import numpy as np, torch
+from datasets import load_dataset
+from transformers import AutoTokenizer, AutoModelForTokenClassification, DataCollatorForTokenClassification
+
+from t_export_features import DEFAULT_DROP, DEFAULT_FOCUS, align_labels, make_mapper
+from t_ner_backend import INT8_FILE, load_ner_model
+from t_ner_metrics import SpanF1
+
+def build_eval_set(tok, label2id, max_length, focus, drop, limit=None):
+    """ThaiNER test → features ที่ใช้ label map ของโมเดล"""
+    test = load_dataset("pythainlp/thainer-corpus-v2")["test"]
+    if limit:
+        test = test.select(range(min(limit, len(test))))
+    names = test.features["ner"].feature.names
+    mapper = make_mapper(focus, drop)
+
+    def encode(batch):
+        enc = tok(batch["words"], is_split_into_words=True, truncation=True, padding=False, max_length=max_length)
+        enc["labels"] = [align_labels(enc.word_ids(i), [mapper(names[t]) for t in tags], label2id)
+                         for i, tags in enumerate(batch["ner"])]
+        return enc
+
+    return test.map(encode, batched=True, remove_columns=test.column_names)
+
+def evaluate(model, tok, ds, id2label, batch_size=32):
+    """คืน (span F1, ms ต่อประโยคแบบ batch, p50 ms ต่อประโยคเดี่ยว)"""
+    collator = DataCollatorForTokenClassification(tokenizer=tok)
+    metric = SpanF1(id2label, verbose=False)
+    rows = [ds[i] for i in range(len(ds))]
+    t0 = time.perf_counter()
+    with torch.inference_mode():
+        for i in range(0, len(rows), batch_size):
+            batch = collator(rows[i:i+batch_size])
+            labels = batch.pop("labels")
+            metric.update(model(**batch).logits, labels)
+    batch_ms = (time.perf_counter() - t0) * 1000 / max(len(rows), 1)
+
+    single = []
+    with torch.inference_mode():
+        for r in rows[:50]:
+            batch = collator([r]); batch.pop("labels")
+            t = time.perf_counter(); model(**batch); single.append((time.perf_counter() - t) * 1000)
+    return metric.f1(), batch_ms, float(np.median(single)) if single else 0.0
+
+def resolve_checkpoint(path):
+    """out_dir ของ Trainer มีแค่ checkpoint-N → ใช้ best_model_checkpoint ใน trainer_state.json หรือตัวล่าสุด"""
+    path = Path(path)
+    if (path / "config.json").exists():
+        return path
+    ckpts = sorted(path.glob("checkpoint-*"), key=lambda p: int(p.name.split("-")[-1]))
+    if not ckpts:
+        raise FileNotFoundError(f"ไม่พบ checkpoint ใน {path}")
+    state = json.loads((ckpts[-1] / "trainer_state.json").read_text(encoding="utf-8"))
+    best = state.get("best_model_checkpoint")
+    return Path(best) if best and Path(best).exists() else ckpts[-1]
+
+def dir_size_mb(path):
+    return sum(p.stat().st_size for p in Path(path).rglob("*") if p.is_file()) / 2**20
+
+def export_int8(checkpoint, model, tok, staging):
+    qmodel = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    staging.mkdir(parents=True, exist_ok=True)
+    torch.save(qmodel, staging / INT8_FILE)
+    tok.save_pretrained(staging)
+    model.config.save_pretrained(staging)
+
+def export_onnx(checkpoint, model, tok, staging):
+    from optimum.onnxruntime import ORTModelForTokenClassification, ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    fp32 = staging.with_name(staging.name + "_fp32")
+    ORTModelForTokenClassification.from_pretrained(checkpoint, export=True).save_pretrained(fp32)
+    quantizer = ORTQuantizer.from_pretrained(fp32)
+    quantizer.quantize(save_dir=staging, quantization_config=AutoQuantizationConfig.avx2(is_static=False, per_channel=False))
+    tok.save_pretrained(staging)
+    shutil.rmtree(fp32, ignore_errors=True)
+
+EXPORTERS = {"int8": export_int8, "onnx": export_onnx}
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--checkpoint", default="out_thai_ner")
+    ap.add_argument("--formats", nargs="+", choices=sorted(EXPORTERS), default=["int8", "onnx"])
+    ap.add_argument("--out_dir", default="out_thai_ner_export")
+    ap.add_argument("--max_f1_drop", type=float, default=0.01, help="F1 ลดลงได้ไม่เกินเท่านี้ (absolute) จึงจะ publish")
+    ap.add_argument("--max_length", type=int, default=320)
+    ap.add_argument("--batch_size", type=int, default=32)
+    ap.add_argument("--eval_limit", type=int, default=None)
+    ap.add_argument("--focus_labels", nargs="*", default=DEFAULT_FOCUS)
+    ap.add_argument("--drop_labels", nargs="*", default=DEFAULT_DROP)
+    args = ap.parse_args()
+
+    out_dir = Path(args.out_dir)
+    checkpoint = resolve_checkpoint(args.checkpoint)
+    print(f"🔹 checkpoint: {checkpoint}")
+    tok = AutoTokenizer.from_pretrained(checkpoint)
+    model = AutoModelForTokenClassification.from_pretrained(checkpoint).eval()
+    id2label = {int(k): v for k, v in model.config.id2label.items()}
+    label2id = {v: k for k, v in id2label.items()}
+    ds = build_eval_set(tok, label2id, args.max_length, args.focus_labels, args.drop_labels, args.eval_limit)
+
+    ref_f1, ref_ms, ref_p50 = evaluate(model, tok, ds, id2label, args.batch_size)
+    report = {"checkpoint": str(checkpoint), "eval_sentences": len(ds), "max_f1_drop": args.max_f1_drop,
+              "reference": {"f1": ref_f1, "ms_per_sent_batched": ref_ms, "ms_p50_single": ref_p50,
+                            "size_mb": dir_size_mb(checkpoint)}}
+    print(f"📏 reference F1={ref_f1:.4f} | {ref_ms:.2f} ms/sent (batched) | p50 {ref_p50:.2f} ms")
+
+    refused = False
+    for fmt in args.formats:
+        staging = out_dir / f".{fmt}_staging"
+        shutil.rmtree(staging, ignore_errors=True)
+        EXPORTERS[fmt](checkpoint, model, tok, staging)
+        _, exported = load_ner_model(staging, fmt)
+        f1, ms, p50 = evaluate(exported, tok, ds, id2label, args.batch_size)
+        ok = ref_f1 - f1 <= args.max_f1_drop
+        report[fmt] = {"f1": f1, "f1_drop": ref_f1 - f1, "ms_per_sent_batched": ms, "ms_p50_single": p50,
+                       "size_mb": dir_size_mb(staging), "published": ok, "path": str(out_dir / fmt) if ok else None}
+        if ok:
+            shutil.rmtree(out_dir / fmt, ignore_errors=True)
+            staging.rename(out_dir / fmt)
+            print(f"✅ {fmt}: F1={f1:.4f} (drop {ref_f1 - f1:+.4f}) | {ms:.2f} ms/sent | p50 {p50:.2f} ms "
+                  f"| {report[fmt]['size_mb']:.1f} MB → {out_dir / fmt}")
+            print(f"   👉 NER_MODEL={out_dir / fmt} NER_BACKEND={fmt} python script/app.py")
+        else:
+            shutil.rmtree(staging, ignore_errors=True)
+            refused = True
+            print(f"⛔ {fmt}: F1={f1:.4f} ตกเกิน {args.max_f1_drop} (drop {ref_f1 - f1:+.4f}) → ไม่ publish")
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    (out_dir / "export_report.json").write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"📝 report → {out_dir / 'export_report.json'}")
+    if refused:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+# t_infer_server.py
+# แยกโมเดล (สรุป + NER) ออกจาก web process: worker process จำนวนคงที่ แต่ละตัวโหลดโมเดลครั้งเดียว
+# web (app.py) ส่งงานผ่าน Unix socket → คิวจำกัดขนาด (เต็ม = ตอบ busy ทันที) → worker → ส่งผลกลับ
+#   python script/t_infer_server.py --socket /tmp/thainer.sock --workers 2
+#   INFER_SOCKET=/tmp/thainer.sock gunicorn -w 8 --chdir script app:app
+# ความปลอดภัย: socket เป็น 0600 (เฉพาะ user เดียวกัน) + authkey = INFER_AUTHKEY หรือสุ่มใหม่ทุกครั้งที่เริ่ม server
+#   แล้วเขียนไว้ที่ <socket>.key (0600) ให้ web process ของ user เดียวกันอ่าน
+import argparse, itertools, os, queue, secrets, threading, time
+import multiprocessing as mp
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+
+from t_deadline import DeadlineExceeded
+
+DEFAULT_SOCKET = "/tmp/thainer_infer.sock"
+
+def load_authkey(socket_path, create=False):
+    """INFER_AUTHKEY ถ้าตั้งไว้; ไม่งั้น server สุ่ม key ลง <socket>.key (0600) และ client อ่านจากไฟล์นั้น"""
+    env = os.environ.get("INFER_AUTHKEY")
+    if env:
+        return env.encode()
+    path = socket_path + ".key"
+    if create:
+        key = secrets.token_hex(32)
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            f.write(key)
+        os.chmod(path, 0o600)
+        return key.encode()
+    try:
+        with open(path, encoding="utf-8") as f:
+            return f.read().strip().encode()
+    except FileNotFoundError:
+        raise RuntimeError(f"ไม่มี INFER_AUTHKEY และไม่พบ {path} (เริ่ม t_infer_server ก่อน หรือตั้ง INFER_AUTHKEY)") from None
+OPS = ("summarize", "ner", "analyze")
+
+class InferenceBusy(RuntimeError):
+    """คิวของ worker เต็ม (backpressure) → ฝั่ง web ควรตอบว่าระบบไม่ว่าง"""
+
+# -------------------------------------------------
+# worker process
+# -------------------------------------------------
+def worker_main(wid, jobs, results, beats, done_counts, threads):
+    os.environ.pop("INFER_SOCKET", None)          # worker ต้องรันโมเดลเอง ไม่ส่งต่อ
+    os.environ.pop("PREFETCH", None)              # prefetch เป็นงานของ web process เท่านั้น
+    os.environ.setdefault("OMP_NUM_THREADS", str(threads))
+    import torch
+    torch.set_num_threads(threads)
+    import app as core                            # โหลดโมเดลครั้งเดียวต่อ worker
+
+    beats[wid] = time.time()
+    while True:
+        try:
+            job = jobs.get(timeout=1.0)
+        except queue.Empty:
+            beats[wid] = time.time()
+            continue
+        if job is None:
+            break
+        job_id, op, args, deadline = job
+        beats[wid] = time.time()
+        if deadline and time.time() > deadline:
+            results.put((job_id, "expired", None))  # client เลิกรอไปแล้ว ไม่ต้องเสีย CPU
+            continue
+        try:
+            if op == "summarize":
+                out = core.summarize_th(*args)
+            elif op == "ner":
+                html, ents, score = core.highlight_entities(*args)
+                out = (str(html), ents, score)
+            else:  # analyze = summarize + ner ในรอบเดียว
+                text, n_sent = args
+                summary, units = core.summarize_with_units(text, n_sent=n_sent)
+                html, ents, score = core.highlight_entities(summary, units)
+                out = (summary, str(html), ents, score)
+            results.put((job_id, "ok", out))
+        except Exception as e:
+            results.put((job_id, "error", f"{type(e).__name__}: {e}"))
+        done_counts[wid] += 1
+        beats[wid] = time.time()
+
+# -------------------------------------------------
+# server (รับงานจาก web, คุมคิว, ส่งผลกลับ)
+# -------------------------------------------------
+class InferenceServer:
+    def __init__(self, socket_path=DEFAULT_SOCKET, workers=2, max_queue=32, threads=None):
+        self.socket_path = socket_path
+        self.n_workers = workers
+        self.threads = threads or max(1, (os.cpu_count() or 1) // workers)
+        self.ctx = mp.get_context("spawn")
+        self.max_queue = max_queue
+        self.jobs = self.ctx.Queue(maxsize=max_queue)
+        self.results = self.ctx.Queue()
+        self.beats = self.ctx.Array("d", workers)
+        self.done_counts = self.ctx.Array("l", workers)
+        self.procs = [None] * workers
+        self.pending = {}   # job_id → [Event, result]
+        self.lock = threading.Lock()
+        self.ids = itertools.count()
+        self.stats = {"accepted": 0, "busy": 0, "timeouts": 0, "errors": 0, "restarts": 0}   # แก้ผ่าน _count เท่านั้น
+        self.started = time.time()
+
+    def _count(self, name):
+        with self.lock:   # _handle รันหลาย thread พร้อมกัน
+            self.stats[name] += 1
+
+    def _spawn(self, wid):
+        p = self.ctx.Process(target=worker_main, daemon=True,
+                             args=(wid, self.jobs, self.results, self.beats, self.done_counts, self.threads))
+        p.start()
+        self.procs[wid] = p
+
+    def _dispatch(self):
+        while True:
+            job_id, status, out = self.results.get()
+            with self.lock:
+                slot = self.pending.pop(job_id, None)
+            if slot:
+                slot[1] = (status, out)
+                slot[0].set()
+
+    def _monitor(self):
+        while True:
+            time.sleep(2.0)
+            for wid, p in enumerate(self.procs):
+                if p is not None and not p.is_alive():
+                    print(f"⚠️ worker {wid} died (exit {p.exitcode}) → restart")
+                    self._count("restarts")
+                    self._spawn(wid)
+
+    def health(self):
+        now = time.time()
+        with self.lock:
+            stats = dict(self.stats)
+        return {
+            "ok": all(p is not None and p.is_alive() for p in self.procs),
+            "uptime_s": round(now - self.started, 1),
+            "workers": [{"id": i, "alive": p is not None and p.is_alive(), "done": self.done_counts[i],
+                         "last_beat_s": round(now - self.beats[i], 1) if self.beats[i] else None}
+                        for i, p in enumerate(self.procs)],
+            "queue_depth": self.jobs.qsize() if hasattr(self.jobs, "qsize") else None,
+            "inflight": len(self.pending),
+            "max_queue": self.max_queue,
+            **stats,
+        }
+
+    def _handle(self, conn):
+        try:
+            op, args, timeout = conn.recv()
+            if op == "health":
+                conn.send(("ok", self.health()))
+                return
+            if op not in OPS:
+                conn.send(("error", f"unknown op: {op}"))
+                return
+            job_id, ev = next(self.ids), threading.Event()
+            slot = [ev, None]
+            with self.lock:
+                self.pending[job_id] = slot
+            try:
+                self.jobs.put_nowait((job_id, op, args, time.time() + timeout if timeout else None))
+            except queue.Full:
+                with self.lock:
+                    self.pending.pop(job_id, None)
+                self._count("busy")
+                conn.send(("busy", self.health()["queue_depth"]))
+                return
+            self._count("accepted")
+            if not ev.wait(timeout):
+                with self.lock:
+                    self.pending.pop(job_id, None)
+                self._count("timeouts")
+                conn.send(("timeout", None))
+                return
+            status, out = slot[1]
+            if status != "ok":
+                self._count("errors")
+            conn.send((status, out))
+        except (EOFError, OSError):
+            pass
+        finally:
+            conn.close()
+
+    def serve_forever(self):
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        for wid in range(self.n_workers):
+            self._spawn(wid)
+        threading.Thread(target=self._dispatch, daemon=True).start()
+        threading.Thread(target=self._monitor, daemon=True).start()
+        authkey = load_authkey(self.socket_path, create=True)
+        old_umask = os.umask(0o177)   # socket ถูกสร้างเป็น 0600 ตั้งแต่ bind (ไม่มีช่วงที่ user อื่นต่อได้)
+        try:
+            listener = Listener(self.socket_path, family="AF_UNIX", authkey=authkey)
+        finally:
+            os.umask(old_umask)
+        os.chmod(self.socket_path, 0o600)
+        with listener:
+            print(f"🚀 inference server: {self.socket_path} (0600) | workers={self.n_workers} x {self.threads} threads "
+                  f"| queue={self.max_queue}")
+            while True:
+                try:
+                    conn = listener.accept()
+                except Exception as e:  # authkey ผิด / client หลุดระหว่าง handshake
+                    print(f"⚠️ accept failed: {e}")
+                    continue
+                threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+# -------------------------------------------------
+# client (ใช้ใน web process)
+# -------------------------------------------------
+class InferenceClient:
+    def __init__(self, socket_path=DEFAULT_SOCKET, timeout=30.0):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.authkey = None   # อ่านตอนเรียกครั้งแรก (server อาจเริ่มทีหลัง web)
+
+    def _connect(self):
+        if self.authkey is None:
+            self.authkey = load_authkey(self.socket_path)
+        try:
+            return Client(self.socket_path, family="AF_UNIX", authkey=self.authkey)
+        except AuthenticationError:
+            # server เริ่มใหม่ = key ใหม่ใน <socket>.key → อ่านใหม่แล้วลองอีกครั้ง
+            self.authkey = load_authkey(self.socket_path)
+            return Client(self.socket_path, family="AF_UNIX", authkey=self.authkey)
+
+    def call(self, op, *args, timeout=None):
+        """timeout = งบทั้งหมดของการเรียก (รวม IPC) — ≤ 0 = งบหมดแล้ว ไม่ส่งงาน"""
+        timeout = self.timeout if timeout is None else timeout
+        if timeout <= 0:
+            raise DeadlineExceeded(f"inference {op}: งบเวลาหมดก่อนส่งงาน")
+        with self._connect() as conn:
+            conn.send((op, args, timeout))
+            if not conn.poll(timeout):
+                raise TimeoutError(f"inference {op} เกิน {timeout:g}s")
+            status, out = conn.recv()
+        if status == "ok":
+            return out
+        if status == "busy":
+            raise InferenceBusy(f"inference queue เต็ม ({out} งานค้าง)")
+        if status in ("timeout", "expired"):
+            raise TimeoutError(f"inference {op} เกิน {timeout:g}s")
+        raise RuntimeError(out)
+
+    def health(self):
+        try:
+            return self.call("health", timeout=2.0)
+        except Exception as e:
+            return {"ok": False, "error": str(e)}
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--socket", default=DEFAULT_SOCKET)
+    ap.add_argument("--workers", type=int, default=2)
+    ap.add_argument("--queue", type=int, default=32, help="จำนวนงานที่รอคิวได้สูงสุด (เกินนี้ตอบ busy)")
+    ap.add_argument("--threads", type=int, default=None, help="torch threads ต่อ worker (ค่าเริ่มต้น = cores / workers)")
+    args = ap.parse_args()
+    InferenceServer(args.socket, args.workers, args.queue, args.threads).serve_forever()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+# t_ner_backend.py
+# โหลดโมเดล NER เป็น HF pipeline จากหลาย backend
+#   hf   : checkpoint ปกติ (save_pretrained / ชื่อบน Hub)
+#   int8 : PyTorch dynamic int8 (model_int8.pt จาก t_export_model.py)
+#   onnx : ONNX Runtime ผ่าน optimum (model.onnx / model_quantized.onnx จาก t_export_model.py)
+from pathlib import Path
+from transformers import AutoTokenizer, AutoModelForTokenClassification, pipeline
+
+BACKENDS = ("hf", "int8", "onnx")
+INT8_FILE = "model_int8.pt"
+
+def load_ner_model(path, backend="hf"):
+    """คืน (tokenizer, model) ที่ส่งให้ pipeline("ner") ได้"""
+    if backend not in BACKENDS:
+        raise ValueError(f"unknown NER backend: {backend} (เลือกได้: {', '.join(BACKENDS)})")
+    tok = AutoTokenizer.from_pretrained(path)
+    if backend == "hf":
+        return tok, AutoModelForTokenClassification.from_pretrained(path)
+    if backend == "int8":
+        import torch
+        model = torch.load(Path(path) / INT8_FILE, weights_only=False)
+        return tok, model.eval()
+    from optimum.onnxruntime import ORTModelForTokenClassification
+    onnx_files = sorted(p.name for p in Path(path).glob("*.onnx"))
+    file_name = "model_quantized.onnx" if "model_quantized.onnx" in onnx_files else onnx_files[0]
+    return tok, ORTModelForTokenClassification.from_pretrained(path, file_name=file_name)
+
+def load_ner_pipeline(path, backend="hf"):
+    tok, model = load_ner_model(path, backend)
+    return pipeline("ner", model=model, tokenizer=tok, aggregation_strategy="simple")
@@ -0,0 +1,217 @@
+# t_ner_memo.py
+# memo ระดับประโยคหน้า NER: ข่าวไทยมีประโยคซ้ำเยอะ (เครดิตสำนักข่าว, ประโยคเปิดมาตรฐาน, ตำแหน่ง/ชื่อหน่วยงานซ้ำ ๆ)
+# แบ่งเอกสารเป็นประโยค → hash ประโยค (strip แล้ว) → cache entity (offset เทียบกับประโยค)
+# เฉพาะประโยคที่ไม่อยู่ใน cache ถูกส่งเข้าโมเดล (ต่อกันเป็น pack เต็มงบ token) แล้วเลื่อน offset กลับเป็นตำแหน่งในเอกสาร
+#   python script/t_ner_memo.py --input data/t_news.jsonl          (รายงาน hit rate บน corpus ไม่ต้องโหลดโมเดล)
+import argparse, hashlib, json, re, threading
+from bisect import bisect_right
+from collections import Counter, OrderedDict
+
+from t_auto_label import MAX_TOKENS, chunk, count_tokens, split_units
+
+# ขอบประโยค: ช่องว่างหลังเครื่องหมายจบประโยค (ไม่ตัดกลางตัวย่อ เช่น ต.ค. / พ.ศ.), ขึ้นบรรทัด หรือช่องว่างตั้งแต่ 2 ตัว
+# ไม่ตัดที่ช่องว่างเดี่ยว: ชื่อ-นามสกุลไทยมีช่องว่าง
+MEMO_SPLIT = re.compile(r"(?<=[.!?…“”])\s+|\n|\s{2,}")
+
+def regex_sentences(text):
+    return split_units(text, MEMO_SPLIT)
+
+def crfcut_sentences(text):
+    """ตัดประโยคด้วย crfcut (ผลเดียวกับ sent_tokenize) แม่นกว่าแต่ช้ากว่า regex มาก — offset มาจาก token โดยตรง"""
+    from t_summarizer import sentence_spans
+    return sentence_spans(text)
+
+SPLITTERS = {"regex": regex_sentences, "crfcut": crfcut_sentences}
+
+def sentence_key(s):
+    return hashlib.blake2b(s.encode("utf-8"), digest_size=16).digest()
+
+def sentences(text, split="regex"):
+    """[(offset, ประโยคที่ strip แล้ว)] ข้ามชิ้นที่เป็นช่องว่างล้วน"""
+    out = []
+    for s, e in SPLITTERS[split](text):
+        piece = text[s:e]
+        stripped = piece.strip()
+        if stripped:
+            out.append((s + len(piece) - len(piece.lstrip()), stripped))
+    return out
+
+class NERMemo:
+    """
+    ครอบ NER pipeline (aggregation_strategy="simple") ให้ใช้แทนกันได้: memo(text) → [{'entity_group','score','word','start','end'}]
+    cache = LRU ของ hash ประโยค → ((label, start, end, score, word), ...) โดย start/end เทียบกับประโยค
+    """
+
+    def __init__(self, ner, tokenizer=None, maxsize=50000, max_tokens=MAX_TOKENS, batch_size=16, batch_tokens=1024,
+                 split="regex"):
+        self.ner = ner
+        self.tokenizer = tokenizer if tokenizer is not None else getattr(ner, "tokenizer", None)
+        self.maxsize, self.max_tokens, self.split = maxsize, max_tokens, split
+        self.batch_size, self.batch_tokens = batch_size, batch_tokens
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = Counter()
+
+    # ---------- model ----------
+    def _run_model(self, texts):
+        try:
+            from transformers import Pipeline
+            batched = isinstance(self.ner, Pipeline)
+        except ImportError:
+            batched = False
+        if batched and len(texts) > 1:
+            return self.ner(texts, batch_size=len(texts))
+        return [self.ner(t) for t in texts]
+
+    def _pack(self, sents):
+        """
+        ประโยคที่ miss → packs [(ข้อความ, [(index ประโยค, offset ใน pack, offset ในประโยค, ความยาว)], tokens)]
+        ต่อหลายประโยคเข้าด้วยกัน (คั่นด้วยช่องว่าง) ให้เต็มงบ token → จำนวน forward pass ใกล้เคียง chunk() ทั้งเอกสาร
+        ประโยคที่ยาวเกินงบแบ่งด้วย chunk() ก่อน; ไม่มี tokenizer = ประโยคละ 1 pack
+        """
+        if self.tokenizer is None:
+            return [(s, [(i, 0, 0, len(s))], 0) for i, s in enumerate(sents)]
+        budget = min(self.max_tokens, self.tokenizer.model_max_length - self.tokenizer.num_special_tokens_to_add())
+        pieces = []  # (index ประโยค, offset ในประโยค, ข้อความ, tokens)
+        for i, (s, n) in enumerate(zip(sents, count_tokens(sents, self.tokenizer))):
+            if n <= budget:
+                pieces.append((i, 0, s, n))
+                continue
+            parts = chunk(s, self.tokenizer, max_tokens=self.max_tokens)
+            pieces.extend((i, off, p, k) for (off, p), k in zip(parts, count_tokens([p for _, p in parts], self.tokenizer)))
+        packs, cur, cur_n = [], [], 0
+        for piece in pieces:
+            if cur and cur_n + piece[3] + 1 > budget:
+                packs.append(cur)
+                cur, cur_n = [], 0
+            cur.append(piece)
+            cur_n += piece[3] + 1
+        if cur:
+            packs.append(cur)
+        out = []
+        for pack in packs:
+            spans, pos = [], 0
+            for i, off, p, _ in pack:
+                spans.append((i, pos, off, len(p)))
+                pos += len(p) + 1
+            out.append((" ".join(p for _, _, p, _ in pack), spans, sum(k for *_, k in pack)))
+        return out
+
+    def _batches(self, lengths):
+        """จัดกลุ่ม index (เรียงตามความยาว) ให้แต่ละ batch ยาวใกล้กัน (≤ 1.25 เท่า) และ padded tokens ≤ batch_tokens"""
+        order = sorted(range(len(lengths)), key=lengths.__getitem__)
+        out, cur = [], []
+        for j in order:
+            if cur and (len(cur) >= self.batch_size or lengths[j] > 1.25 * max(lengths[cur[0]], 1)
+                        or (len(cur) + 1) * lengths[j] > self.batch_tokens):
+                out.append(cur)
+                cur = []
+            cur.append(j)
+        if cur:
+            out.append(cur)
+        return out
+
+    def _predict(self, sents):
+        """ประโยคที่ miss → entity ของแต่ละประโยค (offset เทียบกับประโยค)"""
+        packs = self._pack(sents)
+        results = [[] for _ in sents]
+        for batch in self._batches([n for _, _, n in packs]):
+            self.stats["model_batches"] += 1
+            self.stats["model_passes"] += len(batch)
+            for j, ents in zip(batch, self._run_model([packs[j][0] for j in batch])):
+                spans = packs[j][1]
+                starts = [p for _, p, _, _ in spans]
+                for e in ents:
+                    s, t = int(e["start"]), int(e["end"])
+                    k = bisect_right(starts, s) - 1
+                    i, pos, off, length = spans[k]
+                    if s >= pos + length:
+                        continue  # ตกบนช่องว่างที่ใช้คั่นประโยค
+                    results[i].append((e.get("entity_group") or e.get("entity"), s - pos + off,
+                                       min(t - pos, length) + off, float(e.get("score", 0.0)), e.get("word", "")))
+        self.stats["model_sentences"] += len(sents)
+        return [tuple(r) for r in results]
+
+    # ---------- cache ----------
+    def predict_units(self, text, units=None):
+        """
+        [(offset, ประโยค, entities เทียบกับประโยค)] ของทั้งเอกสาร
+        units = [(start, end)] ขอบประโยคที่ตัดไว้แล้ว (เช่นจาก t_summarizer.summarize) → ไม่ต้องตัดประโยคซ้ำ
+        """
+        if units is None:
+            units = sentences(text, self.split)
+        else:
+            units = [(s, text[s:e]) for s, e in units if text[s:e].strip()]
+        keys = [sentence_key(s) for _, s in units]
+        found, miss = {}, {}
+        with self.lock:
+            for (_, s), k in zip(units, keys):
+                v = self.cache.get(k)
+                if v is not None:
+                    self.cache.move_to_end(k)
+                    found[k] = v
+                    self.stats["hits"] += 1
+                    self.stats["chars_hit"] += len(s)
+                elif k not in miss:
+                    miss[k] = s
+                    self.stats["misses"] += 1
+                else:
+                    self.stats["hits"] += 1  # ซ้ำในเอกสารเดียวกัน: รันโมเดลครั้งเดียว
+                    self.stats["chars_hit"] += len(s)
+                self.stats["chars"] += len(s)
+        if miss:
+            fresh = dict(zip(miss, self._predict(list(miss.values()))))
+            found.update(fresh)
+            with self.lock:
+                for k, v in fresh.items():
+                    self.cache[k] = v
+                while len(self.cache) > self.maxsize:
+                    self.cache.popitem(last=False)
+        self.stats["docs"] += 1
+        return [(off, s, found[k]) for (off, s), k in zip(units, keys)]
+
+    def __call__(self, text, units=None):
+        return [{"entity_group": lab, "score": score, "word": word, "start": off + s, "end": off + e}
+                for off, _, ents in self.predict_units(text, units) for lab, s, e, score, word in ents]
+
+    def hit_rate(self):
+        n = self.stats["hits"] + self.stats["misses"]
+        return {"sentences": n, "hit_rate": self.stats["hits"] / n if n else 0.0,
+                "char_hit_rate": self.stats["chars_hit"] / self.stats["chars"] if self.stats["chars"] else 0.0,
+                "cache_size": len(self.cache), **{k: self.stats[k] for k in ("docs", "model_sentences", "model_passes", "model_batches")}}
+
+    def report(self):
+        r = self.hit_rate()
+        return (f"🧠 NER memo: {r['sentences']} sentences | hit {r['hit_rate']:.1%} (chars {r['char_hit_rate']:.1%}) "
+                f"| model ran {r['model_sentences']} sentences in {r['model_passes']} passes | cache {r['cache_size']}")
+
+def simulate(texts, split="regex", maxsize=50000, top=10):
+    """hit rate ที่จะได้บน corpus (เรียงตามลำดับไฟล์) โดยไม่รันโมเดล"""
+    memo = NERMemo(lambda t: [], maxsize=maxsize, split=split)
+    common = Counter()
+    for t in texts:
+        for _, s, _ in memo.predict_units(t):
+            common[s] += 1
+    return memo, [(n, s) for s, n in common.most_common(top) if n > 1]
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--input", nargs="+", default=["data/t_news.jsonl"])
+    ap.add_argument("--split", choices=sorted(SPLITTERS), nargs="+", default=["regex"])
+    ap.add_argument("--maxsize", type=int, default=50000)
+    ap.add_argument("--top", type=int, default=10)
+    args = ap.parse_args()
+
+    for path in args.input:
+        with open(path, encoding="utf-8") as f:
+            texts = [(json.loads(l).get("text") or "") for l in f if l.strip()]
+        for split in args.split:
+            memo, common = simulate(texts, split, args.maxsize, args.top)
+            r = memo.hit_rate()
+            print(f"📄 {path} [{split}] {len(texts)} docs | {r['sentences']} sentences | hit {r['hit_rate']:.1%} "
+                  f"| chars {r['char_hit_rate']:.1%}")
+            for n, s in common:
+                print(f"   {n:>5} × {s[:80]}")
+
+if __name__ == "__main__":
+    main()
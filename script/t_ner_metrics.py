@@ -0,0 +1,113 @@
+# t_ner_metrics.py
+# span-level F1 แบบ seqeval (โหมด default/conlleval) ที่สะสม TP/FP/FN ทีละ batch
+# ไม่ต้องเก็บ logits / list ของ tag ทั้ง eval set ไว้ในหน่วยความจำ
+from collections import Counter
+import numpy as np
+
+def _end_of_chunk(prev_tag, tag, prev_type, type_):
+    if prev_tag in ("E", "S"):
+        return True
+    if prev_tag in ("B", "I") and tag in ("B", "S", "O"):
+        return True
+    return prev_tag not in ("O", ".") and prev_type != type_
+
+def _start_of_chunk(prev_tag, tag, prev_type, type_):
+    if tag in ("B", "S"):
+        return True
+    if prev_tag in ("E", "S", "O") and tag in ("E", "I"):
+        return True
+    return tag not in ("O", ".") and prev_type != type_
+
+def get_entities(tags):
+    """[(type, start, end)] ของ 1 ประโยค (ตรงกับ seqeval.metrics.sequence_labeling.get_entities)"""
+    chunks = []
+    prev_tag, prev_type, begin = "O", "", 0
+    for i, chunk in enumerate(list(tags) + ["O"]):
+        tag = chunk[0]
+        type_ = chunk[1:].split("-", maxsplit=1)[-1] or "_"
+        if _end_of_chunk(prev_tag, tag, prev_type, type_):
+            chunks.append((prev_type, begin, i - 1))
+        if _start_of_chunk(prev_tag, tag, prev_type, type_):
+            begin = i
+        prev_tag, prev_type = tag, type_
+    return chunks
+
+def _to_numpy(x):
+    if hasattr(x, "detach"):
+        x = x.detach().cpu().numpy()
+    return np.asarray(x)
+
+class SpanF1:
+    """
+    ใช้กับ Trainer(batch_eval_metrics=True, preprocess_logits_for_metrics=argmax_logits):
+        metric = SpanF1(id2label); Trainer(..., compute_metrics=metric)
+    หรือเรียก update(pred_ids, label_ids) เองทีละ batch แล้ว result()
+    """
+
+    def __init__(self, id2label, verbose=True, digits=4):
+        self.id2label = dict(id2label)
+        self.verbose = verbose
+        self.digits = digits
+        self.reset()
+
+    def reset(self):
+        self.tp, self.n_pred, self.n_true = Counter(), Counter(), Counter()
+
+    def update(self, pred_ids, label_ids):
+        pred_ids, label_ids = _to_numpy(pred_ids), _to_numpy(label_ids)
+        if pred_ids.ndim == label_ids.ndim + 1:  # ยังเป็น logits
+            pred_ids = pred_ids.argmax(-1)
+        for pr, lb in zip(pred_ids, label_ids):
+            keep = lb != -100
+            true = set(get_entities([self.id2label[i] for i in lb[keep].tolist()]))
+            pred = set(get_entities([self.id2label[i] for i in pr[keep].tolist()]))
+            self.tp.update(t for t, _, _ in true & pred)
+            self.n_true.update(t for t, _, _ in true)
+            self.n_pred.update(t for t, _, _ in pred)
+
+    @staticmethod
+    def _prf(tp, n_pred, n_true):
+        p = tp / n_pred if n_pred else 0.0
+        r = tp / n_true if n_true else 0.0
+        return p, r, (2 * p * r / (p + r) if p + r else 0.0)
+
+    def f1(self):
+        return self._prf(sum(self.tp.values()), sum(self.n_pred.values()), sum(self.n_true.values()))[2]
+
+    def report(self):
+        """ตารางเดียวกับ seqeval.metrics.classification_report(digits=...)"""
+        names = sorted(set(self.n_true) | set(self.n_pred))
+        rows = [(n, *self._prf(self.tp[n], self.n_pred[n], self.n_true[n]), self.n_true[n]) for n in names]
+        width = max([len(n) for n in names] + [len("weighted avg"), self.digits])
+        head_fmt = "{:>{width}s} " + " {:>9}" * 4
+        row_fmt = "{:>{width}s} " + " {:>9.{digits}f}" * 3 + " {:>9}\n"
+        out = head_fmt.format("", "precision", "recall", "f1-score", "support", width=width) + "\n\n"
+        for row in rows:
+            out += row_fmt.format(*row, width=width, digits=self.digits)
+        out += "\n"
+        support = sum(r[4] for r in rows)
+        micro = self._prf(sum(self.tp.values()), sum(self.n_pred.values()), sum(self.n_true.values()))
+        out += row_fmt.format("micro avg", *micro, support, width=width, digits=self.digits)
+        macro = [float(np.mean([r[k] for r in rows])) if rows else 0.0 for k in (1, 2, 3)]
+        out += row_fmt.format("macro avg", *macro, support, width=width, digits=self.digits)
+        weighted = [float(np.average([r[k] for r in rows], weights=[r[4] for r in rows])) if support else 0.0
+                    for k in (1, 2, 3)]
+        out += row_fmt.format("weighted avg", *weighted, support, width=width, digits=self.digits)
+        return out
+
+    def result(self):
+        res = {"overall_f1": self.f1()}
+        if self.verbose:
+            print("\n" + self.report() + "\n")
+        self.reset()
+        return res
+
+    def __call__(self, p, compute_result=True):
+        self.update(p.predictions, p.label_ids)
+        return self.result() if compute_result else {}
+
+def argmax_logits(logits, labels):
+    """preprocess_logits_for_metrics: ย่อ logits (batch×len×labels) เหลือ id ตั้งแต่ในแต่ละ batch"""
+    if isinstance(logits, tuple):
+        logits = logits[0]
+    return logits.argmax(dim=-1)
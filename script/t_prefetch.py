@@ -0,0 +1,143 @@
+# t_prefetch.py
+# cache ผลวิเคราะห์ใน app + งานเบื้องหลังที่ไล่อ่าน RSS (t_prepare_data.RSS_FEEDS) แล้ววิเคราะห์ข่าวใหม่ไว้ก่อน
+# → ผู้ใช้วางลิงก์ข่าวสดจากฟีดเหล่านี้ครั้งแรกก็เจอ cache เลย (ไม่ต้องรอ fetch + สรุป + NER)
+# จำกัด CPU: ทำเฉพาะตอนไม่มี request ค้าง + duty cycle (ใช้เวลาประมวลผลไม่เกิน budget ของเวลาจริง)
+import os, threading, time
+from collections import OrderedDict
+
+class ResultCache:
+    """LRU + TTL (thread-safe) เก็บได้ทั้งข้อความข่าวที่ fetch แล้ว และผลวิเคราะห์"""
+
+    def __init__(self, maxsize=512, ttl=6 * 3600):
+        self.maxsize, self.ttl = maxsize, ttl
+        self.data = OrderedDict()  # key → (expire_at, value)
+        self.lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            item = self.data.get(key)
+            if item is None or item[0] < time.time():
+                self.misses += 1   # ของที่หมดอายุยังเก็บไว้ (ให้ get_stale ใช้ตอนงบเวลาไม่พอ) จนถูก LRU ไล่ออก
+                return None
+            self.data.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def get_stale(self, key):
+        """คืนค่าแม้หมดอายุแล้ว (ไม่มี = None) — ใช้เป็นทางสำรองเมื่อคำนวณใหม่ไม่ทัน"""
+        with self.lock:
+            item = self.data.get(key)
+            return None if item is None else item[1]
+
+    def put(self, key, value):
+        with self.lock:
+            self.data[key] = (time.time() + self.ttl, value)
+            self.data.move_to_end(key)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
+    def __contains__(self, key):
+        with self.lock:
+            item = self.data.get(key)
+            return item is not None and item[0] >= time.time()
+
+    def stats(self):
+        return {"size": len(self.data), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
+
+def lower_thread_priority(nice=10):
+    """ลด priority ของ thread นี้ (Linux: setpriority รายเธรดได้) — ที่อื่นข้ามไป"""
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), nice)
+    except (AttributeError, OSError):
+        pass
+
+class FeedPrefetcher(threading.Thread):
+    """
+    ทุก interval วินาที: อ่านฟีด → ลิงก์ที่ยังไม่อยู่ใน cache → fetch(url) → analyze(url, raw)
+    - is_busy() = True (มี request สดค้าง) → หยุดรอก่อนเริ่มงานที่ใช้ CPU ทุกชิ้น
+    - cpu_budget = สัดส่วนเวลาที่ยอมให้ใช้ประมวลผล เช่น 0.2 → ทำงาน 1s แล้วพัก 4s
+    - analyze โยน exception ใน retry_on (เช่น Overloaded = ไม่ได้ช่องงาน) → ไม่นับว่าลองแล้ว รอบหน้าลองใหม่
+    """
+
+    def __init__(self, feeds, list_urls, fetch, analyze, is_cached, is_busy=lambda: False,
+                 interval=600, per_feed=20, cpu_budget=0.2, max_seen=5000, retry_on=()):
+        super().__init__(name="feed-prefetch", daemon=True)
+        self.feeds, self.list_urls, self.fetch, self.analyze = list(feeds), list_urls, fetch, analyze
+        self.is_cached, self.is_busy = is_cached, is_busy
+        self.retry_on = tuple(retry_on)
+        self.interval, self.per_feed = interval, per_feed
+        self.cpu_budget = min(max(cpu_budget, 0.01), 1.0)
+        self.seen = OrderedDict()  # ลิงก์ที่ลองแล้ว (สำเร็จ/ล้มเหลวถาวร) ไม่ต้องลองซ้ำทุกรอบ
+        self.max_seen = max_seen
+        self.stop_event = threading.Event()
+        self.stats = {"cycles": 0, "prefetched": 0, "failed": 0, "skipped_cached": 0,
+                      "shed": 0, "busy_waits": 0, "work_s": 0.0, "last_cycle": None}
+
+    def stop(self):
+        self.stop_event.set()
+
+    def wait_idle(self):
+        waited = False
+        while self.is_busy() and not self.stop_event.is_set():
+            waited = True
+            self.stop_event.wait(0.5)
+        if waited:
+            self.stats["busy_waits"] += 1
+        return not self.stop_event.is_set()
+
+    def throttle(self, spent):
+        """พักให้สัดส่วน ทำงาน : ทั้งหมด ไม่เกิน cpu_budget"""
+        self.stats["work_s"] += spent
+        self.stop_event.wait(spent * (1 - self.cpu_budget) / self.cpu_budget)
+
+    def mark_seen(self, url):
+        self.seen[url] = True
+        while len(self.seen) > self.max_seen:
+            self.seen.popitem(last=False)
+
+    def run_cycle(self):
+        for feed in self.feeds:
+            try:
+                urls = self.list_urls(feed, self.per_feed)
+            except Exception:
+                continue
+            for url in urls:
+                if self.stop_event.is_set():
+                    return
+                if url in self.seen:
+                    continue
+                if self.is_cached(url):
+                    self.stats["skipped_cached"] += 1
+                    self.mark_seen(url)
+                    continue
+                self.mark_seen(url)
+                try:
+                    raw = self.fetch(url)             # I/O: ไม่นับใน budget
+                except Exception:
+                    self.stats["failed"] += 1
+                    continue
+                if not self.wait_idle():
+                    return
+                t0 = time.perf_counter()
+                try:
+                    self.analyze(url, raw)
+                    self.stats["prefetched"] += 1
+                except self.retry_on:
+                    self.seen.pop(url, None)      # ถูก shed ไม่ใช่ข่าวเสีย → รอบหน้าลองใหม่ (ข้อความยังอยู่ใน fetch cache)
+                    self.stats["shed"] += 1
+                except Exception:
+                    self.stats["failed"] += 1
+                self.throttle(time.perf_counter() - t0)
+        self.stats["cycles"] += 1
+        self.stats["last_cycle"] = time.strftime("%Y-%m-%d %H:%M:%S")
+
+    def run(self):
+        lower_thread_priority()
+        while not self.stop_event.is_set():
+            self.run_cycle()
+            self.stop_event.wait(self.interval)
+
+    def status(self):
+        return {"alive": self.is_alive(), "feeds": len(self.feeds), "interval_s": self.interval,
+                "cpu_budget": self.cpu_budget, **self.stats, "work_s": round(self.stats["work_s"], 1)}
@@ -22,7 +22,6 @@ RSS_FEEDS = list(dict.fromkeys([
 ]))
 
 output_file = Path("data2/t_news.jsonl")
-output_file.parent.mkdir(parents=True, exist_ok=True)
 
 UA = [
     "Mozilla/5.0 (Windows NT 10.0; Win64; x64)",
@@ -116,6 +115,7 @@ def main():
         if len(bag) >= target_total:
             break
 
+    output_file.parent.mkdir(parents=True, exist_ok=True)
     with output_file.open("w", encoding="utf-8") as f:
         for it in bag:
             f.write(json.dumps(it, ensure_ascii=False) + "\n")
@@ -0,0 +1,303 @@
+# t_spans.py
+# ที่เก็บ span ของ entity แบบคอลัมน์ (NumPy) ใช้ร่วมกันทุกขั้น post-process ของ NER
+# (app.highlight_entities เมื่อ span เยอะ / t_auto_label.label_text / t_clean_labeled_news.clean_records / t_convert_to_iob)
+# - start / end (int32), label (int16 → LABELS), score (float64 ให้ค่าตรงกับ JSON เดิม) — ไม่มี dict / สตริงต่อ span
+# - คำ = text[start:end] สร้างเมื่อขอเท่านั้น (ไม่เก็บสำเนา)
+# - ตัวกรอง (score ตาม label, ความยาว, stopword, ซ้อนกัน) คิดเป็น mask แล้วบีบคอลัมน์ในที่เดิม (keep)
+import threading
+
+import numpy as np
+
+LABELS = []        # id → ชื่อ label (เพิ่มเองเมื่อเจอ label ใหม่)
+LABEL_IDS = {}
+_LABEL_LOCK = threading.Lock()   # highlight_entities รันพร้อมกันหลาย thread → ลงทะเบียน label ทีละตัว
+
+def label_id(name):
+    i = LABEL_IDS.get(name)
+    if i is None:
+        with _LABEL_LOCK:
+            i = LABEL_IDS.get(name)
+            if i is None:
+                LABELS.append(name)                  # ใส่ชื่อก่อน id → ใครเห็น id ก็เปิด LABELS ได้เสมอ
+                i = LABEL_IDS[name] = len(LABELS) - 1
+    return i
+
+# label ชุดหลักลงทะเบียนตอน import (id คงที่ทุก process / ไม่ต้องแย่ง lock ตอนใช้งานจริง)
+for _name in ("PERSON", "LOCATION", "ORGANIZATION", "DATE", "TIME", "MONEY", "PERCENT", "LAW"):
+    label_id(_name)
+
+def label_ids(names):
+    ids = LABEL_IDS
+    return np.array([ids[n] if n in ids else label_id(n) for n in names], dtype=np.int16)
+
+class Spans:
+    """
+    spans = Spans.from_pipeline(text, ner(text))
+    spans.keep(spans.score >= spans.thresholds(THRESHOLD))      # กรองในที่เดิม
+    spans.drop_words(STOP_ENTS); spans.drop_contained()
+    spans.to_dicts()                                           # → [{'start','end','label','word','score'}]
+    """
+
+    __slots__ = ("text", "start", "end", "label", "score")
+
+    def __init__(self, text, start=(), end=(), label=(), score=()):
+        self.text = text
+        self.start = np.asarray(start, dtype=np.int32)
+        self.end = np.asarray(end, dtype=np.int32)
+        self.label = np.asarray(label, dtype=np.int16)
+        self.score = np.asarray(score, dtype=np.float64)
+
+    # ---------- สร้าง ----------
+    @classmethod
+    def from_columns(cls, text, start, end, labels, score):
+        """labels = ชื่อ label (str) ต่อ span"""
+        return cls(text, start, end, label_ids(list(labels)), score)
+
+    @classmethod
+    def from_pipeline(cls, text, raw):
+        """ผล HF pipeline [{'entity_group'|'entity','start','end','score'}] (ตัด O และ span ที่ offset ใช้ไม่ได้)"""
+        rows = [((r.get("entity_group") or r.get("entity") or "O"), int(r.get("start", -1)), int(r.get("end", -1)),
+                 float(r.get("score", 0.0))) for r in raw]
+        rows = [r for r in rows if r[0] != "O" and 0 <= r[1] < r[2]]
+        if not rows:
+            return cls(text)
+        labs, starts, ends, scores = zip(*rows)
+        return cls.from_columns(text, starts, ends, labs, scores)
+
+    @classmethod
+    def from_entities(cls, text, ents, default_score=1.0):
+        """entities ในไฟล์ JSONL ที่มี start/end (label จากคีย์ entity ตัวพิมพ์ใหญ่)"""
+        rows = [((e.get("entity") or "").strip().upper(), int(e["start"]), int(e["end"]),
+                 float(e.get("score", default_score))) for e in ents if "start" in e and "end" in e]
+        if not rows:
+            return cls(text)
+        labs, starts, ends, scores = zip(*rows)
+        return cls.from_columns(text, starts, ends, labs, scores)
+
+    @classmethod
+    def from_words(cls, ents, default_score=1.0, sep="\x00"):
+        """
+        entities ที่ใช้ offset ไม่ได้ (เช่น start/end ในไฟล์เก่าไม่ตรงกับ text) → ต่อคำเป็น text เดียวคั่นด้วย sep
+        คำของ span i = word เดิมของ entity i; ต่อหลาย record ได้ (ลำดับ start ไม่ข้ามกัน ใช้ bases แบ่งกลับ)
+        """
+        words, labs, scores = [], [], []
+        for e in ents:
+            words.append(e.get("word") or "")
+            labs.append((e.get("entity") or "").strip().upper())
+            scores.append(float(e.get("score", default_score)))
+        lens = np.fromiter(map(len, words), dtype=np.int64, count=len(words))
+        start = np.zeros(len(words), dtype=np.int64)
+        np.cumsum(lens[:-1] + len(sep), out=start[1:])
+        return cls(sep.join(words), start, start + lens, label_ids(labs), scores)
+
+    @classmethod
+    def find_words(cls, text, ents):
+        """ทุกตำแหน่งที่คำ entity ปรากฏใน text ตามลำดับ entity (เหมือน t_convert_to_iob.find_entity_spans)"""
+        starts, ends, labs, scores, occ = [], [], [], [], {}
+        for e in ents:
+            w = (e.get("word") or "").strip()
+            lab = (e.get("entity") or "").strip().upper()
+            if not w or not lab:
+                continue
+            hits = occ.get(w)
+            if hits is None:
+                hits, i = [], text.find(w)
+                while i >= 0:
+                    hits.append(i)
+                    i = text.find(w, i + len(w))
+                occ[w] = hits
+            lid = label_id(lab)
+            starts.extend(hits)
+            ends.extend(i + len(w) for i in hits)
+            labs.extend([lid] * len(hits))
+            scores.extend([float(e.get("score", 1.0))] * len(hits))
+        return cls(text, starts, ends, labs, scores)
+
+    # ---------- อ่าน ----------
+    def __len__(self):
+        return len(self.start)
+
+    def word(self, i):
+        return self.text[self.start[i]:self.end[i]]
+
+    @property
+    def words(self):
+        return [self.text[s:e] for s, e in zip(self.start.tolist(), self.end.tolist())]
+
+    @property
+    def lengths(self):
+        return self.end - self.start
+
+    def is_label(self, *names):
+        lut = np.zeros(len(LABELS) + 1, dtype=bool)   # ตารางเปิดตาม label id (ถูกกว่า np.isin กับ span ไม่กี่ตัว)
+        lut[[LABEL_IDS[n] for n in names if n in LABEL_IDS]] = True
+        return lut[self.label]
+
+    def thresholds(self, table, default=0.0):
+        """threshold ราย span จาก dict label → ค่า"""
+        lut = np.array([table.get(n, default) for n in LABELS] or [default], dtype=np.float64)
+        return lut[self.label]
+
+    def nbytes(self):
+        return self.start.nbytes + self.end.nbytes + self.label.nbytes + self.score.nbytes
+
+    # ---------- แก้ไขในที่เดิม ----------
+    def keep(self, mask):
+        """บีบทุกคอลัมน์ให้เหลือเฉพาะ mask (เขียนทับ buffer เดิม ไม่สร้างคอลัมน์ใหม่)"""
+        idx = np.flatnonzero(mask)
+        n = len(idx)
+        if n == len(self):
+            return self
+        for name in ("start", "end", "label", "score"):
+            col = getattr(self, name)
+            col[:n] = col[idx]
+            setattr(self, name, col[:n])
+        return self
+
+    def reorder(self, order):
+        for name in ("start", "end", "label", "score"):
+            setattr(self, name, getattr(self, name)[order])
+        return self
+
+    def strip(self, lead=None, trail=None):
+        """
+        เลื่อน start/end ข้ามช่องว่าง (หรือตัวอักษรใน lead / trail) หัวท้าย แบบ str.lstrip/rstrip — span ที่เหลือว่างถูกตัดทิ้ง
+        ดูตัวอักษรแรก/สุดท้ายของทุก span แบบ vectorized ก่อน → วนเฉพาะ span ที่ต้องตัดจริง
+        """
+        self.keep(self.end > self.start)
+        if not len(self):
+            return self
+        text, trail = self.text, lead if trail is None else trail
+        codes = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+        def hits(c, chars):
+            uniq, inv = np.unique(c, return_inverse=True)
+            return np.array([chr(x).isspace() if chars is None else chr(x) in chars for x in uniq.tolist()], dtype=bool)[inv]
+        cand = np.flatnonzero(hits(codes[self.start], lead) | hits(codes[self.end - 1], trail))
+        if not len(cand):
+            return self
+        starts, ends = [], []
+        for s, e in zip(self.start[cand].tolist(), self.end[cand].tolist()):
+            w = text[s:e]
+            starts.append(s + len(w) - len(w.lstrip(lead)))
+            ends.append(e - len(w) + len(w.rstrip(trail)))
+        self.start[cand] = starts
+        self.end[cand] = ends
+        return self.keep(self.end > self.start)
+
+    def relabel(self, mask, name):
+        self.label[mask] = label_id(name)
+        return self
+
+    def word_mask(self, words, labels=None):
+        """span ที่คำอยู่ใน words — เทียบสตริงเฉพาะ span ที่ยาวพอจะเป็นคำใน words ได้"""
+        words = set(words)
+        if not words or not len(self):
+            return np.zeros(len(self), dtype=bool)
+        lut = np.zeros(max(map(len, words)) + 2, dtype=bool)
+        lut[[len(w) for w in words]] = True
+        cand = lut[np.minimum(self.lengths, len(lut) - 1)]
+        if labels is not None:
+            cand &= self.is_label(*labels)
+        idx = np.flatnonzero(cand)
+        mask = np.zeros(len(self), dtype=bool)
+        text = self.text
+        mask[idx] = [text[s:e] in words for s, e in zip(self.start[idx].tolist(), self.end[idx].tolist())]
+        return mask
+
+    def drop_words(self, words, labels=None):
+        return self.keep(~self.word_mask(words, labels))
+
+    def contained_mask(self):
+        """
+        span ที่ถูก span อื่น label เดียวกันครอบและยาวกว่า (แบบ highlight_entities เดิม) — O(n log n) แทน O(n²)
+        เรียง (label, start, -end) แล้ว span i ถูกครอบเมื่อ
+          - มี span ก่อนหน้าที่ start < start_i และ end ≥ end_i (cummax ของ end ถึงกลุ่ม start ก่อนหน้า) หรือ
+          - มี span start เท่ากันแต่ end > end_i (ตัวแรกของกลุ่ม start เดียวกัน)
+        """
+        n = len(self)
+        if n < 2:
+            return np.zeros(n, dtype=bool)
+        order = np.lexsort((-self.end, self.start, self.label))
+        s, e, lab = self.start[order].astype(np.int64), self.end[order].astype(np.int64), self.label[order].astype(np.int64)
+        big = int(e.max()) + 1
+        adj = e + lab * big                     # label มาก่อน = ค่าน้อยกว่าเสมอ → cummax ไม่ข้ามกลุ่ม label
+        cm = np.maximum.accumulate(adj)
+        new_group = np.ones(n, dtype=bool)
+        new_group[1:] = (s[1:] != s[:-1]) | (lab[1:] != lab[:-1])
+        first = np.maximum.accumulate(np.where(new_group, np.arange(n), 0))
+        prev = np.where(first > 0, cm[np.maximum(first - 1, 0)], -1)
+        contained = (prev >= adj) | (e[first] > e)
+        out = np.empty(n, dtype=bool)
+        out[order] = contained
+        return out
+
+    def drop_contained(self):
+        return self.keep(~self.contained_mask())
+
+    def dedupe(self):
+        """ตัด span ซ้ำ (start, end, label) เก็บตัวแรก ตามลำดับเดิม"""
+        if len(self) < 2:
+            return self
+        key = np.stack([self.start.astype(np.int64), self.end.astype(np.int64), self.label.astype(np.int64)], axis=1)
+        _, first = np.unique(key, axis=0, return_index=True)
+        mask = np.zeros(len(self), dtype=bool)
+        mask[first] = True
+        return self.keep(mask)
+
+    # ---------- ส่งออก ----------
+    def to_dicts(self):
+        """[{'start','end','label','word','score'}] (รูปแบบใน highlight_entities)"""
+        return [{"start": s, "end": e, "label": LABELS[lab], "word": self.text[s:e], "score": sc}
+                for s, e, lab, sc in zip(self.start.tolist(), self.end.tolist(), self.label.tolist(), self.score.tolist())]
+
+    def to_entities(self):
+        """[{'entity','word','score','start','end'}] (รูปแบบในไฟล์ JSONL ของ t_auto_label)"""
+        return [{"entity": LABELS[lab], "word": self.text[s:e], "score": sc, "start": s, "end": e}
+                for s, e, lab, sc in zip(self.start.tolist(), self.end.tolist(), self.label.tolist(), self.score.tolist())]
+
+    # ---------- IOB ----------
+    def iob_ids(self, tok_start, tok_end):
+        """
+        tag id ของ token (0 = O, 1 + 2·label = B, 2 + 2·label = I) แบบเดียวกับ t_convert_to_iob.assign_iob
+        token ที่ทับ entity ≥ 0.5 ของความยาว token; entity ที่มาทีหลังชนะ
+        """
+        tok_start = np.asarray(tok_start, dtype=np.int64)
+        tok_end = np.asarray(tok_end, dtype=np.int64)
+        tags = np.zeros(len(tok_start), dtype=np.int32)
+        if not len(self) or not len(tok_start):
+            return tags
+        s, t = self.start.astype(np.int64), self.end.astype(np.int64)
+        lo = np.searchsorted(tok_end, s, side="right")
+        hi = np.searchsorted(tok_start, t, side="left")
+        cnt = np.maximum(hi - lo, 0)
+        ent = np.repeat(np.arange(len(self)), cnt)
+        tok = np.arange(cnt.sum()) - np.repeat(np.cumsum(cnt) - cnt, cnt) + np.repeat(lo, cnt)
+        a, b = tok_start[tok], tok_end[tok]
+        inter = np.minimum(b, t[ent]) - np.maximum(a, s[ent])
+        ok = (inter > 0) & (inter >= 0.5 * (b - a))
+        ent, tok = ent[ok], tok[ok]
+        if not len(ent):
+            return tags
+        is_first = np.ones(len(ent), dtype=bool)
+        is_first[1:] = ent[1:] != ent[:-1]
+        tag = 1 + 2 * self.label.astype(np.int32)[ent] + (~is_first)
+        # entity มาทีหลังชนะ: เลือกคู่สุดท้ายของแต่ละ token
+        last = len(tok) - 1 - np.unique(tok[::-1], return_index=True)[1]
+        tags[tok[last]] = tag[last]
+        return tags
+
+def fix_iob_ids(tags):
+    """เหมือน t_convert_to_iob.fix_iob บน tag id: I-X ที่ตัวก่อนหน้าไม่ใช่ X → B-X"""
+    tags = np.asarray(tags, dtype=np.int32)
+    typ = np.where(tags > 0, (tags - 1) // 2, -1)
+    prev = np.empty_like(typ)
+    prev[0:1] = -1
+    prev[1:] = typ[:-1]
+    bad = (tags > 0) & ((tags - 1) % 2 == 1) & (prev != typ)
+    out = tags.copy()
+    out[bad] -= 1
+    return out
+
+def iob_names(tags):
+    names = ["O"] + [f"{p}-{lab}" for lab in LABELS for p in ("B", "I")]
+    return [names[t] for t in tags.tolist()]
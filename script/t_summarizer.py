@@ -0,0 +1,217 @@
+# t_summarizer.py
+# สรุปข่าวแบบ extractive (TextRank) ที่ตัดคำ/ตัดประโยคครั้งเดียว แล้วคิดคะแนนด้วย NumPy/SciPy ทั้งหมด
+# - word_tokenize (newmm) ทั้งเอกสารครั้งเดียว → ใช้ token ชุดเดียวกันทั้งตัดประโยค (crfcut) และสร้างเมทริกซ์ประโยค×คำ
+# - TF-IDF (csr) → cosine similarity = X @ X.T → PageRank (power iteration) × prior ตามตำแหน่ง (ข่าวเล่าเรื่องสำคัญก่อน)
+# - คืน (start, end) ของประโยคในเอกสาร/ในบทสรุป → ขั้น NER (t_ner_memo) ใช้ขอบประโยคนี้ได้เลยไม่ต้องตัดซ้ำ
+#   python script/t_summarizer.py --input data/t_news.jsonl --n_sent 3     (พิมพ์บทสรุปตัวอย่าง)
+import argparse, json, re, sys
+from string import punctuation
+
+import numpy as np
+from scipy import sparse
+
+from pythainlp.corpus import thai_stopwords
+from pythainlp.tokenize import crfcut, word_tokenize
+
+STOPWORDS = frozenset(thai_stopwords()) | frozenset(punctuation) | {"“", "”", "‘", "’", "…", "–", "—", "ๆ", "ฯ"}
+NON_TERM = re.compile(r"[\W\d_]+")   # ช่องว่าง/เครื่องหมาย/ตัวเลขล้วน ไม่นับเป็นคำ
+FALLBACK_SPLIT = re.compile(r"(?<=[.!?…“”])\s+|\n|\s{2,}")
+
+# ค่าที่เลือกจาก bench_summarize.py (ROUGE-1 เทียบพาดหัว ใน data/t_news.jsonl): คะแนน = PageRank × (1 + ลำดับประโยค)^-LEAD_PRIOR
+DAMPING = 0.5
+LEAD_PRIOR = 2.0      # 0 = TextRank ล้วน
+
+# crfcut ไม่มี API สาธารณะสำหรับ tag บน token ที่ตัดไว้แล้ว → ใช้ชื่อภายในของโมดูล (ทดสอบกับ pythainlp==5.1.2 ตาม requirements.txt)
+# ถ้าอัปเกรดแล้วชื่อหาย: เตือนครั้งเดียวตอน import แล้ว segment() ใช้ทางสำรอง (regex) — TextRank ยังทำงาน
+CRF_INTERNALS = ("_tagger", "_ENDERS", "_STARTERS")
+CRF_MISSING = [n for n in CRF_INTERNALS if not hasattr(crfcut, n)]
+if CRF_MISSING:
+    import pythainlp
+    print(f"⚠️ t_summarizer: pythainlp {pythainlp.__version__} ไม่มี crfcut.{', crfcut.'.join(CRF_MISSING)} "
+          f"→ ตัดประโยคด้วย regex แทน crfcut (ตรวจ requirements.txt)", file=sys.stderr)
+
+# ---------- segmentation (ครั้งเดียว) ----------
+def tokenize_offsets(text):
+    """[(start, end)] ของ token จาก newmm (token ต่อกันครบทุกตัวอักษร)"""
+    out, pos = [], 0
+    for w in word_tokenize(text, engine="newmm", keep_whitespace=True):
+        out.append((pos, pos + len(w)))
+        pos += len(w)
+    return out
+
+def _crf_features(toks, window=2, max_n_gram=3):
+    """
+    เท่ากับ crfcut.extract_features ทุกตัวอักษร แต่ต่อ n-gram ของแต่ละตำแหน่งไว้ครั้งเดียวแล้วใช้ซ้ำ
+    (ของเดิม join สตริงใหม่ทุก feature ของทุก token → เป็นครึ่งหนึ่งของเวลาตัดประโยคข่าวยาว)
+    """
+    pad = ["xxpad"] * window
+    doc = pad + list(toks) + pad
+    cols = {"word": doc,
+            "ender": ["ender" if w in crfcut._ENDERS else "normal" for w in doc],
+            "starter": ["starter" if w in crfcut._STARTERS else "normal" for w in doc]}
+    grams = {(name, n): ["|".join(seq[j:j + n]) for j in range(len(seq) - n + 1)]
+             for name, seq in cols.items() for n in range(1, max_n_gram + 1)}
+    layout = [(f"{name}_{n}_{j}_{j + n}=", grams[name, n], j)
+              for n in range(1, min(max_n_gram + 1, 2 + window * 2))
+              for j in range(-window, window + 2 - n)
+              for name in cols]
+    return [["bias", *[prefix + values[i + j] for prefix, values, j in layout]]
+            for i in range(window, len(doc) - window)]
+
+def crf_sentences(text, offsets):
+    """ตัดประโยคด้วยโมเดล crfcut บน token ชุดเดิม → [(token แรก, token สุดท้าย + 1)] (กฎเดียวกับ crfcut.segment)"""
+    if CRF_MISSING:
+        raise RuntimeError(f"crfcut internals missing: {CRF_MISSING}")
+    toks = [text[s:e] for s, e in offsets]
+    if not toks:
+        return []
+    labs = crfcut._tagger.tag(_crf_features(toks))
+    labs[-1] = "E"
+    for i, w in enumerate(toks):
+        if w.strip().endswith(("!", ".", "?")):
+            labs[i] = "E"
+        elif (i == 0 or labs[i - 1] == "E") and w.strip() == "":
+            labs[i] = "I"
+    out, first = [], 0
+    for i, lab in enumerate(labs):
+        if lab == "E":
+            out.append((first, i + 1))
+            first = i + 1
+    return out
+
+def segment(text, offsets=None):
+    """
+    คืน (offsets ของ token, [(start, end, token แรก, token สุดท้าย + 1)] ของประโยคที่ strip แล้ว)
+    offsets: ส่ง token ที่ตัดไว้แล้วมาได้ (เช่นจาก t_tokenize_cache) จะไม่ตัดคำซ้ำ
+    """
+    offsets = tokenize_offsets(text) if offsets is None else offsets
+    try:
+        ranges = crf_sentences(text, offsets)
+    except Exception:
+        # สำรอง: ตัดตามช่องว่างหลังจบประโยค/ขึ้นบรรทัด แล้ว map กลับเป็นช่วง token
+        ends = sorted({m.end() for m in FALLBACK_SPLIT.finditer(text)} | {len(text)})
+        ranges, first, k = [], 0, 0
+        for i, (_, e) in enumerate(offsets):
+            while k < len(ends) and ends[k] < e:
+                k += 1
+            if k < len(ends) and e >= ends[k]:
+                ranges.append((first, i + 1))
+                first, k = i + 1, k + 1
+        if first < len(offsets):
+            ranges.append((first, len(offsets)))
+    sents = []
+    for a, b in ranges:
+        s, e = offsets[a][0], offsets[b - 1][1]
+        piece = text[s:e]
+        if piece.strip():
+            s += len(piece) - len(piece.lstrip())
+            e -= len(piece) - len(piece.rstrip())
+            sents.append((s, e, a, b))
+    return offsets, sents
+
+def sentence_spans(text):
+    """[(start, end)] ของประโยค (crfcut) ในเอกสาร"""
+    return [(s, e) for s, e, _, _ in segment(text)[1]]
+
+# ---------- scoring ----------
+def term_matrix(text, offsets, sents):
+    """TF-IDF แบบ sparse (ประโยค × คำ) แถว normalize L2 แล้ว (sublinear tf, smooth idf)"""
+    vocab, rows, cols = {}, [], []
+    for r, (_, _, a, b) in enumerate(sents):
+        for s, e in offsets[a:b]:
+            w = text[s:e].strip().lower()
+            if not w or w in STOPWORDS or NON_TERM.fullmatch(w):
+                continue
+            rows.append(r)
+            cols.append(vocab.setdefault(w, len(vocab)))
+    n = len(sents)
+    tf = sparse.csr_matrix((np.ones(len(rows), dtype=np.float32), (rows, cols)), shape=(n, max(len(vocab), 1)))
+    tf.sum_duplicates()
+    tf.data = 1.0 + np.log(tf.data)
+    df = np.bincount(tf.indices, minlength=tf.shape[1])
+    x = tf.multiply(np.log((1 + n) / (1 + df)) + 1.0).tocsr()
+    norms = np.sqrt(np.asarray(x.multiply(x).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return sparse.diags(1.0 / norms) @ x
+
+def pagerank(sim, prior=None, damping=DAMPING, tol=1e-6, max_iter=100):
+    """PageRank บนกราฟถ่วงน้ำหนัก (dense n×n) — prior = เวกเตอร์ teleport (None = สม่ำเสมอ), แถวที่ไม่มีเส้นเชื่อมกระโดดตาม prior"""
+    n = sim.shape[0]
+    prior = np.full(n, 1.0 / n) if prior is None else prior / prior.sum()
+    out_w = sim.sum(axis=1)
+    dangling = out_w == 0
+    trans = sim / np.where(dangling, 1.0, out_w)[:, None]
+    r = prior.copy()
+    for _ in range(max_iter):
+        nxt = damping * (r @ trans + r[dangling].sum() * prior) + (1 - damping) * prior
+        if np.abs(nxt - r).sum() < tol:
+            return nxt
+        r = nxt
+    return r
+
+def rank_sentences(text, offsets=None, lead_prior=LEAD_PRIOR):
+    """[(start, end, score)] ของทุกประโยค เรียงคะแนนมาก → น้อย (เท่ากัน → ประโยคที่มาก่อน)"""
+    offsets, sents = segment(text, offsets)
+    if not sents:
+        return []
+    x = term_matrix(text, offsets, sents)
+    sim = (x @ x.T).toarray()
+    np.fill_diagonal(sim, 0.0)
+    pos = np.arange(len(sents), dtype=np.float64)
+    scores = pagerank(sim) * (1.0 + pos) ** -lead_prior
+    order = np.lexsort((pos, -scores))
+    return [(sents[i][0], sents[i][1], float(scores[i])) for i in order]
+
+def summarize(text, n=5, offsets=None, lead_prior=LEAD_PRIOR):
+    """
+    คืน (บทสรุป, units) — บทสรุป = ประโยคคะแนนสูงสุด n ประโยคเรียงตามลำดับในข่าว คั่นด้วยช่องว่าง
+    units = [(start, end)] ของแต่ละประโยคในบทสรุป (ส่งต่อให้ NERMemo.predict_units(units=...) ได้)
+    """
+    return pick(text, rank_sentences(text, offsets, lead_prior), n)
+
+def pick(text, ranked, n=5):
+    """บทสรุป n ประโยคจากผล rank_sentences(text) ที่มีอยู่แล้ว (cache อันดับไว้ → n เท่าไรก็ไม่ต้องจัดอันดับใหม่)"""
+    picked = sorted(ranked[:n])
+    parts, units, pos = [], [], 0
+    for s, e, _ in picked:
+        parts.append(text[s:e])
+        units.append((pos, pos + e - s))
+        pos += e - s + 1
+    return " ".join(parts), units
+
+def lead(text, n=5, max_chars=400):
+    """
+    ทางด่วนตอนงบเวลาไม่พอ: n ประโยคแรกตาม regex (ไม่ตัดคำ ไม่รัน crfcut) คืนรูปแบบเดียวกับ summarize()
+    ประโยคที่ยาวเกิน max_chars ถูกตัดที่ช่องว่างสุดท้ายก่อนถึงขีด (กัน NER ยาวเกินงบ)
+    """
+    parts, units, pos = [], [], 0
+    for piece in FALLBACK_SPLIT.split(text):
+        piece = piece.strip()
+        if not piece:
+            continue
+        if len(piece) > max_chars:
+            cut = piece.rfind(" ", 0, max_chars)
+            piece = piece[:cut if cut > 0 else max_chars].rstrip()
+        parts.append(piece)
+        units.append((pos, pos + len(piece)))
+        pos += len(piece) + 1
+        if len(parts) >= n:
+            break
+    return " ".join(parts), units
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--input", default="data/t_news.jsonl")
+    ap.add_argument("--n_sent", type=int, default=5)
+    ap.add_argument("--limit", type=int, default=3)
+    ap.add_argument("--lead_prior", type=float, default=LEAD_PRIOR)
+    args = ap.parse_args()
+
+    with open(args.input, encoding="utf-8") as f:
+        for line in list(f)[:args.limit]:
+            obj = json.loads(line)
+            summary, _ = summarize(obj.get("text") or "", args.n_sent, lead_prior=args.lead_prior)
+            print(f"📰 {obj.get('title', '')}\n📝 {summary}\n")
+
+if __name__ == "__main__":
+    main()
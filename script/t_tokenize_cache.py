@@ -0,0 +1,154 @@
+# t_tokenize_cache.py
+# แคชผลตัดคำ PyThaiNLP (newmm ฯลฯ) เป็น offset ของ token แบบ binary ลง SQLite
+# key = hash(ข้อความ) + engine + เวอร์ชันพจนานุกรม → รันซ้ำไม่ต้องตัดคำข้อความเดิมอีก
+# ข้อความที่ยังไม่อยู่ในแคชจะตัดคำขนานกันหลาย process
+import argparse, hashlib, json, os, re, sqlite3
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import pythainlp
+from pythainlp.tokenize import word_tokenize
+
+DEFAULT_PATH = Path("data/cache/tokens.sqlite")
+
+def normalize_space(text):
+    """ข้อความที่ convert_records / t_corpus_stats ใช้เป็น key (ยุบช่องว่าง + strip) — อุ่นแคชต้องใช้แบบเดียวกัน"""
+    return re.sub(r"\s+", " ", (text or "").strip())
+
+def dict_version(custom_dict=None):
+    """เวอร์ชันพจนานุกรม = เวอร์ชัน pythainlp (+ hash ไฟล์ custom dict ถ้ามี)"""
+    v = f"pythainlp-{pythainlp.__version__}"
+    if custom_dict:
+        v += "-" + hashlib.blake2b(Path(custom_dict).read_bytes(), digest_size=8).hexdigest()
+    return v
+
+def _load_dict(custom_dict):
+    if not custom_dict:
+        return None
+    from pythainlp.corpus import thai_words
+    from pythainlp.util import dict_trie
+    words = Path(custom_dict).read_text(encoding="utf-8").split()
+    return dict_trie(set(words) | set(thai_words()))
+
+_worker_trie = None
+
+def _init_worker(custom_dict):
+    global _worker_trie
+    _worker_trie = _load_dict(custom_dict)
+
+def _tokenize_offsets(job):
+    """ตัดคำ 1 ข้อความ คืน offset (start,end) ของทุก token (รวม token ช่องว่าง) เป็น bytes ของ array('I')"""
+    text, engine = job
+    offs, cur = array("I"), 0
+    for tok in word_tokenize(text, engine=engine, custom_dict=_worker_trie):
+        s = text.find(tok, cur)
+        if s < 0:
+            s = cur
+        e = s + len(tok)
+        offs.append(s); offs.append(e)
+        cur = e
+    return offs.tobytes()
+
+class TokenCache:
+    """
+    cache = TokenCache()
+    cache.tokens(text)                    # → ["คำ", " ", "คำ", ...] เหมือน word_tokenize
+    cache.offsets_many(texts, workers=4)  # → [[(s,e), ...], ...] ตัดคำเฉพาะที่ยังไม่มีในแคช แบบขนาน
+    """
+
+    def __init__(self, path=DEFAULT_PATH, engine="newmm", custom_dict=None):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.engine = engine
+        self.custom_dict = custom_dict
+        self.version = dict_version(custom_dict)
+        self.db = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)  # หลาย process เขียนพร้อมกันได้
+        self.db.execute("CREATE TABLE IF NOT EXISTS tok (key BLOB PRIMARY KEY, offs BLOB) WITHOUT ROWID")
+        self.hits = self.misses = 0
+        self._pool, self._pool_workers = None, 0   # สร้างครั้งเดียวต่อ TokenCache (worker โหลดพจนานุกรมครั้งเดียว)
+        _init_worker(custom_dict)
+
+    def key(self, text):
+        h = hashlib.blake2b(digest_size=16)
+        h.update(f"{self.engine}\0{self.version}\0".encode())
+        h.update(text.encode("utf-8"))
+        return h.digest()
+
+    def _get(self, keys):
+        found = {}
+        for i in range(0, len(keys), 500):  # จำกัดจำนวน parameter ต่อ query ของ SQLite
+            part = keys[i:i+500]
+            q = f"SELECT key, offs FROM tok WHERE key IN ({','.join('?' * len(part))})"
+            found.update(self.db.execute(q, part).fetchall())
+        return found
+
+    def offsets_many(self, texts, workers=None):
+        texts = list(texts)
+        keys = [self.key(t) for t in texts]
+        found = self._get(list(set(keys)))
+        todo = {}
+        for k, t in zip(keys, texts):
+            if k not in found:
+                todo.setdefault(k, t)
+        self.hits += len(texts) - len(todo)
+        self.misses += len(todo)
+
+        if todo:
+            jobs = [(t, self.engine) for t in todo.values()]
+            workers = workers if workers is not None else (os.cpu_count() or 1)
+            if workers > 1 and len(jobs) > 1:
+                blobs = list(self._executor(workers).map(_tokenize_offsets, jobs,
+                                                         chunksize=max(1, len(jobs) // (workers * 4))))
+            else:
+                blobs = [_tokenize_offsets(j) for j in jobs]
+            new = dict(zip(todo.keys(), blobs))
+            with self.db:
+                self.db.executemany("INSERT OR REPLACE INTO tok VALUES (?, ?)", new.items())
+            found.update(new)
+
+        out = []
+        for k in keys:
+            a = array("I"); a.frombytes(found[k])
+            out.append(list(zip(a[0::2], a[1::2])))
+        return out
+
+    def _executor(self, workers):
+        if self._pool is None or self._pool_workers != workers:
+            if self._pool is not None:
+                self._pool.shutdown()
+            self._pool = ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(self.custom_dict,))
+            self._pool_workers = workers
+        return self._pool
+
+    def offsets(self, text):
+        return self.offsets_many([text], workers=1)[0]
+
+    def tokens(self, text):
+        return [text[s:e] for s, e in self.offsets(text)]
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        self.db.close()
+
+def main():
+    """อุ่นแคชล่วงหน้าจากไฟล์ JSONL (ฟิลด์ text ยุบช่องว่างแบบเดียวกับ convert_records)"""
+    ap = argparse.ArgumentParser()
+    ap.add_argument("inputs", nargs="+")
+    ap.add_argument("--cache", default=str(DEFAULT_PATH))
+    ap.add_argument("--engine", default="newmm")
+    ap.add_argument("--custom_dict", default=None)
+    ap.add_argument("--workers", type=int, default=None)
+    args = ap.parse_args()
+
+    cache = TokenCache(args.cache, args.engine, args.custom_dict)
+    for inp in args.inputs:
+        texts = [normalize_space(json.loads(l).get("text")) for l in open(inp, encoding="utf-8")]
+        cache.offsets_many(texts, workers=args.workers)
+        print(f"✅ {inp}: {len(texts)} docs (hit {cache.hits}, miss {cache.misses})")
+    cache.close()
+
+if __name__ == "__main__":
+    main()
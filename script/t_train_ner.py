@@ -1,11 +1,13 @@
 # train_ner_thai.py (fixed)
-import os, json, random, argparse
+import os, json, random, argparse, hashlib, time
 from typing import List, Tuple
 import numpy as np, torch
-from datasets import Dataset, load_dataset
+from datasets import Dataset, DatasetDict, load_dataset, load_from_disk, concatenate_datasets
 from transformers import (AutoTokenizer, AutoModelForTokenClassification,
                           DataCollatorForTokenClassification, TrainingArguments, Trainer)
-from seqeval.metrics import classification_report, f1_score
+from transformers.trainer_pt_utils import LengthGroupedSampler
+from t_ner_metrics import SpanF1, argmax_logits
+from t_export_features import align_labels, load_features, make_mapper
 
 def read_iob(path: str) -> List[List[Tuple[str,str]]]:
     sents, cur = [], []
@@ -31,22 +33,42 @@ def build_ds(sents):
     tags = [[l for _,l in s] for s in sents]
     return Dataset.from_dict({"tokens": toks, "ner_tags": tags})
 
-def bio_type(tag): return "O" if tag=="O" or "-" not in tag else tag.split("-",1)[1]
+def cpu_supports_bf16():
+    """CPU มีคำสั่ง bf16 (AVX512-BF16 / AMX) ให้ autocast ใช้หรือไม่"""
+    check = getattr(torch.cpu, "_is_avx512_bf16_supported", None)
+    if check is not None and check():
+        return True
+    try:
+        with open("/proc/cpuinfo", encoding="utf-8") as f:
+            flags = f.read()
+    except OSError:
+        return False
+    return "avx512_bf16" in flags or "amx_bf16" in flags
+
+class ThroughputTrainer(Trainer):
+    """Trainer ที่จด (เวลา, จำนวนตัวอย่าง, token จริงที่ไม่ใช่ padding) ของทุก micro-step"""
+    def __init__(self, *a, **k):
+        super().__init__(*a, **k)
+        self.marks = []
+
+    def training_step(self, model, inputs, *a, **k):
+        out = super().training_step(model, inputs, *a, **k)
+        self.marks.append((time.perf_counter(), int(inputs["input_ids"].shape[0]), int(inputs["attention_mask"].sum())))
+        return out
 
-def compute_metrics(p):
-    preds = np.argmax(p.predictions, axis=-1)
-    true_tags, pred_tags = [], []
-    for pr, lb in zip(preds, p.label_ids):
-        ct, cp = [], []
-        for p_i, l_i in zip(pr, lb):
-            if l_i == -100: continue
-            ct.append(id2label[l_i]); cp.append(id2label[p_i])
-        true_tags.append(ct); pred_tags.append(cp)
-    print("\n"+classification_report(true_tags, pred_tags, digits=4, zero_division=0)+"\n")
-    return {"overall_f1": f1_score(true_tags, pred_tags, zero_division=0)}
+    def throughput(self, skip=0):
+        """(samples/s, tokens/s) นับหลังข้าม skip micro-step แรก (warmup / torch.compile)"""
+        m = self.marks[skip:]
+        if len(m) < 2:
+            return 0.0, 0.0
+        dt = m[-1][0] - m[0][0]
+        return sum(x[1] for x in m[1:]) / dt, sum(x[2] for x in m[1:]) / dt
+
+def bio_type(tag): return "O" if tag=="O" or "-" not in tag else tag.split("-",1)[1]
 
 parser = argparse.ArgumentParser()
 parser.add_argument("--train_file", type=str, default="data/hf_ner_dataset_iob.txt")
+parser.add_argument("--features", type=str, default=None, help="โฟลเดอร์จาก t_export_features.py (ใช้แทน --train_file)")
 parser.add_argument("--eval_split", type=float, default=0.15)
 parser.add_argument("--model_name", type=str, default="airesearch/wangchanberta-base-wiki-2020")
 parser.add_argument("--output_dir", type=str, default="out_thai_ner")
@@ -58,76 +80,139 @@ parser.add_argument("--weight_decay", type=float, default=0.01)
 parser.add_argument("--max_length", type=int, default=320)
 parser.add_argument("--label_all_tokens", action="store_true")  # เปิดด้วย flag
 parser.add_argument("--drop_labels", nargs="*", default=["LEN","URL","PHONE","EMAIL"])
+parser.add_argument("--cache_dir", type=str, default="data/cache/train_ds")
+parser.add_argument("--no_cache", action="store_true")
+parser.add_argument("--num_proc", type=int, default=min(4, os.cpu_count() or 1))
+parser.add_argument("--no_group_by_length", dest="group_by_length", action="store_false")
+# CPU profile
+parser.add_argument("--cpu", action="store_true", help="บังคับเทรนบน CPU (ถ้าไม่มี CUDA จะใช้ CPU อยู่แล้ว)")
+parser.add_argument("--bf16", choices=["auto","on","off"], default="auto", help="bf16 autocast บน CPU (auto = ใช้ถ้า CPU รองรับ)")
+parser.add_argument("--grad_accum", type=int, default=1)
+parser.add_argument("--torch_compile", action="store_true")
+parser.add_argument("--num_threads", type=int, default=None, help="จำนวน intra-op threads ของ torch (ค่าเริ่มต้น = ทุก core)")
+parser.add_argument("--pin_cores", action="store_true", help="ผูก process กับ core 0..num_threads-1")
+parser.add_argument("--dataloader_workers", type=int, default=None)
+parser.add_argument("--benchmark_steps", type=int, default=0, help="> 0: เทรนแค่ N step ไม่ eval/save แล้วรายงาน samples/s, tokens/s")
+parser.add_argument("--benchmark_warmup", type=int, default=2)
+parser.add_argument("--benchmark_out", type=str, default="bench_train.jsonl")
 parser.add_argument("--focus_labels", nargs="*", default=["PERSON","LOCATION","ORGANIZATION","DATE","TIME","MONEY","PERCENT","LAW"])
 args = parser.parse_args()
 
 random.seed(42); np.random.seed(42); torch.manual_seed(42)
 
-# โหลด IOB ของเรา
-all_sents = read_iob(args.train_file)
+on_cpu = args.cpu or not torch.cuda.is_available()
+use_bf16 = on_cpu and (args.bf16 == "on" or (args.bf16 == "auto" and cpu_supports_bf16()))
+if on_cpu:
+    # ตั้งผ่าน torch โดยตรง: OMP_NUM_THREADS / KMP_AFFINITY ต้องตั้งก่อน import torch ถึงจะมีผล (ตั้งจาก shell ได้)
+    n_threads = args.num_threads or os.cpu_count() or 1
+    torch.set_num_threads(n_threads)
+    if args.pin_cores and hasattr(os, "sched_setaffinity"):
+        # n_threads core แรกจากชุดที่ process ได้รับอนุญาต (cgroup/taskset อาจไม่มี core 0)
+        os.sched_setaffinity(0, sorted(os.sched_getaffinity(0))[:n_threads])
+    print(f"🖥️ CPU profile: threads={n_threads} bf16={use_bf16} grad_accum={args.grad_accum} "
+          f"compile={args.torch_compile} pin_cores={args.pin_cores}")
+
+tok = AutoTokenizer.from_pretrained(args.model_name)
+mapper = make_mapper(args.focus_labels, args.drop_labels)
 
 # ผสม ThaiNER จาก HF แบบ “ครั้งเดียว” (ไม่อ่านไฟล์ IOB ThaiNER ซ้ำ)
 thainer = load_dataset("pythainlp/thainer-corpus-v2")
 thainer_lbls = thainer["train"].features["ner"].feature.names
-def id2name(ids): return [thainer_lbls[i] for i in ids]
-for words, tags in zip(thainer["train"]["words"], thainer["train"]["ner"]):
-    all_sents.append(list(zip(words, id2name(tags))))
-for words, tags in zip(thainer["validation"]["words"], thainer["validation"]["ner"]):
-    all_sents.append(list(zip(words, id2name(tags))))
-
-# map labels: กรอง/โฟกัส
-focus, drop = set(args.focus_labels), set(args.drop_labels)
-def mapper(l):
-    if l=="O" or "-" not in l: return "O"
-    b, t = l.split("-",1)
-    if t in drop: return "O"
-    if focus and t not in focus: return "O"
-    return f"{b}-{t}"
-
-all_sents = map_labels(all_sents, mapper)
-random.shuffle(all_sents)
-
-# split
-n = len(all_sents)
-k = int(n*(1-args.eval_split))
-train_sents, eval_sents = all_sents[:k], all_sents[k:]
-
-# label space
-labels = sorted({l for s in (train_sents+eval_sents) for _,l in s} - {""})
-if "O" not in labels: labels.append("O")
-labels = sorted([x for x in labels if x.startswith("B-")]) + \
-         sorted([x for x in labels if x.startswith("I-")]) + ["O"]
-label2id = {l:i for i,l in enumerate(labels)}
+
+# dataset ที่ merge + map label + tokenize แล้ว cache ไว้ตาม fingerprint ของ input และ option ที่มีผล
+def data_fingerprint():
+    h = hashlib.blake2b(digest_size=12)
+    h.update(json.dumps({
+        "v": 1, "model_name": args.model_name, "tokenizer": type(tok).__name__, "vocab": len(tok),
+        "max_length": args.max_length, "label_all_tokens": args.label_all_tokens,
+        "focus": sorted(args.focus_labels), "drop": sorted(args.drop_labels), "eval_split": args.eval_split,
+        "thainer": [thainer["train"]._fingerprint, thainer["validation"]._fingerprint],
+        "features": os.path.abspath(args.features) if args.features else None,
+    }, sort_keys=True).encode())
+    if not args.features:
+        with open(args.train_file, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+    return h.hexdigest()
+
+cache_path = os.path.join(args.cache_dir, data_fingerprint())
+if not args.no_cache and os.path.exists(os.path.join(cache_path, "labels.json")):
+    print(f"♻️ dataset cache hit: {cache_path}")
+    ds = load_from_disk(cache_path)
+    with open(os.path.join(cache_path, "labels.json"), encoding="utf-8") as f:
+        labels = json.load(f)
+    label2id = {l:i for i,l in enumerate(labels)}
+else:
+    # โหลด IOB ของเรา (หรือ features ที่ tokenize ไว้แล้วจาก t_export_features.py)
+    if args.features:
+        feat_ds, feat_labels = load_features(args.features)
+        all_sents = []
+    else:
+        feat_ds, feat_labels = None, []
+        all_sents = map_labels(read_iob(args.train_file), mapper)
+
+    # ThaiNER: แปลง id → ชื่อ label ที่ map แล้ว ด้วย .map หลาย process (ไม่ copy ลง list ของ Python)
+    def thainer_tags(batch):
+        return {"ner_tags": [[mapper(thainer_lbls[i]) for i in seq] for seq in batch["ner"]]}
+    parts = [concatenate_datasets([thainer["train"], thainer["validation"]])
+             .map(thainer_tags, batched=True, num_proc=args.num_proc)
+             .rename_column("words", "tokens")
+             .select_columns(["tokens", "ner_tags"])]
+    if all_sents:
+        ours = build_ds(all_sents)
+        parts.append(ours.cast(parts[0].features))
+
+    # label space
+    labels = sorted(({mapper(l) for l in thainer_lbls} | {l for s in all_sents for _,l in s} | set(feat_labels)) - {""})
+    if "O" not in labels: labels.append("O")
+    labels = sorted([x for x in labels if x.startswith("B-")]) + \
+             sorted([x for x in labels if x.startswith("I-")]) + ["O"]
+    label2id = {l:i for i,l in enumerate(labels)}
+
+    def encode(batch):
+        enc = tok(batch["tokens"], is_split_into_words=True, truncation=True, padding=False, max_length=args.max_length)
+        enc["labels"] = [align_labels(enc.word_ids(i), labs, label2id, args.label_all_tokens)
+                         for i, labs in enumerate(batch["ner_tags"])]
+        return enc
+
+    # split
+    merged = concatenate_datasets(parts).shuffle(seed=42)
+    ds = merged.train_test_split(test_size=args.eval_split, shuffle=False)
+    ds = ds.map(encode, batched=True, num_proc=args.num_proc, remove_columns=["tokens", "ner_tags"])
+    ds = DatasetDict(train=ds["train"], eval=ds["test"])
+
+    if feat_ds is not None:
+        # id ใน features อิง label map ตอน export → แปลงเป็น id ของรอบนี้ด้วยชื่อ label
+        remap = [label2id.get(l, label2id["O"]) for l in feat_labels]
+        feat_ds = feat_ds.map(lambda b: {"labels": [[x if x == -100 else remap[x] for x in seq] for seq in b["labels"]]},
+                              batched=True, num_proc=args.num_proc)
+        feat_split = feat_ds.train_test_split(test_size=args.eval_split, seed=42)
+        ds = DatasetDict(train=concatenate_datasets([ds["train"], feat_split["train"].cast(ds["train"].features)]).shuffle(seed=42),
+                         eval=concatenate_datasets([ds["eval"], feat_split["test"].cast(ds["eval"].features)]))
+
+    if not args.no_cache:
+        ds.save_to_disk(cache_path)
+        with open(os.path.join(cache_path, "labels.json"), "w", encoding="utf-8") as f:
+            json.dump(labels, f, ensure_ascii=False)
+        print(f"💾 cached dataset → {cache_path}")
+
 id2label = {i:l for l,i in label2id.items()}
+ds_tr, ds_ev = ds["train"], ds["eval"]
 
-tok = AutoTokenizer.from_pretrained(args.model_name)
+# padding ที่ต้องเสีย: batch แบบสุ่ม vs จัดกลุ่มตามความยาว (LengthGroupedSampler ตัวเดียวกับ Trainer)
+def padding_ratio(lengths, order, bs):
+    pad = total = 0
+    for i in range(0, len(order), bs):
+        b = [lengths[j] for j in order[i:i+bs]]
+        total += max(b) * len(b); pad += max(b) * len(b) - sum(b)
+    return pad / max(total, 1)
 
-def encode(batch):
-    enc = tok(batch["tokens"], is_split_into_words=True, truncation=True, padding=False, max_length=args.max_length)
-    all_ids=[]
-    for i, labs in enumerate(batch["ner_tags"]):
-        wids = enc.word_ids(i)
-        prev = None; lid=[]
-        for wid in wids:
-            if wid is None:
-                lid.append(-100)
-            else:
-                lab = labs[wid]
-                if wid != prev:
-                    lid.append(label2id.get(lab, label2id["O"]))
-                else:
-                    if args.label_all_tokens and lab != "O":
-                        typ = lab.split("-",1)[1] if "-" in lab else lab
-                        lid.append(label2id.get(f"I-{typ}", label2id["O"]))
-                    else:
-                        lid.append(-100)
-                prev = wid
-        all_ids.append(lid)
-    enc["labels"]=all_ids
-    return enc
-
-ds_tr = build_ds(train_sents).map(encode, batched=True)
-ds_ev = build_ds(eval_sents).map(encode, batched=True)
+train_lengths = [len(x) for x in ds_tr["input_ids"]]
+gen = torch.Generator().manual_seed(42)
+rand_pad = padding_ratio(train_lengths, torch.randperm(len(train_lengths), generator=gen).tolist(), args.batch_size)
+group_pad = padding_ratio(train_lengths, list(LengthGroupedSampler(args.batch_size * args.grad_accum, lengths=train_lengths, generator=gen)), args.batch_size)
+print(f"📏 padding ratio: random {rand_pad:.1%} → group_by_length {group_pad:.1%} "
+      f"(ใช้อยู่: {'group_by_length' if args.group_by_length else 'random'})")
 
 model = AutoModelForTokenClassification.from_pretrained(
     args.model_name,
@@ -138,6 +223,8 @@ model = AutoModelForTokenClassification.from_pretrained(
 )
 
 collator = DataCollatorForTokenClassification(tokenizer=tok)
+bench = args.benchmark_steps > 0
+n_workers = args.dataloader_workers if args.dataloader_workers is not None else min(args.num_proc, 4)
 targs = TrainingArguments(
     output_dir=args.output_dir,
     learning_rate=args.lr,
@@ -146,26 +233,52 @@ targs = TrainingArguments(
     num_train_epochs=args.epochs,
     weight_decay=args.weight_decay,
     warmup_ratio=args.warmup_ratio,
-    evaluation_strategy="epoch",
-    save_strategy="epoch",
+    max_steps=args.benchmark_steps if bench else -1,
+    eval_strategy="no" if bench else "epoch",
+    save_strategy="no" if bench else "epoch",
     metric_for_best_model="overall_f1",
     greater_is_better=True,
-    load_best_model_at_end=True,
-    fp16=torch.cuda.is_available(),
+    load_best_model_at_end=not bench,
+    fp16=not on_cpu,
+    bf16=use_bf16,
+    use_cpu=on_cpu,
+    gradient_accumulation_steps=args.grad_accum,
+    torch_compile=args.torch_compile,
+    dataloader_persistent_workers=n_workers > 0,
     logging_steps=50,
     report_to="none",
+    batch_eval_metrics=True,  # สะสม TP/FP/FN ทีละ batch ไม่เก็บ logits ทั้ง eval set
+    group_by_length=args.group_by_length,
+    dataloader_num_workers=n_workers,
 )
 
-trainer = Trainer(
+trainer = ThroughputTrainer(
     model=model,
     args=targs,
     train_dataset=ds_tr,
     eval_dataset=ds_ev,
     data_collator=collator,
     tokenizer=tok,
-    compute_metrics=compute_metrics
+    compute_metrics=SpanF1(id2label),
+    preprocess_logits_for_metrics=argmax_logits,
 )
 
 print("Labels:", labels)
-trainer.train()
-print(trainer.evaluate())
+train_out = trainer.train()
+rt = train_out.metrics.get("train_runtime", 0.0)
+skip = args.benchmark_warmup * args.grad_accum if bench else 0
+sps, tps = trainer.throughput(skip)
+print(f"⚡ {sps:,.2f} samples/s, {tps:,.0f} tokens/s "
+      f"(padding {group_pad if args.group_by_length else rand_pad:.1%}, train_runtime {rt:.1f}s)")
+
+if bench:
+    rec = {"time": time.strftime("%Y-%m-%d %H:%M:%S"), "model_name": args.model_name, "steps": args.benchmark_steps,
+           "warmup": args.benchmark_warmup, "batch_size": args.batch_size, "grad_accum": args.grad_accum,
+           "cpu": on_cpu, "bf16": use_bf16, "torch_compile": args.torch_compile, "threads": torch.get_num_threads(),
+           "dataloader_workers": n_workers, "group_by_length": args.group_by_length,
+           "samples_per_s": round(sps, 3), "tokens_per_s": round(tps, 1)}
+    with open(args.benchmark_out, "a", encoding="utf-8") as f:
+        f.write(json.dumps(rec) + "\n")
+    print(f"📝 benchmark → {args.benchmark_out}")
+else:
+    print(trainer.evaluate())